@@ -0,0 +1,106 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+Tables as originally created by ``Base.metadata.create_all``. Existing
+databases that were bootstrapped that way are left untouched.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not _has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("email", sa.String(), unique=True),
+            sa.Column("name", sa.String()),
+            sa.Column("role", sa.String()),
+            sa.Column("password_hash", sa.String()),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if not _has_table("reports"):
+        op.create_table(
+            "reports",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("title", sa.String(140), nullable=False),
+            sa.Column("description", sa.Text()),
+            sa.Column("lat", sa.Float(), nullable=False),
+            sa.Column("lng", sa.Float(), nullable=False),
+            sa.Column("accuracy_m", sa.Float()),
+            sa.Column("location_rounded_lat", sa.Float()),
+            sa.Column("location_rounded_lng", sa.Float()),
+            sa.Column("status", sa.String()),
+            sa.Column("priority_score", sa.Integer()),
+            sa.Column("priority_level", sa.String()),
+            sa.Column("verification_score", sa.Float()),
+            sa.Column("verification_labels", sa.JSON()),
+            sa.Column("is_duplicate", sa.Boolean()),
+            sa.Column("duplicate_of_id", sa.String(), sa.ForeignKey("reports.id")),
+            sa.Column("anonymous", sa.Boolean()),
+            sa.Column("reporter_id", sa.String(), sa.ForeignKey("users.id")),
+            sa.Column("assigned_to_id", sa.String(), sa.ForeignKey("users.id")),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+            sa.Column("resolved_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_reports_id", "reports", ["id"])
+
+    if not _has_table("media_files"):
+        op.create_table(
+            "media_files",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("report_id", sa.String(), sa.ForeignKey("reports.id"), nullable=False),
+            sa.Column("filename", sa.String(), nullable=False),
+            sa.Column("original_filename", sa.String(), nullable=False),
+            sa.Column("file_path", sa.String(), nullable=False),
+            sa.Column("file_type", sa.String()),
+            sa.Column("file_size", sa.Integer()),
+            sa.Column("mime_type", sa.String()),
+            sa.Column("sha256_hash", sa.String()),
+            sa.Column("perceptual_hash", sa.String()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_media_files_id", "media_files", ["id"])
+
+    if not _has_table("activities"):
+        op.create_table(
+            "activities",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("report_id", sa.String(), sa.ForeignKey("reports.id"), nullable=False),
+            sa.Column("user_id", sa.String(), sa.ForeignKey("users.id")),
+            sa.Column("action", sa.String(), nullable=False),
+            sa.Column("details", sa.JSON()),
+            sa.Column("ip_address", sa.String()),
+            sa.Column("user_agent", sa.String()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_activities_id", "activities", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("activities")
+    op.drop_table("media_files")
+    op.drop_table("reports")
+    op.drop_table("users")
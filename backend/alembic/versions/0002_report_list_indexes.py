@@ -0,0 +1,61 @@
+"""Covering and partial indexes for report list queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+Serves GET /reports/ (status filter, bbox filter and the open-reports feed)
+ordered by priority_score DESC, created_at DESC from indexes instead of a
+full scan plus sort. On Postgres the summary columns are INCLUDEd so the
+list query can be an index-only scan.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SUMMARY_INCLUDE = ["id", "title", "lat", "lng", "location_rounded_lat", "location_rounded_lng"]
+UNRESOLVED = sa.text("status != 'resolved'")
+PRIORITY_ORDER = [sa.text("priority_score DESC"), sa.text("created_at DESC")]
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_reports_status_priority_created", "reports",
+        [sa.text("status")] + PRIORITY_ORDER,
+        postgresql_include=SUMMARY_INCLUDE,
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_reports_priority_created", "reports",
+        PRIORITY_ORDER,
+        postgresql_include=SUMMARY_INCLUDE + ["status"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_reports_rounded_location", "reports",
+        ["location_rounded_lat", "location_rounded_lng"],
+        postgresql_include=["id", "title", "lat", "lng", "status", "priority_score", "created_at"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_reports_open_priority_created", "reports",
+        PRIORITY_ORDER,
+        postgresql_where=UNRESOLVED,
+        sqlite_where=UNRESOLVED,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reports_open_priority_created", table_name="reports")
+    op.drop_index("ix_reports_rounded_location", table_name="reports")
+    op.drop_index("ix_reports_priority_created", table_name="reports")
+    op.drop_index("ix_reports_status_priority_created", table_name="reports")
@@ -0,0 +1,54 @@
+"""Report regions for geographic sharding
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+Adds the geohash-prefix ``region`` column that the shard router keys on and
+backfills it for existing reports. Run this against every shard database.
+"""
+import os
+import sys
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from app.geo import region_for  # noqa: E402
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 5000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("reports")}
+    if "region" not in columns:
+        op.add_column("reports", sa.Column("region", sa.String(12), nullable=True))
+    op.create_index("ix_reports_region", "reports", ["region"], if_not_exists=True)
+
+    reports = sa.table("reports", sa.column("id"), sa.column("lat"), sa.column("lng"), sa.column("region"))
+    while True:
+        rows = bind.execute(
+            sa.select(reports.c.id, reports.c.lat, reports.c.lng)
+            .where(reports.c.region.is_(None))
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            reports.update().where(reports.c.id == sa.bindparam("report_id")).values(region=sa.bindparam("new_region")),
+            [{"report_id": row.id, "new_region": region_for(row.lat, row.lng)} for row in rows],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reports_region", table_name="reports")
+    op.drop_column("reports", "region")
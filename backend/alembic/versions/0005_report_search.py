@@ -0,0 +1,51 @@
+"""Full-text search index for reports
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+Postgres gets a stored generated tsvector column over title and description
+with a GIN index; SQLite gets an FTS5 table keyed by the reports rowid,
+filled from the existing reports (see app/search.py).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DOCUMENT = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute(
+            "ALTER TABLE reports ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({DOCUMENT}) STORED"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_reports_search ON reports USING gin (search_vector)")
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts "
+            "USING fts5(title, description, tokenize='porter unicode61')"
+        )
+        op.execute("DELETE FROM reports_fts")
+        op.execute(
+            "INSERT INTO reports_fts (rowid, title, description) "
+            "SELECT rowid, title, coalesce(description, '') FROM reports"
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_reports_search")
+        op.execute("ALTER TABLE reports DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        op.execute("DROP TABLE IF EXISTS reports_fts")
@@ -0,0 +1,68 @@
+"""Report geohash for nearby search
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+Adds the ``geohash`` of each report's rounded location, which GET
+/reports/nearby expands rings of cells over, and backfills it. The index
+carries the rounded coordinates, status and id so candidates are ranked
+by distance without reading the table.
+"""
+import os
+import sys
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from app.geo import POINT_PRECISION, geohash_encode  # noqa: E402
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 5000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("reports")}
+    if "geohash" not in columns:
+        op.add_column("reports", sa.Column("geohash", sa.String(12), nullable=True))
+    op.create_index(
+        "ix_reports_geohash_location", "reports",
+        ["geohash", "location_rounded_lat", "location_rounded_lng", "status", "id"],
+        if_not_exists=True,
+    )
+
+    reports = sa.table(
+        "reports", sa.column("id"), sa.column("location_rounded_lat"), sa.column("location_rounded_lng"),
+        sa.column("geohash"),
+    )
+    while True:
+        rows = bind.execute(
+            sa.select(reports.c.id, reports.c.location_rounded_lat, reports.c.location_rounded_lng)
+            .where(reports.c.geohash.is_(None), reports.c.location_rounded_lat.isnot(None),
+                   reports.c.location_rounded_lng.isnot(None))
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            reports.update().where(reports.c.id == sa.bindparam("report_id")).values(geohash=sa.bindparam("new_geohash")),
+            [
+                {"report_id": row.id,
+                 "new_geohash": geohash_encode(row.location_rounded_lat, row.location_rounded_lng, POINT_PRECISION)}
+                for row in rows
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reports_geohash_location", table_name="reports")
+    op.drop_column("reports", "geohash")
@@ -0,0 +1,61 @@
+"""Authority digests
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+Stored digests (batched authority messages) and the digest passes that
+produced them, so each pass only reads the reports created since the last
+one, through a new index on ``reports.created_at``. The first pass after
+upgrading digests every open report.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "authority_digests",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("jurisdiction", sa.String(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("priority_level", sa.String(), nullable=False),
+        sa.Column("report_count", sa.Integer(), nullable=False),
+        sa.Column("report_ids", sa.JSON(), nullable=False),
+        sa.Column("subject", sa.String(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("period_end", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_authority_digests_id", "authority_digests", ["id"])
+    op.create_index(
+        "ix_authority_digests_jurisdiction_created", "authority_digests",
+        ["jurisdiction", sa.text("created_at DESC")],
+    )
+    op.create_table(
+        "digest_runs",
+        sa.Column("shard", sa.String(), primary_key=True),
+        sa.Column("period_start", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("period_end", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("digests", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_reports_created_at", "reports", ["created_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reports_created_at", table_name="reports")
+    op.drop_table("digest_runs")
+    op.drop_index("ix_authority_digests_jurisdiction_created", table_name="authority_digests")
+    op.drop_index("ix_authority_digests_id", table_name="authority_digests")
+    op.drop_table("authority_digests")
@@ -0,0 +1,93 @@
+"""Report event stream and snapshots
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+Turns ``activities`` into the report event stream (see app/events.py):
+``seq`` orders it and ``state`` carries the report fields each event set.
+Existing activities are numbered by creation time; they predate ``state``,
+so every existing report also gets a snapshot of its current row, which
+replay starts from. Run this against every shard database.
+"""
+import os
+import sys
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from app import events  # noqa: E402
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 5000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("activities")}
+    if "seq" not in columns:
+        op.add_column("activities", sa.Column("seq", sa.BigInteger(), nullable=True))
+    if "state" not in columns:
+        op.add_column("activities", sa.Column("state", sa.JSON(), nullable=True))
+    op.create_table(
+        "event_sequence",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("last_seq", sa.BigInteger(), nullable=False),
+    )
+    op.create_table(
+        "report_snapshots",
+        sa.Column("report_id", sa.String(), primary_key=True),
+        sa.Column("seq", sa.BigInteger(), nullable=False),
+        sa.Column("state", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "event_consumers",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("position", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    activities = sa.table("activities", sa.column("id"), sa.column("seq"), sa.column("created_at"))
+    seq = bind.execute(sa.select(sa.func.max(activities.c.seq))).scalar() or 0
+    while True:
+        rows = bind.execute(
+            sa.select(activities.c.id)
+            .where(activities.c.seq.is_(None))
+            .order_by(activities.c.created_at, activities.c.id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            activities.update().where(activities.c.id == sa.bindparam("activity_id")).values(seq=sa.bindparam("new_seq")),
+            [{"activity_id": row.id, "new_seq": seq + offset} for offset, row in enumerate(rows, start=1)],
+        )
+        seq += len(rows)
+    bind.execute(sa.table("event_sequence", sa.column("id"), sa.column("last_seq")).insert().values(id=1, last_seq=seq))
+
+    op.create_index("ix_activities_seq", "activities", ["seq"], unique=True, if_not_exists=True)
+    op.create_index("ix_activities_report_seq", "activities", ["report_id", "seq"], if_not_exists=True)
+    op.create_index("ix_activities_created_at", "activities", ["created_at"], if_not_exists=True)
+
+    events.baseline(Session(bind=bind), batch_size=BACKFILL_BATCH)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_activities_created_at", table_name="activities")
+    op.drop_index("ix_activities_report_seq", table_name="activities")
+    op.drop_index("ix_activities_seq", table_name="activities")
+    op.drop_table("event_consumers")
+    op.drop_table("report_snapshots")
+    op.drop_table("event_sequence")
+    op.drop_column("activities", "state")
+    op.drop_column("activities", "seq")
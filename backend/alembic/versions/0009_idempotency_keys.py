@@ -0,0 +1,42 @@
+"""Idempotency keys and upload deduplication
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00
+
+Stored ``Idempotency-Key`` reservations and responses for report
+submission (see app/idempotency.py), and an index on
+``media_files.sha256_hash`` so an upload can be matched to an identical
+file already on disk before it is written. Run this against every shard
+database.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("fingerprint", sa.String(), nullable=False),
+        sa.Column("response", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+    op.create_index("ix_media_files_sha256_hash", "media_files", ["sha256_hash"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_media_files_sha256_hash", table_name="media_files")
+    op.drop_index("ix_idempotency_keys_expires_at", table_name="idempotency_keys")
+    op.drop_table("idempotency_keys")
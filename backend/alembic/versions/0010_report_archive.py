@@ -0,0 +1,48 @@
+"""Report archive
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:00:00
+
+``report_archive`` holds resolved reports moved out of the hot tables by
+app/archive.py, one compressed record per report. Partial indexes on
+``reports.resolved_at`` and ``reports.duplicate_of_id`` let the archival
+pass find candidates without scanning. Run this against every shard
+database.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "report_archive",
+        sa.Column("report_id", sa.String(), primary_key=True),
+        sa.Column("region", sa.String(length=12), nullable=True),
+        sa.Column("resolved_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_reports_resolved_at", "reports", ["resolved_at"],
+        postgresql_where=sa.text("resolved_at IS NOT NULL"), sqlite_where=sa.text("resolved_at IS NOT NULL"),
+    )
+    op.create_index(
+        "ix_reports_duplicate_of_id", "reports", ["duplicate_of_id"],
+        postgresql_where=sa.text("duplicate_of_id IS NOT NULL"), sqlite_where=sa.text("duplicate_of_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reports_duplicate_of_id", table_name="reports")
+    op.drop_index("ix_reports_resolved_at", table_name="reports")
+    op.drop_table("report_archive")
@@ -0,0 +1,40 @@
+"""Job leases
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 00:00:00
+
+``job_leases`` has one row per scheduled background job (app/scheduler.py):
+the worker currently running it, until when its lease holds, and when the
+job is next due, so that each run happens on one worker of the deployment.
+Only the primary database's table is used.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_leases",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("owner", sa.String(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("next_run_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_duration_ms", sa.Float(), nullable=True),
+        sa.Column("last_status", sa.String(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("job_leases")
@@ -0,0 +1,69 @@
+"""Geofenced subscriptions and notifications
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 00:00:00
+
+``subscriptions`` holds residents' geofences (a circle or a polygon) and
+``notifications`` the alerts queued for them by app/notifications.py, one
+per user and report. Both are global tables: only the primary
+database's are used.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "subscriptions",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("lat", sa.Float(), nullable=True),
+        sa.Column("lng", sa.Float(), nullable=True),
+        sa.Column("radius_m", sa.Float(), nullable=True),
+        sa.Column("polygon", sa.JSON(), nullable=True),
+        sa.Column("min_priority", sa.Integer(), nullable=False),
+        sa.Column("active", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_subscriptions_user_id", "subscriptions", ["user_id"])
+    op.create_index("ix_subscriptions_updated_at", "subscriptions", ["updated_at"])
+
+    op.create_table(
+        "notifications",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("subscription_id", sa.String(), sa.ForeignKey("subscriptions.id"), nullable=False),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("report_id", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+    )
+    op.create_index("ix_notifications_user_report", "notifications", ["user_id", "report_id"], unique=True)
+    op.create_index("ix_notifications_user_created", "notifications", ["user_id", sa.text("created_at DESC")])
+    op.create_index(
+        "ix_notifications_pending", "notifications", ["created_at"],
+        postgresql_where=sa.text("sent_at IS NULL"), sqlite_where=sa.text("sent_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notifications_pending", table_name="notifications")
+    op.drop_index("ix_notifications_user_created", table_name="notifications")
+    op.drop_index("ix_notifications_user_report", table_name="notifications")
+    op.drop_table("notifications")
+    op.drop_index("ix_subscriptions_updated_at", table_name="subscriptions")
+    op.drop_index("ix_subscriptions_user_id", table_name="subscriptions")
+    op.drop_table("subscriptions")
@@ -0,0 +1,32 @@
+"""Idempotency key report id
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 00:00:00
+
+``idempotency_keys.report_id`` binds a key to the id of the report its
+request creates, before the report is inserted (app/idempotency.py). A
+request that fails after the insert keeps its key, and the client's retry
+finishes that report rather than creating a second one.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("idempotency_keys")}
+    if "report_id" not in columns:
+        op.add_column("idempotency_keys", sa.Column("report_id", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("idempotency_keys", "report_id")
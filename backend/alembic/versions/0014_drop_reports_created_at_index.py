@@ -0,0 +1,30 @@
+"""Drop the reports created_at index
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19 00:00:00
+
+Authority digest passes used to read the reports created since the
+previous pass through ``ix_reports_created_at`` (0007). They now window on
+the reports' ``verified`` events (app/digests.py), which
+``ix_activities_created_at`` serves. No other query ranges over
+``reports.created_at`` on its own, so the index only cost writes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0014"
+down_revision: Union[str, None] = "0013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_reports_created_at", table_name="reports", if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index("ix_reports_created_at", "reports", ["created_at"], if_not_exists=True)
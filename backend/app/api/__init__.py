@@ -1,7 +1,11 @@
 from fastapi import APIRouter
 
-from .endpoints import reports, auth
+from .endpoints import reports, auth, stats, digests, sync, subscriptions
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
-api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
\ No newline at end of file
+api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
+api_router.include_router(stats.router, prefix="/stats", tags=["stats"])
+api_router.include_router(digests.router, prefix="/digests", tags=["digests"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(subscriptions.router, prefix="/subscriptions", tags=["subscriptions"])
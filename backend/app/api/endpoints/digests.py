@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from ...database import get_db
+from ... import models, schemas, auth, digests
+
+router = APIRouter()
+
+def _require_volunteer(user: models.User) -> None:
+    if user.role not in ["volunteer", "admin"]:
+        raise HTTPException(status_code=403, detail="Only volunteers can read authority digests")
+
+@router.get("/", response_model=schemas.PaginatedResponse)
+def list_digests(
+    jurisdiction: Optional[str] = Query(None, description="Jurisdiction (geohash prefix)"),
+    page: int = Query(1, ge=1, description="Page number"),
+    per_page: int = Query(20, ge=1, le=100, description="Items per page"),
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """List authority digests, newest first (volunteers only)."""
+    _require_volunteer(current_user)
+    rows = digests.get_digest_rows(db, jurisdiction=jurisdiction, skip=(page - 1) * per_page, limit=per_page)
+    return schemas.PaginatedResponse(
+        data=[schemas.DigestSummary(**row._asdict()) for row in rows],
+        meta={"page": page, "per_page": per_page, "total": len(rows)}
+    )
+
+@router.get("/{digest_id}", response_model=schemas.APIResponse)
+def get_digest(
+    digest_id: str,
+    format: str = Query("mailto", description="Message format: mailto or whatsapp"),
+    target: str = Query("municipal@city.gov", description="Target email or phone"),
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get a stored digest and its authority message link (volunteers only)."""
+    _require_volunteer(current_user)
+    digest = digests.get_digest(db, digest_id)
+    if not digest:
+        raise HTTPException(status_code=404, detail="Digest not found")
+
+    data = schemas.Digest.model_validate(digest).model_dump()
+    if format == "mailto":
+        data["mailto"] = digests.mailto_link(digest, target)
+    elif format == "whatsapp":
+        data["wa_link"] = digests.whatsapp_link(digest)
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported format")
+    return schemas.APIResponse(data=data)
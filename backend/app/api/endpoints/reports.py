@@ -1,19 +1,110 @@
 from typing import List, Optional
-import uuid
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Query
+import asyncio
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Header, Depends, Query, BackgroundTasks
 from sqlalchemy.orm import Session
 import aiofiles
 import os
 from ...database import get_db
-from ... import crud, models, schemas, auth
+from ... import archive, cpu_pool, crud, events, idempotency, list_cache, media as media_processing, models, schemas, auth, serialization, sharding, verification
+from ...metrics import idempotent_replays_total, upload_bytes_total, upload_deduplicated_total, upload_size_bytes
 
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+async def _save_upload(db: Session, media: UploadFile, name: str, kind: str):
+    """Store an upload unless a file with the same content is already on disk.
+
+    Returns the media record fields and the processed image (None for
+    videos and for reused files, whose thumbnail already exists).
+    """
+    content = await media.read()
+    upload_bytes_total.inc(len(content), kind=kind)
+    upload_size_bytes.observe(len(content), kind=kind)
+    file_type = "image" if media.content_type and media.content_type.startswith("image") else "video"
+
+    # Hash before writing: a retried or re-shared upload reuses the stored file
+    sha256_hash = await asyncio.to_thread(media_processing.content_hash, content)
+    existing = crud.get_media_by_hash(db, sha256_hash)
+    if existing is not None and os.path.exists(existing.file_path):
+        upload_deduplicated_total.inc(kind=kind)
+        filename, file_path, perceptual_hash, processed = (
+            existing.filename, existing.file_path, existing.perceptual_hash, None
+        )
+    else:
+        filename = f"{name}{os.path.splitext(media.filename or '')[1]}"
+        file_path = os.path.join(UPLOAD_DIR, filename)
+        async with aiofiles.open(file_path, 'wb') as f:
+            await f.write(content)
+        # Decode once: the frame feeds the perceptual hash, the thumbnail and inference
+        processed = None
+        if file_type == "image":
+            processed = await cpu_pool.run_async(media_processing.process_upload, content, UPLOAD_DIR, name)
+        perceptual_hash = processed.perceptual_hash if processed else None
+
+    media_data = schemas.MediaFileBase(
+        filename=filename,
+        original_filename=media.filename or "",
+        file_path=file_path,
+        file_type=file_type,
+        file_size=len(content),
+        mime_type=media.content_type or "",
+        sha256_hash=sha256_hash,
+        perceptual_hash=perceptual_hash
+    )
+    return media_data, processed
+
+async def _submit_report(
+    background_tasks: BackgroundTasks,
+    report_data: schemas.ReportCreate,
+    media: Optional[UploadFile],
+    db: Session,
+    current_user: Optional[models.User],
+    report_id: Optional[str] = None
+) -> schemas.APIResponse:
+    """Create the report, or finish ``report_id`` if an earlier attempt already inserted it."""
+    reporter_id = current_user.id if current_user and not report_data.anonymous else None
+    db_report = crud.get_report(db, report_id) if report_id else None
+    if db_report is None:
+        if reporter_id:
+            sharding.replicate_user(db, current_user)
+        db_report = crud.create_report(db, report_data, reporter_id, report_id)
+
+    image_url = None
+    image_sha256 = None
+    image_frame = None
+    if media:
+        # An attempt that failed after the insert may have left the report without its media
+        stored = crud.get_media_files(db, db_report.id)
+        if stored:
+            media_data, processed = stored[0], None
+        else:
+            media_data, processed = await _save_upload(db, media, db_report.id, "report")
+            # The created event is appended by crud.create_report; the attachment is logged with it
+            crud.add_media_file(db, media_data, db_report.id)
+            events.append(db, db_report.id, "media_added", user_id=reporter_id, details={"media_count": 1})
+            db.commit()
+        if media_data.file_type == "image":
+            image_url = verification.media_url(media_data.filename)
+            image_sha256 = media_data.sha256_hash
+            image_frame = processed.frame if processed else None
+
+    # Verify with the ML service after responding; failures leave it queued
+    background_tasks.add_task(verification.verify_report, db_report.id, image_url, image_sha256, image_frame)
+
+    return schemas.APIResponse(
+        message="Report accepted for verification",
+        data={
+            "id": db_report.id,
+            "tracking_url": f"/reports/{db_report.id}",
+            "status": "created"
+        }
+    )
+
 @router.post("/", response_model=schemas.APIResponse)
 async def create_report(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     description: str = Form(""),
     lat: float = Form(...),
@@ -22,10 +113,11 @@ async def create_report(
     anonymous: bool = Form(True),
     reporter_contact: str = Form(None),
     media: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
+    db: Session = Depends(sharding.get_point_db),
     current_user: Optional[models.User] = Depends(auth.get_current_user)
 ):
-    """Create a new report."""
+    """Create a new report; retries with the same Idempotency-Key get the original response."""
     # Create report data
     report_data = schemas.ReportCreate(
         title=title,
@@ -36,139 +128,100 @@ async def create_report(
         anonymous=anonymous,
         reporter_contact=reporter_contact
     )
+    if not idempotency_key:
+        return await _submit_report(background_tasks, report_data, media, db, current_user)
 
-    # Create report in database
-    reporter_id = current_user.id if current_user and not anonymous else None
-    db_report = crud.create_report(db, report_data, reporter_id)
-
-    media_urls = []
-    if media:
-        # Save uploaded file
-        file_extension = os.path.splitext(media.filename or "")[1]
-        filename = f"{db_report.id}{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await media.read()
-            await f.write(content)
-
-        # Create media file record
-        media_data = schemas.MediaFileBase(
-            filename=filename,
-            original_filename=media.filename or "",
-            file_path=file_path,
-            file_type="image" if media.content_type and media.content_type.startswith("image") else "video",
-            file_size=len(content),
-            mime_type=media.content_type or "",
-            sha256_hash=None,  # TODO: Calculate hash
-            perceptual_hash=None  # TODO: Calculate perceptual hash
-        )
-        crud.create_media_file(db, media_data, db_report.id)
-        media_urls.append(f"/uploads/{filename}")
-
-    # Create activity log
-    crud.create_activity(
-        db,
-        schemas.ActivityBase(action="created", details={"media_count": len(media_urls)}),
-        db_report.id,
-        reporter_id
-    )
-
-    # Mock verification and priority updates (in real app, this would be async)
-    crud.update_report(db, db_report.id, schemas.ReportUpdate(
-        verification_score=0.85,
-        verification_labels=["pothole"],
-        priority_score=75,
-        priority_level="high",
-        status="verified"
-    ))
-
-    return schemas.APIResponse(
-        message="Report accepted for verification",
-        data={
-            "id": db_report.id,
-            "tracking_url": f"/reports/{db_report.id}",
-            "status": "created"
-        }
+    key = idempotency.scoped_key(idempotency_key, current_user)
+    fingerprint = idempotency.fingerprint(
+        report_data.model_dump(), media.filename if media else None, media.size if media else None
     )
+    try:
+        stored = idempotency.begin(db, key, fingerprint)
+    except idempotency.IdempotencyError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+    if stored is not None:
+        idempotent_replays_total.inc()
+        return serialization.FastJSONResponse(stored.encode(), headers={"Idempotent-Replayed": "true"})
+
+    try:
+        # Bound to the key before the insert, so a retry never creates a second report
+        report_id = idempotency.reserve_report(db, key)
+        response = await _submit_report(background_tasks, report_data, media, db, current_user, report_id)
+    except BaseException:
+        idempotency.release(db, key)
+        raise
+    idempotency.complete(db, key, fingerprint, response.model_dump_json())
+    return response
 
 @router.get("/", response_model=schemas.PaginatedResponse)
 def list_reports(
     bbox: Optional[str] = Query(None, description="Bounding box: minLng,minLat,maxLng,maxLat"),
-    status: Optional[str] = Query(None, description="Filter by status"),
+    status: Optional[str] = Query(None, description="Filter by status, or 'open' for all unresolved"),
     priority_min: Optional[int] = Query(None, description="Minimum priority score"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(20, ge=1, le=100, description="Items per page"),
     db: Session = Depends(get_db)
 ):
     """List reports with optional filtering."""
-    skip = (page - 1) * per_page
-    reports = crud.get_reports(db, skip=skip, limit=per_page, bbox=bbox, status=status, priority_min=priority_min)
-
-    # Convert to response format
-    report_summaries = []
-    for report in reports:
-        report_summaries.append(schemas.ReportSummary(
-            id=report.id,
-            title=report.title,
-            lat=report.location_rounded_lat or report.lat,
-            lng=report.location_rounded_lng or report.lng,
-            status=report.status,
-            priority_score=report.priority_score,
-            created_at=report.created_at
-        ))
-
-    return schemas.PaginatedResponse(
-        data=report_summaries,
-        meta={
-            "page": page,
-            "per_page": per_page,
-            "total": len(reports)  # TODO: Get actual total count
-        }
+    # Popular viewports are kept warm by the list cache; see list_cache.py
+    query = list_cache.list_query(bbox, status, priority_min, page, per_page)
+    return serialization.FastJSONResponse(list_cache.report_lists.fetch(db, query))
+
+@router.get("/search", response_model=schemas.PaginatedResponse)
+def search_reports(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to match in titles and descriptions"),
+    bbox: Optional[str] = Query(None, description="Bounding box: minLng,minLat,maxLng,maxLat"),
+    page: int = Query(1, ge=1, description="Page number"),
+    per_page: int = Query(20, ge=1, le=100, description="Items per page"),
+    db: Session = Depends(get_db)
+):
+    """Search reports by text, ranked by relevance, priority and recency."""
+    rows = crud.search_report_rows(
+        db, serialization.REPORT_SUMMARY_COLUMNS, q, skip=(page - 1) * per_page, limit=per_page, bbox=bbox
     )
+    return serialization.FastJSONResponse({
+        "data": serialization.summary_rows_to_dicts(rows),
+        "meta": {"page": page, "per_page": per_page, "total": len(rows)}
+    })
+
+@router.get("/nearby", response_model=List[schemas.NearbyReport])
+def nearby_reports(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=50, description="Maximum number of reports"),
+    radius_m: float = Query(1000, gt=0, le=50000, description="Search radius in meters"),
+    status: Optional[str] = Query(None, description="Filter by status, or 'open' for all unresolved"),
+    db: Session = Depends(get_db)
+):
+    """Reports closest to a point, nearest first (e.g. similar issues before submitting)."""
+    found = crud.nearby_report_rows(
+        db, serialization.REPORT_SUMMARY_COLUMNS, lat, lng, k=k, radius_m=radius_m, status=status
+    )
+    data = serialization.summary_rows_to_dicts(row for _, row in found)
+    for item, (distance, _) in zip(data, found):
+        item["distance_m"] = round(distance, 1)
+    return serialization.FastJSONResponse(data)
 
 @router.get("/{report_id}", response_model=schemas.Report)
-def get_report(report_id: str, db: Session = Depends(get_db)):
+def get_report(report_id: str, db: Session = Depends(sharding.get_report_db)):
     """Get a specific report."""
-    db_report = crud.get_report(db, report_id)
-    if not db_report:
-        raise HTTPException(status_code=404, detail="Report not found")
+    row = crud.get_report_row(db, report_id, serialization.REPORT_DETAIL_COLUMNS)
+    if row is None:
+        # Old resolved reports are read back from the archive
+        archived = archive.get_report(db, report_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Report not found")
+        return serialization.FastJSONResponse(archived)
 
-    # Get media files
-    media_files = crud.get_media_files(db, report_id)
-    media_urls = [f"/uploads/{mf.filename}" for mf in media_files]
-
-    return schemas.Report(
-        id=db_report.id,
-        title=db_report.title,
-        description=db_report.description,
-        lat=db_report.lat,
-        lng=db_report.lng,
-        accuracy_m=db_report.accuracy_m,
-        location_rounded_lat=db_report.location_rounded_lat,
-        location_rounded_lng=db_report.location_rounded_lng,
-        status=db_report.status,
-        priority_score=db_report.priority_score,
-        priority_level=db_report.priority_level,
-        verification_score=db_report.verification_score,
-        verification_labels=db_report.verification_labels or [],
-        is_duplicate=db_report.is_duplicate,
-        duplicate_of_id=db_report.duplicate_of_id,
-        anonymous=db_report.anonymous,
-        reporter_id=db_report.reporter_id,
-        assigned_to_id=db_report.assigned_to_id,
-        created_at=db_report.created_at,
-        updated_at=db_report.updated_at,
-        resolved_at=db_report.resolved_at,
-        media_urls=media_urls
-    )
+    media_urls = [f"/uploads/{filename}" for filename in crud.get_media_filenames(db, report_id)]
+    return serialization.FastJSONResponse(serialization.detail_row_to_dict(row, media_urls))
 
 @router.post("/{report_id}/message", response_model=schemas.APIResponse)
 def generate_authority_message(
     report_id: str,
     format: str = Query("mailto", description="Message format: mailto or whatsapp"),
     target: str = Query("municipal@city.gov", description="Target email or phone"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(sharding.get_report_db)
 ):
     """Generate authority message."""
     db_report = crud.get_report(db, report_id)
@@ -200,13 +253,14 @@ Please acknowledge receipt and provide expected ETA for resolution.
 def claim_report(
     report_id: str,
     notes: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(sharding.get_report_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Claim a report for resolution (volunteers only)."""
     if current_user.role not in ["volunteer", "admin"]:
         raise HTTPException(status_code=403, detail="Only volunteers can claim reports")
 
+    sharding.replicate_user(db, current_user)
     db_report = crud.claim_report(db, report_id, current_user.id, notes)
     if not db_report:
         raise HTTPException(status_code=400, detail="Report could not be claimed")
@@ -221,7 +275,7 @@ async def resolve_report(
     report_id: str,
     resolution_notes: str = Form(...),
     media: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(sharding.get_report_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Resolve a report (assigned volunteer only)."""
@@ -231,22 +285,7 @@ async def resolve_report(
 
     # Handle additional media if provided
     if media:
-        file_extension = os.path.splitext(media.filename or "")[1]
-        filename = f"{report_id}_resolution{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await media.read()
-            await f.write(content)
-
-        media_data = schemas.MediaFileBase(
-            filename=filename,
-            original_filename=media.filename or "",
-            file_path=file_path,
-            file_type="image" if media.content_type and media.content_type.startswith("image") else "video",
-            file_size=len(content),
-            mime_type=media.content_type or ""
-        )
+        media_data, _ = await _save_upload(db, media, f"{report_id}_resolution", "resolution")
         crud.create_media_file(db, media_data, report_id)
 
     db_report = crud.resolve_report(db, report_id, current_user.id, resolution_notes)
@@ -261,10 +300,11 @@ async def resolve_report(
 @router.post("/{report_id}/confirm", response_model=schemas.APIResponse)
 def confirm_report(
     report_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(sharding.get_report_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Confirm a report (citizen verification)."""
+    sharding.replicate_user(db, current_user)
     db_report = crud.confirm_report(db, report_id, current_user.id)
     if not db_report:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from sqlalchemy.orm import Session
+from ...database import get_db
+from ... import models, schemas, auth, stats
+
+router = APIRouter()
+
+@router.get("/", response_model=schemas.DashboardStats)
+def get_dashboard_stats(
+    neighborhood_limit: int = Query(50, ge=1, le=500, description="Max neighborhoods returned, busiest first"),
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Report counts by status, priority, category and neighborhood (admin only)."""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+
+    return stats.get_stats(db, neighborhood_limit=neighborhood_limit)
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
+from ...database import get_db
+from ... import models, schemas, auth, notifications
+
+router = APIRouter()
+
+@router.post("/", response_model=schemas.APIResponse)
+def create_subscription(
+    subscription: schemas.SubscriptionCreate,
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Subscribe to alerts for high-priority reports inside a circle or polygon."""
+    try:
+        db_subscription = notifications.create_subscription(db, current_user.id, subscription)
+    except notifications.SubscriptionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.APIResponse(
+        message="Subscription created",
+        data=schemas.Subscription.model_validate(db_subscription)
+    )
+
+@router.get("/", response_model=schemas.APIResponse)
+def list_subscriptions(
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """List the current user's subscriptions."""
+    rows = notifications.get_subscriptions(db, current_user.id)
+    return schemas.APIResponse(data=[schemas.Subscription.model_validate(row) for row in rows])
+
+@router.delete("/{subscription_id}", response_model=schemas.APIResponse)
+def delete_subscription(
+    subscription_id: str,
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Stop alerts for one of the current user's subscriptions."""
+    if not notifications.delete_subscription(db, current_user.id, subscription_id):
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    return schemas.APIResponse(message="Subscription deleted")
+
+@router.get("/notifications", response_model=schemas.PaginatedResponse)
+def list_notifications(
+    page: int = Query(1, ge=1, description="Page number"),
+    per_page: int = Query(20, ge=1, le=100, description="Items per page"),
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """The current user's alerts, newest first."""
+    rows = notifications.get_notifications(db, current_user.id, skip=(page - 1) * per_page, limit=per_page)
+    return schemas.PaginatedResponse(
+        data=[schemas.Notification.model_validate(row) for row in rows],
+        meta={"page": page, "per_page": per_page, "total": len(rows)}
+    )
@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException, UploadFile, File, Header, Depends
+from sqlalchemy.orm import Session
+from typing import Optional
+import asyncio
+import aiofiles
+import os
+import uuid
+from ...database import get_db
+from ... import auth, idempotency, media as media_processing, models, schemas, serialization, sync
+from ...metrics import idempotent_replays_total, upload_bytes_total, upload_deduplicated_total, upload_size_bytes
+from .reports import UPLOAD_DIR
+
+router = APIRouter()
+
+@router.post("/", response_model=schemas.APIResponse)
+def sync_operations(
+    request: schemas.SyncRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH),
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Apply queued offline operations and return the reports changed since the last sync."""
+    if len(request.operations) > sync.SYNC_MAX_OPERATIONS:
+        raise HTTPException(status_code=413, detail=f"At most {sync.SYNC_MAX_OPERATIONS} operations per sync")
+    try:
+        sync.decode_token(request.token)
+    except sync.InvalidToken as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    key = fingerprint = None
+    if idempotency_key:
+        # Confirmations are not idempotent on their own; a retried batch must not apply twice
+        key = idempotency.scoped_key(f"sync:{idempotency_key}", current_user)
+        fingerprint = idempotency.fingerprint(request.model_dump())
+        try:
+            stored = idempotency.begin(db, key, fingerprint)
+        except idempotency.IdempotencyError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+        if stored is not None:
+            idempotent_replays_total.inc()
+            return serialization.FastJSONResponse(stored.encode(), headers={"Idempotent-Replayed": "true"})
+
+    try:
+        results = sync.apply_operations(db, current_user, request.operations, UPLOAD_DIR)
+        data = {"results": results, **sync.changes_since(db, request.token, request.bbox)}
+    except BaseException:
+        if key:
+            idempotency.release(db, key)
+        raise
+    response = schemas.APIResponse(data=data)
+    if key:
+        idempotency.complete(db, key, fingerprint, response.model_dump_json())
+    return response
+
+@router.post("/uploads", response_model=schemas.APIResponse)
+async def upload_media(
+    media: UploadFile = File(...),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Store a photo for later sync operations; returns the ``ref`` to send with them."""
+    content = await media.read()
+    upload_bytes_total.inc(len(content), kind="sync")
+    upload_size_bytes.observe(len(content), kind="sync")
+    sha256_hash = await asyncio.to_thread(media_processing.content_hash, content)
+    ref = sync.media_ref_name(sha256_hash, media.filename)
+    file_path = os.path.join(UPLOAD_DIR, ref)
+    # Stored by content, so a re-sent upload is not written again
+    if os.path.exists(file_path):
+        upload_deduplicated_total.inc(kind="sync")
+    else:
+        # Written aside and renamed, so a concurrent upload of the same file never sees it half written
+        partial_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        async with aiofiles.open(partial_path, 'wb') as f:
+            await f.write(content)
+        os.replace(partial_path, file_path)
+    return schemas.APIResponse(data={"ref": ref, "size": len(content)})
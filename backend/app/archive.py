@@ -0,0 +1,204 @@
+"""
+Archival of resolved reports.
+
+Reports resolved more than ARCHIVE_AFTER_DAYS ago are moved out of the hot
+tables in batches. The report row, its media_files and its activities
+become one zlib-compressed JSON record in ``report_archive``; the uploads
+are copied to cold storage (see cold_storage.py) and deleted locally once
+the move has committed. The hot tables, their indexes and the uploads
+directory then only hold the working set: open and recently resolved
+reports.
+
+Archived reports stay readable: GET /reports/{id} falls back to
+``get_report`` here, and shard lookups probe the archive as well. They
+still count in the dashboard (stats.rebuild folds them in) but leave
+search and the event stream. Reports that another report is marked a
+duplicate of stay hot.
+"""
+
+import logging
+import os
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import events, models, search, serialization
+from .cold_storage import LocalColdStorage, cold_storage
+from .media import THUMBNAIL_DIR
+from .sharding import shard_router
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "500"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "86400"))
+ARCHIVE_COMPRESSION_LEVEL = 6
+
+REPORT_FIELDS = [column.name for column in models.Report.__table__.columns]
+ArchivedReport = namedtuple("ArchivedReport", REPORT_FIELDS)
+
+_MEDIA = models.MediaFile.__table__
+_ACTIVITIES = models.Activity.__table__
+# The event state is dropped: the archived report row already is the folded state
+_ACTIVITY_COLUMNS = (
+    _ACTIVITIES.c.id, _ACTIVITIES.c.report_id, _ACTIVITIES.c.seq, _ACTIVITIES.c.action,
+    _ACTIVITIES.c.details, _ACTIVITIES.c.user_id, _ACTIVITIES.c.created_at,
+)
+
+
+def _compress(record: Dict[str, Any]) -> bytes:
+    return zlib.compress(orjson.dumps(record), ARCHIVE_COMPRESSION_LEVEL)
+
+
+def _decompress(data: bytes) -> Dict[str, Any]:
+    return orjson.loads(zlib.decompress(data))
+
+
+def _candidates(db: Session, cutoff: datetime, limit: int) -> List[str]:
+    """Oldest resolved reports past ``cutoff`` that no other report points at."""
+    referenced = select(models.Report.duplicate_of_id).where(models.Report.duplicate_of_id.isnot(None))
+    rows = (
+        db.query(models.Report.id)
+        .filter(models.Report.resolved_at.isnot(None), models.Report.resolved_at < cutoff,
+                models.Report.status == "resolved", models.Report.id.notin_(referenced))
+        .order_by(models.Report.resolved_at)
+        .limit(limit)
+    )
+    return [report_id for (report_id,) in rows]
+
+
+def _to_cold(media: Dict[str, Any], storage: LocalColdStorage, local_files: List[Tuple[str, Optional[str]]]) -> None:
+    """Copy an upload (and its thumbnail) to cold storage; records its key in ``media``."""
+    key = f"media/{media['filename']}"
+    if os.path.exists(media["file_path"]):
+        storage.put(key, media["file_path"])
+        local_files.append((media["file_path"], media["sha256_hash"]))
+        stem = os.path.splitext(media["filename"])[0]
+        thumbnail = os.path.join(os.path.dirname(media["file_path"]), THUMBNAIL_DIR, f"{stem}.jpg")
+        if os.path.exists(thumbnail):
+            storage.put(f"thumbnails/{stem}.jpg", thumbnail)
+            local_files.append((thumbnail, media["sha256_hash"]))
+    elif not storage.exists(key):
+        logger.warning("Archiving %s without its missing upload %s", media["report_id"], media["file_path"])
+        key = None
+    media["cold_key"] = key
+
+
+def _still_referenced(file_path: str, sha256_hash: Optional[str]) -> bool:
+    """Whether a hot media row in any shard still uses this file (uploads are deduplicated by content)."""
+    for shard in shard_router.shards:
+        with shard_router.session(shard) as db:
+            query = db.query(models.MediaFile.id)
+            if sha256_hash:
+                query = query.filter(models.MediaFile.sha256_hash == sha256_hash)
+            else:
+                query = query.filter(models.MediaFile.file_path == file_path)
+            if query.first() is not None:
+                return True
+    return False
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH,
+                  storage: LocalColdStorage = cold_storage) -> int:
+    """Move one batch of reports resolved before ``cutoff`` into the archive; returns how many."""
+    report_ids = _candidates(db, cutoff, batch_size)
+    if not report_ids:
+        return 0
+
+    conn = db.connection()
+    reports = conn.execute(select(models.Report.__table__).where(models.Report.id.in_(report_ids))).all()
+    media: Dict[str, List[dict]] = {}
+    for row in conn.execute(select(_MEDIA).where(_MEDIA.c.report_id.in_(report_ids))):
+        media.setdefault(row.report_id, []).append(row._asdict())
+    activities: Dict[str, List[dict]] = {}
+    for row in conn.execute(select(*_ACTIVITY_COLUMNS).where(_ACTIVITIES.c.report_id.in_(report_ids))
+                            .order_by(_ACTIVITIES.c.seq)):
+        activities.setdefault(row.report_id, []).append(row._asdict())
+
+    local_files: List[Tuple[str, Optional[str]]] = []
+    records = []
+    for report in reports:
+        report_media = media.get(report.id, [])
+        for item in report_media:
+            _to_cold(item, storage, local_files)
+        records.append({
+            "report_id": report.id,
+            "region": report.region,
+            "resolved_at": report.resolved_at,
+            "data": _compress({
+                "report": events.report_state(report),
+                "media": report_media,
+                "activities": activities.get(report.id, []),
+            }),
+        })
+
+    search.remove_reports(db, report_ids)
+    for table, column in (
+        (_ACTIVITIES, _ACTIVITIES.c.report_id),
+        (_MEDIA, _MEDIA.c.report_id),
+        (models.ReportSnapshot.__table__, models.ReportSnapshot.report_id),
+        (models.Report.__table__, models.Report.id),
+    ):
+        db.execute(table.delete().where(column.in_(report_ids)))
+    db.execute(models.ReportArchive.__table__.insert(), records)
+    db.commit()
+
+    # Only now is the archive the copy of record; shared uploads stay while hot rows use them
+    for path, sha256_hash in local_files:
+        if os.path.exists(path) and not _still_referenced(path, sha256_hash):
+            os.remove(path)
+    return len(records)
+
+
+def archive(db: Session, now: Optional[datetime] = None, days: float = ARCHIVE_AFTER_DAYS,
+            batch_size: int = ARCHIVE_BATCH, storage: LocalColdStorage = cold_storage) -> int:
+    """Archive every report of ``db``'s shard resolved more than ``days`` ago; returns how many."""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    archived = 0
+    while True:
+        moved = archive_batch(db, cutoff, batch_size, storage)
+        if not moved:
+            return archived
+        archived += moved
+
+
+def get_record(db: Session, report_id: str) -> Optional[Dict[str, Any]]:
+    """The archived report, media and activities, as stored."""
+    data = db.query(models.ReportArchive.data).filter(models.ReportArchive.report_id == report_id).scalar()
+    return _decompress(data) if data is not None else None
+
+
+def get_report(db: Session, report_id: str, storage: LocalColdStorage = cold_storage) -> Optional[Dict[str, Any]]:
+    """An archived report shaped like the hot detail response, or None."""
+    record = get_record(db, report_id)
+    if record is None:
+        return None
+    values = events.row_values(record["report"])
+    media_urls = [
+        storage.url(item["cold_key"]) if item.get("cold_key") else f"/uploads/{item['filename']}"
+        for item in record["media"]
+    ]
+    row = tuple(values[field] for field in serialization.REPORT_DETAIL_FIELDS)
+    return serialization.detail_row_to_dict(row, media_urls)
+
+
+def iter_reports(db: Session, batch_size: int = ARCHIVE_BATCH) -> Iterator[ArchivedReport]:
+    """Every archived report row, for rebuilds that must still count them."""
+    for (data,) in db.query(models.ReportArchive.data).yield_per(batch_size):
+        yield ArchivedReport(**events.row_values(_decompress(data)["report"]))
+
+
+def archive_job() -> int:
+    """Archive old resolved reports in every shard."""
+    archived = 0
+    for shard in shard_router.shards:
+        with shard_router.session(shard) as db:
+            archived += archive(db)
+    if archived:
+        logger.info("Archived %d resolved reports", archived)
+    return archived
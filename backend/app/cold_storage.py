@@ -0,0 +1,48 @@
+"""
+Cold storage for archived media.
+
+Archived reports' uploads leave the local uploads directory for a cheaper
+tier. ``LocalColdStorage`` is the stand-in used until an object store is
+configured: it keeps files under COLD_STORAGE_DIR, which main.py serves at
+COLD_STORAGE_URL. Another backend only needs the same three methods.
+"""
+
+import os
+import shutil
+import uuid
+
+COLD_STORAGE_DIR = os.getenv("COLD_STORAGE_DIR", "cold")
+COLD_STORAGE_URL = os.getenv("COLD_STORAGE_URL", "/cold")
+
+
+class LocalColdStorage:
+    """Files under a local directory, addressed by relative keys."""
+
+    def __init__(self, root: str = COLD_STORAGE_DIR, base_url: str = COLD_STORAGE_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Invalid cold storage key: {key}")
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, source_path: str) -> None:
+        """Copy ``source_path`` in under ``key``; the caller deletes the source once it no longer needs it."""
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f"{path}.{uuid.uuid4().hex}.part"
+        shutil.copyfile(source_path, partial_path)
+        os.replace(partial_path, path)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+cold_storage = LocalColdStorage()
@@ -0,0 +1,79 @@
+"""
+Process pool for CPU-bound request work (bcrypt, upload hashing and decoding).
+
+Each API worker process owns one pool of CPU_POOL_WORKERS processes, started
+in the lifespan and shared by all of that worker's requests, so heavy hashing
+never competes with the event loop or request threads for the GIL. With
+CPU_POOL_WORKERS=0 (the default for local runs) work runs inline.
+
+Task functions live in this module and app.media, which import nothing
+heavy at module level; pool processes are started with forkserver/spawn
+and only import what the tasks need.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "0"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start(workers: int = CPU_POOL_WORKERS) -> None:
+    """Create the pool (no-op when disabled or already running)."""
+    global _pool
+    if workers <= 0 or _pool is not None:
+        return
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    logger.info("Started CPU pool with %d processes", workers)
+
+
+def shutdown() -> None:
+    """Let queued tasks finish, then stop the pool processes."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def run(fn: Callable, *args: Any) -> Any:
+    """Run ``fn`` in the pool from sync code (blocks the calling thread, not the GIL)."""
+    if _pool is None:
+        return fn(*args)
+    return _pool.submit(fn, *args).result()
+
+
+async def run_async(fn: Callable, *args: Any) -> Any:
+    """Run ``fn`` in the pool, or in the thread pool when the process pool is disabled."""
+    if _pool is None:
+        from fastapi.concurrency import run_in_threadpool
+
+        return await run_in_threadpool(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(_pool, fn, *args)
+
+
+# Task functions (must be importable by name in the pool processes)
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """bcrypt context, built on first use so passlib stays out of startup."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return get_pwd_context().verify(plain_password, hashed_password)
@@ -1,9 +1,15 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
 from sqlalchemy import and_, or_, func
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence, Tuple
+import math
 import uuid
 from datetime import datetime
-from . import models, schemas, auth
+from . import models, schemas, auth, events, report_index, search, stats
+from .geo import (
+    GEOHASH_ALPHABET, POINT_PRECISION, geohash_block, geohash_block_radius_m, geohash_cells, geohash_encode,
+    geohash_ranges, haversine_m, parse_bbox, radius_bbox, region_for,
+)
+from .sharding import merge_ranked, rank_key, shard_router
 
 # User CRUD operations
 def create_user(db: Session, user: schemas.UserCreate) -> models.User:
@@ -33,44 +39,50 @@ def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.User]
     return db.query(models.User).offset(skip).limit(limit).all()
 
 # Report CRUD operations
-def create_report(db: Session, report: schemas.ReportCreate, reporter_id: Optional[str] = None) -> models.Report:
-    """Create a new report."""
+def create_report(
+    db: Session, report: schemas.ReportCreate, reporter_id: Optional[str] = None, report_id: Optional[str] = None
+) -> models.Report:
+    """Create a new report, with ``report_id`` if the caller reserved one."""
     # Round coordinates for privacy (to nearest 50 meters)
     rounded_lat = round(report.lat, 4)  # ~11m precision
     rounded_lng = round(report.lng, 4)  # ~11m precision
 
     db_report = models.Report(
-        id=str(uuid.uuid4()),
+        id=report_id or str(uuid.uuid4()),
         title=report.title,
         description=report.description,
         lat=report.lat,
         lng=report.lng,
         location_rounded_lat=rounded_lat,
         location_rounded_lng=rounded_lng,
+        region=region_for(report.lat, report.lng),
+        geohash=geohash_encode(rounded_lat, rounded_lng, POINT_PRECISION),
         accuracy_m=report.accuracy_m,
         anonymous=report.anonymous,
-        reporter_id=reporter_id
+        reporter_id=reporter_id,
+        # Set here rather than by the server so the created event carries it
+        created_at=datetime.utcnow()
     )
     db.add(db_report)
+    events.record(db, db_report, "created", reporter_id)
+    stats.record_change(db, None, db_report)
+    search.index_report(db, db_report)
     db.commit()
     db.refresh(db_report)
+    shard_router.remember(db_report.id, shard_router.shard_for_region(db_report.region))
     return db_report
 
 def get_report(db: Session, report_id: str) -> Optional[models.Report]:
     """Get a report by ID."""
     return db.query(models.Report).filter(models.Report.id == report_id).first()
 
-def get_reports(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+def _filter_reports(
+    query,
     bbox: Optional[str] = None,
     status: Optional[str] = None,
     priority_min: Optional[int] = None
-) -> List[models.Report]:
-    """Get reports with optional filtering."""
-    query = db.query(models.Report)
-
+):
+    """Apply the list filters and default ordering to a reports query."""
     # Bounding box filter
     if bbox:
         try:
@@ -86,8 +98,11 @@ def get_reports(
         except ValueError:
             pass  # Invalid bbox, ignore filter
 
-    # Status filter
-    if status:
+    # Status filter; "open" means anything not yet resolved
+    if status == "open":
+        # Same predicate text as the partial index so planners can match it
+        query = query.filter(models.UNRESOLVED_REPORTS)
+    elif status:
         query = query.filter(models.Report.status == status)
 
     # Priority filter
@@ -95,12 +110,224 @@ def get_reports(
         query = query.filter(models.Report.priority_score >= priority_min)
 
     # Order by priority and creation date
-    query = query.order_by(
+    return query.order_by(
         models.Report.priority_score.desc(),
         models.Report.created_at.desc()
     )
 
-    return query.offset(skip).limit(limit).all()
+def get_reports(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    bbox: Optional[str] = None,
+    status: Optional[str] = None,
+    priority_min: Optional[int] = None
+) -> List[models.Report]:
+    """Get reports with optional filtering.
+
+    Only the summary columns are loaded up front; ``description`` and
+    ``verification_labels`` are deferred until first accessed.
+    """
+    shards = shard_router.shards_for_bbox(parse_bbox(bbox))
+    if len(shards) > 1:
+        # Rows from other shards outlive their sessions, so nothing is deferred
+        per_shard = shard_router.scatter(shards, lambda session: _filter_reports(
+            session.query(models.Report), bbox, status, priority_min
+        ).limit(skip + limit).all(), db)
+        return merge_ranked(per_shard, lambda r: rank_key(r.priority_score, r.created_at), skip, limit)
+
+    def query(session: Session) -> List[models.Report]:
+        return _filter_reports(session.query(models.Report).options(
+            defer(models.Report.description),
+            defer(models.Report.verification_labels),
+        ), bbox, status, priority_min).offset(skip).limit(limit).all()
+    return shard_router.scatter(shards, query, db)[0]
+
+def get_report_rows(
+    db: Session,
+    columns: Sequence[Any],
+    skip: int = 0,
+    limit: int = 100,
+    bbox: Optional[str] = None,
+    status: Optional[str] = None,
+    priority_min: Optional[int] = None
+) -> List[Tuple]:
+    """Get only ``columns`` of the filtered reports, as plain tuples.
+
+    With sharding, only shards intersecting ``bbox`` are queried; each returns
+    its top ``skip + limit`` rows and the ranked lists are merged. ``columns``
+    must then include priority_score and created_at.
+    """
+    # Open-report filters are ranked in memory; only the page is read here
+    ranked = report_index.open_reports.search(bbox, status, priority_min, skip, limit)
+    if ranked is not None:
+        return _indexed_rows(db, columns, ranked, bbox, status, priority_min)
+
+    shards = shard_router.shards_for_bbox(parse_bbox(bbox))
+    if len(shards) == 1:
+        return shard_router.scatter(shards, lambda session: [
+            tuple(row) for row in
+            _filter_reports(session.query(*columns), bbox, status, priority_min).offset(skip).limit(limit)
+        ], db)[0]
+
+    priority_at = _column_position(columns, models.Report.priority_score)
+    created_at = _column_position(columns, models.Report.created_at)
+    per_shard = shard_router.scatter(shards, lambda session: [
+        tuple(row) for row in _filter_reports(session.query(*columns), bbox, status, priority_min).limit(skip + limit)
+    ], db)
+    return merge_ranked(per_shard, lambda row: rank_key(row[priority_at], row[created_at]), skip, limit)
+
+def _indexed_rows(
+    db: Session,
+    columns: Sequence[Any],
+    ranked: List[Tuple[str, int]],
+    bbox: Optional[str],
+    status: Optional[str],
+    priority_min: Optional[int]
+) -> List[Tuple]:
+    """``columns`` of the reports the index ranked, in its order.
+
+    Rows are read by primary key and the list filters checked again here, so
+    a report changed since the index last saw it is left out rather than
+    listed with its current values.
+    """
+    if not ranked:
+        return []
+    id_at = _column_position(columns, models.Report.id)
+    bounds = parse_bbox(bbox)
+    by_shard: Dict[int, List[str]] = {}
+    for report_id, shard_position in ranked:
+        by_shard.setdefault(shard_position, []).append(report_id)
+    found: Dict[str, Tuple] = {}
+    for shard_position, report_ids in by_shard.items():
+        with shard_router.session(shard_router.shards[shard_position], db) as session:
+            query = session.query(*columns, *_RECHECK_COLUMNS).filter(models.Report.id.in_(report_ids))
+            for row in query:
+                row_status, lat, lng, priority_score = row[len(columns):]
+                if row_status == "resolved" or (status != "open" and row_status != status):
+                    continue
+                if bounds and (lat is None or lng is None or not
+                               (bounds[1] <= lat <= bounds[3] and bounds[0] <= lng <= bounds[2])):
+                    continue
+                if priority_min is not None and (priority_score is None or priority_score < priority_min):
+                    continue
+                found[row[id_at]] = tuple(row[:len(columns)])
+    return [found[report_id] for report_id, _ in ranked if report_id in found]
+
+# Fields _indexed_rows re-checks the list filters against
+_RECHECK_COLUMNS = (
+    models.Report.status,
+    models.Report.location_rounded_lat,
+    models.Report.location_rounded_lng,
+    models.Report.priority_score,
+)
+
+def _column_position(columns: Sequence[Any], column: Any) -> int:
+    for position, candidate in enumerate(columns):
+        if candidate is column:
+            return position
+    raise ValueError(f"Sharded list queries must select {column}")
+
+def search_report_rows(
+    db: Session,
+    columns: Sequence[Any],
+    q: str,
+    skip: int = 0,
+    limit: int = 20,
+    bbox: Optional[str] = None,
+) -> List[Tuple]:
+    """Reports matching every term of ``q``, best combined score first (see app.search).
+
+    ``columns`` must include priority_score and created_at.
+    """
+    terms = search.query_terms(q)
+    if not terms:
+        return []
+    priority_at = _column_position(columns, models.Report.priority_score)
+    created_at = _column_position(columns, models.Report.created_at)
+    candidates = max(search.SEARCH_CANDIDATES, skip + limit)
+    now = datetime.utcnow()
+
+    def query(session: Session) -> List[Tuple]:
+        matched, relevance = search.match(session.query(*columns), session, terms)
+        matched = matched.add_columns(relevance.label("relevance"))
+        rows = _filter_reports(matched, bbox).order_by(None).order_by(relevance.desc()).limit(candidates)
+        scored = [
+            (search.combined_score(row[-1], row[priority_at], row[created_at], now), tuple(row[:-1]))
+            for row in rows
+        ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored
+
+    per_shard = shard_router.scatter(shard_router.shards_for_bbox(parse_bbox(bbox)), query, db)
+    return [row for _, row in merge_ranked(per_shard, lambda item: item[0], skip, limit)]
+
+# Nearby search starts from the 3x3 block of ~150m cells around the point
+NEARBY_START_PRECISION = 7
+# Most cells one query may list to cover a search ring
+NEARBY_MAX_CELLS = 32
+
+def _covering_cells(bbox: Tuple[float, float, float, float]) -> List[str]:
+    """The finest geohash cells covering ``bbox`` that fit in NEARBY_MAX_CELLS."""
+    for precision in range(NEARBY_START_PRECISION, 0, -1):
+        cells = geohash_cells(bbox, precision, NEARBY_MAX_CELLS)
+        if cells is not None:
+            return cells
+    return list(GEOHASH_ALPHABET)
+
+def nearby_report_rows(
+    db: Session,
+    columns: Sequence[Any],
+    lat: float,
+    lng: float,
+    k: int = 10,
+    radius_m: float = 1000.0,
+    status: Optional[str] = None,
+) -> List[Tuple[float, Tuple]]:
+    """The ``k`` reports closest to a point within ``radius_m``, as (distance_m, row), nearest first.
+
+    Geohash ring expansion over the geohash index: start with the 3x3 block
+    of cells around the point and double the searched radius until ``k``
+    hits lie inside it or it reaches ``radius_m``. Distances use the rounded
+    (public) location; ``columns`` must include the id.
+    """
+    id_at = _column_position(columns, models.Report.id)
+    rounded_lat, rounded_lng = models.Report.location_rounded_lat, models.Report.location_rounded_lng
+    # Equirectangular distance: cheap to rank by in SQL, re-checked with haversine
+    lng_scale = math.cos(math.radians(lat)) ** 2
+    approx_distance = (rounded_lat - lat) * (rounded_lat - lat) + (rounded_lng - lng) * (rounded_lng - lng) * lng_scale
+
+    def nearest(session: Session, cells: List[str]) -> List[Tuple[float, str]]:
+        """(distance, id) of the closest candidates in ``cells``, read from ix_reports_geohash_location."""
+        query = session.query(models.Report.id, rounded_lat, rounded_lng).filter(
+            or_(*[models.Report.geohash.between(first, last + "~") for first, last in geohash_ranges(cells)])
+        )
+        query = _filter_reports(query, None, status).order_by(None).order_by(approx_distance).limit(2 * k)
+        found = [(haversine_m(lat, lng, row_lat, row_lng), report_id) for report_id, row_lat, row_lng in query]
+        found.sort()
+        return [item for item in found if item[0] <= radius_m][:k]
+
+    def query(session: Session) -> List[Tuple[float, Tuple]]:
+        searched = geohash_block_radius_m(lat, NEARBY_START_PRECISION)
+        found = nearest(session, geohash_block(lat, lng, NEARBY_START_PRECISION))
+        # Exact once the k-th hit is inside the searched disc, or the disc is the whole radius
+        while searched < radius_m and not (len(found) >= k and found[-1][0] <= searched):
+            searched = min(searched * 2, radius_m)
+            found = nearest(session, _covering_cells(radius_bbox(lat, lng, searched)))
+        if not found:
+            return []
+        rows = {row[id_at]: tuple(row) for row in session.query(*columns).filter(
+            models.Report.id.in_([report_id for _, report_id in found])
+        )}
+        return [(distance, rows[report_id]) for distance, report_id in found if report_id in rows]
+
+    per_shard = shard_router.scatter(shard_router.shards_for_bbox(radius_bbox(lat, lng, radius_m)), query, db)
+    return merge_ranked(per_shard, lambda item: -item[0], 0, k)
+
+def get_report_row(db: Session, report_id: str, columns: Sequence[Any]) -> Optional[Tuple]:
+    """Get only ``columns`` of a single report, as a plain tuple."""
+    row = db.query(*columns).filter(models.Report.id == report_id).first()
+    return tuple(row) if row is not None else None
 
 def update_report(db: Session, report_id: str, updates: schemas.ReportUpdate) -> Optional[models.Report]:
     """Update a report."""
@@ -108,11 +335,16 @@ def update_report(db: Session, report_id: str, updates: schemas.ReportUpdate) ->
     if not db_report:
         return None
 
+    before = stats.report_keys(db_report)
     update_data = updates.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_report, field, value)
 
     db_report.updated_at = datetime.utcnow()
+    events.record(db, db_report, "verified" if update_data.get("status") == "verified" else "updated")
+    stats.record_change(db, before, db_report)
+    if "title" in update_data or "description" in update_data:
+        search.index_report(db, db_report)
     db.commit()
     db.refresh(db_report)
     return db_report
@@ -123,91 +355,92 @@ def claim_report(db: Session, report_id: str, user_id: str, notes: Optional[str]
     if not db_report or db_report.assigned_to_id:
         return None
 
-    db_report.assigned_to_id = user_id
-    db_report.status = "in_progress"
-    db_report.updated_at = datetime.utcnow()
-
-    # Create activity log
-    activity = models.Activity(
-        id=str(uuid.uuid4()),
-        report_id=report_id,
-        user_id=user_id,
-        action="claimed",
-        details={"notes": notes}
-    )
-    db.add(activity)
-
+    apply_claim(db, db_report, user_id, notes)
     db.commit()
     db.refresh(db_report)
     return db_report
 
+def apply_claim(db: Session, db_report: models.Report, user_id: str, notes: Optional[str] = None) -> None:
+    """Claim ``db_report`` without committing; the caller has checked it is unassigned."""
+    before = stats.report_keys(db_report)
+    db_report.assigned_to_id = user_id
+    db_report.status = "in_progress"
+    db_report.updated_at = datetime.utcnow()
+    events.record(db, db_report, "claimed", user_id, {"notes": notes})
+    stats.record_change(db, before, db_report)
+
 def resolve_report(db: Session, report_id: str, user_id: str, resolution_notes: str) -> Optional[models.Report]:
     """Resolve a report."""
     db_report = get_report(db, report_id)
     if not db_report or db_report.assigned_to_id != user_id:
         return None
 
-    db_report.status = "resolved"
-    db_report.resolved_at = datetime.utcnow()
-    db_report.updated_at = datetime.utcnow()
-
-    # Create activity log
-    activity = models.Activity(
-        id=str(uuid.uuid4()),
-        report_id=report_id,
-        user_id=user_id,
-        action="resolved",
-        details={"resolution_notes": resolution_notes}
-    )
-    db.add(activity)
-
+    apply_resolve(db, db_report, user_id, resolution_notes)
     db.commit()
     db.refresh(db_report)
     return db_report
 
+def apply_resolve(db: Session, db_report: models.Report, user_id: str, resolution_notes: str) -> None:
+    """Resolve ``db_report`` without committing; the caller has checked it is assigned to ``user_id``."""
+    before = stats.report_keys(db_report)
+    db_report.status = "resolved"
+    db_report.resolved_at = datetime.utcnow()
+    db_report.updated_at = datetime.utcnow()
+    events.record(db, db_report, "resolved", user_id, {"resolution_notes": resolution_notes})
+    stats.record_change(db, before, db_report)
+    stats.record_resolution(db, db_report)
+
 def confirm_report(db: Session, report_id: str, user_id: str) -> Optional[models.Report]:
     """Confirm a report (citizen verification)."""
     db_report = get_report(db, report_id)
     if not db_report:
         return None
 
+    apply_confirm(db, db_report, user_id)
+    db.commit()
+    db.refresh(db_report)
+    return db_report
+
+def apply_confirm(db: Session, db_report: models.Report, user_id: str) -> None:
+    """Confirm ``db_report`` without committing."""
     # Increase verification score slightly
     current_score = db_report.verification_score or 0.5
     new_score = min(current_score + 0.1, 1.0)  # Max 1.0
     db_report.verification_score = new_score
     db_report.updated_at = datetime.utcnow()
-
-    # Create activity log
-    activity = models.Activity(
-        id=str(uuid.uuid4()),
-        report_id=report_id,
-        user_id=user_id,
-        action="confirmed",
-        details={"verification_score": new_score}
-    )
-    db.add(activity)
-
-    db.commit()
-    db.refresh(db_report)
-    return db_report
+    events.record(db, db_report, "confirmed", user_id, {"verification_score": new_score})
 
 # Media CRUD operations
 def create_media_file(db: Session, media: schemas.MediaFileBase, report_id: str) -> models.MediaFile:
     """Create a media file record."""
+    db_media = add_media_file(db, media, report_id)
+    db.commit()
+    db.refresh(db_media)
+    return db_media
+
+def add_media_file(db: Session, media: schemas.MediaFileBase, report_id: str) -> models.MediaFile:
+    """Add a media file record without committing."""
     db_media = models.MediaFile(
         id=str(uuid.uuid4()),
         report_id=report_id,
         **media.dict()
     )
     db.add(db_media)
-    db.commit()
-    db.refresh(db_media)
     return db_media
 
 def get_media_files(db: Session, report_id: str) -> List[models.MediaFile]:
     """Get all media files for a report."""
     return db.query(models.MediaFile).filter(models.MediaFile.report_id == report_id).all()
 
+def get_media_filenames(db: Session, report_id: str) -> List[str]:
+    """Get the stored filenames of a report's media without loading full rows."""
+    rows = db.query(models.MediaFile.filename).filter(models.MediaFile.report_id == report_id)
+    return [filename for (filename,) in rows]
+
+def get_media_by_hash(db: Session, sha256_hash: str) -> Optional[models.MediaFile]:
+    """An already stored upload with the same content, if any."""
+    return db.query(models.MediaFile).filter(models.MediaFile.sha256_hash == sha256_hash).first()
+
 # Activity CRUD operations
 def get_activities(db: Session, report_id: Optional[str] = None, skip: int = 0, limit: int = 100) -> List[models.Activity]:
     """Get activities, optionally filtered by report."""
@@ -218,14 +451,8 @@ def get_activities(db: Session, report_id: Optional[str] = None, skip: int = 0,
     return query.order_by(models.Activity.created_at.desc()).offset(skip).limit(limit).all()
 
 def create_activity(db: Session, activity: schemas.ActivityBase, report_id: str, user_id: Optional[str] = None) -> models.Activity:
-    """Create an activity log."""
-    db_activity = models.Activity(
-        id=str(uuid.uuid4()),
-        report_id=report_id,
-        user_id=user_id,
-        **activity.dict()
-    )
-    db.add(db_activity)
+    """Create an activity log entry that does not change the report."""
+    db_activity = events.append(db, report_id, activity.action, user_id=user_id, details=activity.details)
     db.commit()
     db.refresh(db_activity)
     return db_activity
\ No newline at end of file
@@ -1,3 +1,6 @@
+from datetime import datetime, timezone
+from typing import Optional
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -18,6 +21,15 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create Base class
 Base = declarative_base()
 
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """A stored timestamp as naive UTC, comparable with ``datetime.utcnow()``.
+
+    Postgres returns ``DateTime(timezone=True)`` columns timezone-aware, SQLite naive.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,227 @@
+"""
+Authority digests: open reports batched into one message per jurisdiction,
+category and priority, instead of one message per report.
+
+A periodic pass (``digest_job``, or scripts/generate_digests.py) streams
+the reports each shard verified since its previous pass, ordered by
+geohash so each jurisdiction's reports arrive together, renders one digest
+per (category, priority) bucket from precompiled templates and stores it.
+Fetching a digest is then a primary-key read of the stored text.
+
+Passes are windowed by each report's first ``verified`` event rather than
+its submission time. Verification runs after submission and is retried
+while the ML service is degraded (see verification.py). A report still in
+``created`` has no labels or priority yet, so it waits for the pass after
+its verification.
+
+There is no jurisdiction model yet, so a jurisdiction is the geohash prefix
+of DIGEST_JURISDICTION_PRECISION characters (about 39 x 20 km at 4).
+"""
+
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from string import Template
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from sqlalchemy import and_, exists, func, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal, naive_utc
+from .sharding import shard_router
+from .stats import category_for
+
+logger = logging.getLogger(__name__)
+
+DIGEST_INTERVAL_SECONDS = float(os.getenv("DIGEST_INTERVAL_SECONDS", "3600"))
+DIGEST_JURISDICTION_PRECISION = int(os.getenv("DIGEST_JURISDICTION_PRECISION", "4"))
+DIGEST_MAX_REPORTS = int(os.getenv("DIGEST_MAX_REPORTS", "200"))
+# Verifications younger than this are left for the next pass, so events from
+# transactions still in flight when the window closes are not skipped
+DIGEST_LAG_SECONDS = float(os.getenv("DIGEST_LAG_SECONDS", "60"))
+DIGEST_BATCH = int(os.getenv("DIGEST_BATCH", "2000"))
+REPORT_PUBLIC_URL = os.getenv("REPORT_PUBLIC_URL", "http://localhost:3000/reports/{id}")
+
+UNKNOWN_JURISDICTION = "unknown"
+EPOCH = datetime(1970, 1, 1)
+
+SUBJECT = Template("[CivicSense] $count $priority_level-priority $category reports in $jurisdiction")
+LINE = Template("- $title ($lat, $lng), $date, priority $priority_score: $url")
+BODY = Template("""Jurisdiction: $jurisdiction
+Category: $category
+Priority: $priority_level
+Reports: $count, submitted $first_submitted to $last_submitted
+
+$lines
+
+Please acknowledge receipt and provide expected ETA for resolution.
+""")
+
+DIGEST_COLUMNS = (
+    models.Report.id, models.Report.title, models.Report.lat, models.Report.lng,
+    models.Report.priority_score, models.Report.priority_level, models.Report.verification_labels,
+    models.Report.geohash, models.Report.created_at,
+)
+DIGEST_SUMMARY_COLUMNS = (
+    models.AuthorityDigest.id, models.AuthorityDigest.jurisdiction, models.AuthorityDigest.category,
+    models.AuthorityDigest.priority_level, models.AuthorityDigest.report_count, models.AuthorityDigest.subject,
+    models.AuthorityDigest.period_start, models.AuthorityDigest.period_end, models.AuthorityDigest.created_at,
+)
+
+Bucket = Tuple[str, str]  # category, priority_level
+
+
+def jurisdiction_for(geohash: Optional[str]) -> str:
+    return geohash[:DIGEST_JURISDICTION_PRECISION] if geohash else UNKNOWN_JURISDICTION
+
+
+def _format_time(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M UTC")
+
+
+def render(jurisdiction: str, bucket: Bucket, rows: List[tuple], period_start: datetime,
+           period_end: datetime) -> dict:
+    """Row values for one stored digest."""
+    category, priority_level = bucket
+    submitted = [row.created_at for row in rows if row.created_at]
+    fields = {
+        "jurisdiction": jurisdiction,
+        "category": category,
+        "priority_level": priority_level,
+        "count": len(rows),
+        "first_submitted": _format_time(min(submitted, default=period_start)),
+        "last_submitted": _format_time(max(submitted, default=period_end)),
+    }
+    lines = "\n".join(
+        LINE.substitute(
+            title=row.title, lat=f"{row.lat:.6f}", lng=f"{row.lng:.6f}",
+            date=_format_time(row.created_at) if row.created_at else "unknown",
+            priority_score=row.priority_score, url=REPORT_PUBLIC_URL.format(id=row.id),
+        )
+        for row in rows
+    )
+    return {
+        "id": str(uuid.uuid4()),
+        "jurisdiction": jurisdiction,
+        "category": category,
+        "priority_level": priority_level,
+        "report_count": len(rows),
+        "report_ids": [row.id for row in rows],
+        "subject": SUBJECT.substitute(fields),
+        "body": BODY.substitute(fields, lines=lines),
+        "period_start": period_start,
+        "period_end": period_end,
+    }
+
+
+def _verified_in(period_start: datetime, period_end: datetime):
+    """Ids of the reports first verified in (period_start, period_end], by their events."""
+    event, earlier = models.Activity, aliased(models.Activity)
+    return (
+        select(event.report_id)
+        .where(event.action == "verified", event.created_at > period_start, event.created_at <= period_end)
+        # Re-verified reports were digested the first time
+        .where(~exists().where(and_(earlier.report_id == event.report_id, earlier.action == "verified",
+                                    earlier.created_at <= period_start)))
+    )
+
+
+def _digest_shard(db: Session, shard, period_start: datetime, period_end: datetime) -> List[dict]:
+    """Render the digests for the open reports ``shard`` verified in (period_start, period_end]."""
+    digests: List[dict] = []
+    buckets: Dict[Bucket, List[tuple]] = {}
+    jurisdiction = None
+
+    def flush(bucket: Bucket) -> None:
+        digests.append(render(jurisdiction, bucket, buckets.pop(bucket), period_start, period_end))
+
+    with shard_router.session(shard, db) as shard_db:
+        rows = (
+            shard_db.query(*DIGEST_COLUMNS)
+            .filter(models.Report.id.in_(_verified_in(period_start, period_end)), models.UNRESOLVED_REPORTS)
+            .order_by(models.Report.geohash, models.Report.created_at)
+            .yield_per(DIGEST_BATCH)
+        )
+        for row in rows:
+            row_jurisdiction = jurisdiction_for(row.geohash)
+            if row_jurisdiction != jurisdiction:
+                for bucket in sorted(buckets):
+                    flush(bucket)
+                jurisdiction = row_jurisdiction
+            bucket = (category_for(row.verification_labels), row.priority_level or "medium")
+            buckets.setdefault(bucket, []).append(row)
+            if len(buckets[bucket]) >= DIGEST_MAX_REPORTS:
+                flush(bucket)
+        for bucket in sorted(buckets):
+            flush(bucket)
+    return digests
+
+
+def generate(db: Session, now: Optional[datetime] = None) -> int:
+    """Digest every shard's reports verified since its last pass; returns how many digests were stored.
+
+    ``db`` is a default-database session, where digests and passes are recorded.
+    """
+    # Whole seconds: SQLite's CURRENT_TIMESTAMP has no fractional part
+    period_end = ((now or datetime.utcnow()) - timedelta(seconds=DIGEST_LAG_SECONDS)).replace(microsecond=0)
+    created = 0
+    for shard in shard_router.shards:
+        last = (
+            db.query(func.max(models.DigestRun.period_end))
+            .filter(models.DigestRun.shard == shard.name)
+            .scalar()
+        )
+        period_start = naive_utc(last) or EPOCH
+        if period_start >= period_end:
+            continue
+        digests = _digest_shard(db, shard, period_start, period_end)
+        if digests:
+            db.execute(models.AuthorityDigest.__table__.insert(), digests)
+        db.add(models.DigestRun(shard=shard.name, period_start=period_start, period_end=period_end,
+                                digests=len(digests)))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker already digested this window
+            db.rollback()
+            continue
+        created += len(digests)
+    return created
+
+
+def get_digest(db: Session, digest_id: str) -> Optional[models.AuthorityDigest]:
+    return db.get(models.AuthorityDigest, digest_id)
+
+
+def get_digest_rows(db: Session, jurisdiction: Optional[str] = None, skip: int = 0, limit: int = 20) -> List[tuple]:
+    """Digest summaries, newest first."""
+    query = db.query(*DIGEST_SUMMARY_COLUMNS)
+    if jurisdiction:
+        query = query.filter(models.AuthorityDigest.jurisdiction == jurisdiction)
+    return query.order_by(models.AuthorityDigest.created_at.desc()).offset(skip).limit(limit).all()
+
+
+def mailto_link(digest: models.AuthorityDigest, target: str) -> str:
+    return f"mailto:{target}?subject={quote(digest.subject)}&body={quote(digest.body)}"
+
+
+def whatsapp_link(digest: models.AuthorityDigest) -> str:
+    text = f"{digest.subject}\n\n{digest.body}"
+    return f"https://wa.me/?text={quote(text)}"
+
+
+def digest_job() -> int:
+    """Scheduled digest pass; logs how many digests it created."""
+    db = SessionLocal()
+    try:
+        created = generate(db)
+    finally:
+        db.close()
+    if created:
+        logger.info("Generated %d authority digests", created)
+    return created
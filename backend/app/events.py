@@ -0,0 +1,368 @@
+"""
+Report event stream.
+
+Every report mutation appends an ``activities`` row in the same transaction
+as the change itself. ``seq`` is its position in the shard's stream and
+``state`` holds the report fields the event set (all of them for
+``created``), so folding a report's events in ``seq`` order rebuilds the
+report row. Positions come from a single-row counter whose row lock is held
+until commit, so ``seq`` order is commit order and a consumer reading
+``seq > position`` never skips an event that commits late.
+
+Snapshots fold the stream into ``report_snapshots`` (one row per report,
+with the last ``seq`` folded); compaction then deletes events that are
+both older than EVENT_RETENTION_DAYS and already in a snapshot. ``replay``
+rebuilds the reports table by bringing the snapshots up to date and
+streaming them back into it.
+
+Change-data consumers (``consume``) keep their position in
+``event_consumers`` and advance it in the same transaction as their own
+writes; snapshotting is one of them.
+"""
+
+import logging
+import os
+import uuid
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import DateTime, Text, bindparam, cast, func, inspect, select, text, type_coerce
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+from .sharding import shard_router
+
+logger = logging.getLogger(__name__)
+
+EVENT_BATCH = int(os.getenv("EVENT_BATCH", "20000"))
+EVENT_SNAPSHOT_SECONDS = float(os.getenv("EVENT_SNAPSHOT_SECONDS", "300"))
+# 0 keeps every event
+EVENT_RETENTION_DAYS = float(os.getenv("EVENT_RETENTION_DAYS", "0"))
+
+SNAPSHOT_CONSUMER = "snapshots"
+
+STATE_COLUMNS = list(models.Report.__table__.columns)
+_STATE_NAMES = [column.name for column in STATE_COLUMNS]
+_DATETIME_COLUMNS = {column.name for column in STATE_COLUMNS if isinstance(column.type, DateTime)}
+_NEXT_SEQ = text("UPDATE event_sequence SET last_seq = last_seq + 1 WHERE id = 1 RETURNING last_seq")
+
+Event = namedtuple("Event", "seq report_id action state created_at")
+Handler = Callable[[Session, List[Event]], None]
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    return value
+
+
+def report_state(report: Any) -> Dict[str, Any]:
+    """Every report column of a Report (or a row of its columns), JSON-encoded."""
+    return {column.name: _encode(getattr(report, column.name)) for column in STATE_COLUMNS}
+
+
+def row_values(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode a folded state into reports table values."""
+    values = {name: state.get(name) for name in _STATE_NAMES}
+    for name in _DATETIME_COLUMNS:
+        if values[name] is not None:
+            values[name] = datetime.fromisoformat(values[name])
+    return values
+
+
+def _loads(value: Any) -> Any:
+    # State is selected as text and decoded here: orjson is several times
+    # faster than the JSON type's json.loads, which dominates replay
+    return orjson.loads(value) if isinstance(value, (str, bytes)) else value
+
+
+def _state_text(column):
+    return cast(column, Text).label("state")
+
+
+def _stream(db: Session, statement, batch_size: int):
+    """Core rows of ``statement``, fetched ``batch_size`` at a time (a server-side cursor on Postgres)."""
+    return db.connection().execution_options(yield_per=batch_size).execute(statement)
+
+
+def _insert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def _report_upsert(db: Session):
+    table = models.Report.__table__
+    statement = _insert(db)(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={column.name: statement.excluded[column.name] for column in table.columns if column.name != "id"},
+    )
+
+
+def _snapshot_upsert(db: Session):
+    # State is bound as orjson-encoded text rather than through the JSON type's json.dumps
+    table = models.ReportSnapshot.__table__
+    statement = _insert(db)(table).values(
+        report_id=bindparam("snapshot_report_id"),
+        seq=bindparam("snapshot_seq"),
+        state=type_coerce(bindparam("snapshot_state"), Text),
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.report_id],
+        set_={"seq": statement.excluded.seq, "state": statement.excluded.state, "updated_at": func.now()},
+    )
+
+
+def _next_seq(db: Session) -> int:
+    seq = db.execute(_NEXT_SEQ).scalar()
+    if seq is None:
+        # First event of a database created with create_all
+        seq = (db.query(func.max(models.Activity.seq)).scalar() or 0) + 1
+        db.add(models.EventSequence(id=1, last_seq=seq))
+        db.flush()
+    return seq
+
+
+def last_seq(db: Session) -> int:
+    return db.query(func.max(models.EventSequence.last_seq)).scalar() or 0
+
+
+def append(db: Session, report_id: str, action: str, state: Optional[Dict[str, Any]] = None,
+           user_id: Optional[str] = None, details: Optional[Dict[str, Any]] = None) -> models.Activity:
+    """Append one event; the caller commits it together with the change it describes."""
+    event = models.Activity(
+        id=str(uuid.uuid4()),
+        seq=_next_seq(db),
+        report_id=report_id,
+        user_id=user_id,
+        action=action,
+        details=details,
+        state=state or None,
+    )
+    db.add(event)
+    return event
+
+
+def record(db: Session, report: models.Report, action: str, user_id: Optional[str] = None,
+           details: Optional[Dict[str, Any]] = None) -> models.Activity:
+    """Append an event carrying the fields of ``report`` changed since it was loaded (all of them if new)."""
+    report_info = inspect(report)
+    if report_info.pending or report_info.transient:
+        db.flush()
+        state = report_state(report)
+    else:
+        state = {
+            attr.key: _encode(attr.value)
+            for attr in report_info.attrs
+            if attr.key in _STATE_NAMES and attr.history.has_changes()
+        }
+    return append(db, report.id, action, state, user_id, details)
+
+
+def read(db: Session, after: int, limit: int = EVENT_BATCH) -> List[Event]:
+    """Up to ``limit`` events following position ``after``, oldest first."""
+    activities = models.Activity.__table__
+    rows = db.connection().execute(
+        select(activities.c.seq, activities.c.report_id, activities.c.action, _state_text(activities.c.state),
+               activities.c.created_at)
+        .where(activities.c.seq > after)
+        .order_by(activities.c.seq)
+        .limit(limit)
+    )
+    return [
+        Event(seq, report_id, action, _loads(state), created_at)
+        for seq, report_id, action, state, created_at in rows
+    ]
+
+
+def consume(db: Session, name: str, handler: Handler, batch_size: int = EVENT_BATCH) -> int:
+    """Feed the next batch of events after consumer ``name``'s position to ``handler``; returns how many."""
+    consumer = db.get(models.EventConsumer, name)
+    if consumer is None:
+        consumer = models.EventConsumer(name=name, position=0)
+        db.add(consumer)
+    batch = read(db, consumer.position, batch_size)
+    if not batch:
+        db.rollback()
+        return 0
+    handler(db, batch)
+    consumer.position = batch[-1].seq
+    db.commit()
+    return len(batch)
+
+
+def _fold_into_snapshots(db: Session, batch: List[Event]) -> None:
+    table = models.ReportSnapshot.__table__
+    by_report: Dict[str, List[Event]] = {}
+    for event in batch:
+        by_report.setdefault(event.report_id, []).append(event)
+    snapshots = {
+        row.report_id: row
+        for row in db.execute(
+            select(table.c.report_id, table.c.seq, _state_text(table.c.state))
+            .where(table.c.report_id.in_(list(by_report)))
+        )
+    }
+    rows = []
+    for report_id, report_events in by_report.items():
+        snapshot = snapshots.get(report_id)
+        since, state = (snapshot.seq, _loads(snapshot.state)) if snapshot else (0, {})
+        # Events already in the snapshot (another worker folded them) are skipped
+        for event in report_events:
+            if event.seq > since and event.state:
+                state.update(event.state)
+        rows.append({
+            "snapshot_report_id": report_id,
+            "snapshot_seq": max(since, report_events[-1].seq),
+            "snapshot_state": orjson.dumps(state).decode(),
+        })
+    db.execute(_snapshot_upsert(db), rows)
+
+
+def take_snapshots(db: Session, batch_size: int = EVENT_BATCH) -> int:
+    """Fold every event not yet in a snapshot into one; returns how many events were folded."""
+    folded = 0
+    while True:
+        count = consume(db, SNAPSHOT_CONSUMER, _fold_into_snapshots, batch_size)
+        if not count:
+            return folded
+        folded += count
+
+
+def compact(db: Session, older_than: datetime, batch_size: int = EVENT_BATCH) -> int:
+    """Delete events created before ``older_than`` that snapshots already cover; returns how many."""
+    consumer = db.get(models.EventConsumer, SNAPSHOT_CONSUMER)
+    horizon = db.query(func.max(models.Activity.seq)).filter(models.Activity.created_at < older_than).scalar()
+    if consumer is None or horizon is None:
+        return 0
+    cutoff = min(consumer.position, horizon)
+    deleted = 0
+    while True:
+        # Oldest first, in bounded transactions
+        batch = [
+            seq for (seq,) in db.query(models.Activity.seq)
+            .filter(models.Activity.seq <= cutoff)
+            .order_by(models.Activity.seq)
+            .limit(batch_size)
+        ]
+        if not batch:
+            return deleted
+        deleted += (
+            db.query(models.Activity)
+            .filter(models.Activity.seq >= batch[0], models.Activity.seq <= batch[-1])
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+
+
+def baseline(db: Session, batch_size: int = EVENT_BATCH) -> int:
+    """Snapshot reports that have no events or snapshot yet (pre-stream rows, bulk imports).
+
+    The snapshots are taken at the current stream position, so nothing before
+    it is folded over them. Returns how many reports were snapshotted.
+    """
+    position = last_seq(db)
+    columns = [getattr(models.Report, column.name) for column in STATE_COLUMNS]
+    snapshotted = models.ReportSnapshot.report_id
+    streamed = db.query(models.Activity.report_id).filter(models.Activity.state.isnot(None))
+    rows = (
+        db.query(*columns)
+        .filter(~models.Report.id.in_(db.query(snapshotted)), ~models.Report.id.in_(streamed))
+        .yield_per(batch_size)
+    )
+    count, pending = 0, []
+    for row in rows:
+        pending.append({"report_id": row.id, "seq": position, "state": report_state(row)})
+        if len(pending) >= batch_size:
+            count += _insert_snapshots(db, pending)
+    count += _insert_snapshots(db, pending)
+    db.commit()
+    return count
+
+
+def _insert_snapshots(db: Session, rows: List[dict]) -> int:
+    if rows:
+        db.execute(models.ReportSnapshot.__table__.insert(), rows)
+    count = len(rows)
+    rows.clear()
+    return count
+
+
+@dataclass
+class ReplayResult:
+    reports: int = 0
+    events: int = 0
+    written: int = 0
+    incomplete: int = 0
+    mismatched: int = 0
+    mismatched_ids: List[str] = field(default_factory=list)
+
+
+def replay(db: Session, write: bool = False, check: bool = True, batch_size: int = EVENT_BATCH) -> ReplayResult:
+    """Rebuild report rows from the event stream.
+
+    Events not yet in a snapshot are folded first (``take_snapshots``, in
+    ``seq`` order), then the snapshots are read in storage order. Both passes
+    are sequential scans; reading the events report by report through an
+    index would cost a random read per event once the stream outgrows memory.
+
+    ``check`` compares every rebuilt row with the reports table; ``write``
+    upserts the rebuilt rows (one transaction, committed at the end). Derived
+    data (stats counters, the SQLite search index) is not touched.
+    """
+    result = ReplayResult(events=take_snapshots(db, batch_size))
+    snapshots, reports = models.ReportSnapshot.__table__, models.Report.__table__
+    rows = _stream(db, select(snapshots.c.report_id, _state_text(snapshots.c.state)), batch_size)
+    upsert = _report_upsert(db) if write else None
+
+    def flush(batch: Dict[str, Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        if check:
+            current = {
+                row.id: report_state(row)
+                for row in db.execute(select(reports).where(reports.c.id.in_(list(batch))))
+            }
+            for report_id, state in batch.items():
+                if current.get(report_id) != {name: state.get(name) for name in _STATE_NAMES}:
+                    result.mismatched += 1
+                    if len(result.mismatched_ids) < 20:
+                        result.mismatched_ids.append(report_id)
+        if write:
+            db.execute(upsert, [row_values(state) for state in batch.values()])
+            result.written += len(batch)
+        batch.clear()
+
+    batch: Dict[str, Dict[str, Any]] = {}
+    for report_id, state in rows:
+        state = _loads(state)
+        result.reports += 1
+        if state.get("id") != report_id or not state.get("title"):
+            # No created event or baseline snapshot for this report, only partial updates
+            result.incomplete += 1
+            continue
+        batch[report_id] = state
+        if len(batch) >= batch_size:
+            flush(batch)
+    flush(batch)
+    if write:
+        db.commit()
+    return result
+
+
+def snapshot_job() -> Tuple[int, int]:
+    """Snapshot every shard's stream, and compact it when EVENT_RETENTION_DAYS is set."""
+    folded = deleted = 0
+    for shard in shard_router.shards:
+        with shard_router.session(shard) as db:
+            folded += take_snapshots(db)
+            if EVENT_RETENTION_DAYS > 0:
+                deleted += compact(db, datetime.utcnow() - timedelta(days=EVENT_RETENTION_DAYS))
+    if folded or deleted:
+        logger.info("Snapshotted %d report events, compacted %d", folded, deleted)
+    return folded, deleted
@@ -0,0 +1,182 @@
+"""
+Geographic helpers: geohash encoding and bounding box parsing.
+"""
+
+import math
+import os
+from typing import List, Optional, Tuple
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Geohash length used to bucket reports into neighborhoods (~1.2km x 0.6km cells)
+NEIGHBORHOOD_PRECISION = 6
+
+# Geohash length stored per report for nearby search (~4.8m x 4.8m cells)
+POINT_PRECISION = 9
+
+EARTH_RADIUS_M = 6371008.8
+
+# Geohash length of a shard region (3 = ~156km cells, roughly a metro area)
+REGION_PRECISION = int(os.getenv("REGION_GEOHASH_PRECISION", "3"))
+
+
+def geohash_encode(lat: float, lng: float, precision: int = NEIGHBORHOOD_PRECISION) -> str:
+    """Encode a coordinate as a geohash string of ``precision`` characters."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lng_range if even else lat_range
+            mid = (bounds[0] + bounds[1]) / 2
+            if (bits >> shift) & 1:
+                bounds[0] = mid
+            else:
+                bounds[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def geohash_block(lat: float, lng: float, precision: int) -> List[str]:
+    """The cell containing a point and its (up to) 8 neighbours."""
+    min_lat, min_lng, max_lat, max_lng = geohash_bounds(geohash_encode(lat, lng, precision))
+    cell_lat, cell_lng = max_lat - min_lat, max_lng - min_lng
+    center_lat, center_lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    cells = []
+    for dlat in (-1, 0, 1):
+        neighbour_lat = center_lat + dlat * cell_lat
+        if not -90.0 < neighbour_lat < 90.0:
+            continue
+        for dlng in (-1, 0, 1):
+            neighbour_lng = (center_lng + dlng * cell_lng + 180.0) % 360.0 - 180.0
+            cell = geohash_encode(neighbour_lat, neighbour_lng, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def geohash_ranges(cells: List[str]) -> List[Tuple[str, str]]:
+    """Merge same-length cells into runs that are consecutive in geohash order.
+
+    Each (first, last) run covers every geohash from ``first`` up to and
+    including those prefixed by ``last``.
+    """
+    def to_int(cell: str) -> int:
+        value = 0
+        for char in cell:
+            value = value * 32 + GEOHASH_ALPHABET.index(char)
+        return value
+
+    ranges: List[Tuple[str, str]] = []
+    previous = None
+    for value, cell in sorted((to_int(cell), cell) for cell in set(cells)):
+        if previous is not None and value == previous + 1 and len(cell) == len(ranges[-1][1]):
+            ranges[-1] = (ranges[-1][0], cell)
+        else:
+            ranges.append((cell, cell))
+        previous = value
+    return ranges
+
+
+def geohash_block_radius_m(lat: float, precision: int) -> float:
+    """Distance from any point to the edge of its ``geohash_block``: one cell's shorter side."""
+    cell_lat, cell_lng = geohash_cell_size(precision)
+    return min(
+        math.radians(cell_lat) * EARTH_RADIUS_M,
+        math.radians(cell_lng) * EARTH_RADIUS_M * math.cos(math.radians(min(abs(lat) + cell_lat, 90.0))),
+    )
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat: float, lng: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """(min_lng, min_lat, max_lng, max_lat) enclosing a circle, clamped to valid coordinates."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+    dlng = 180.0 if cos_lat < 1e-9 else min(math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)), 180.0)
+    return (max(lng - dlng, -180.0), max(lat - dlat, -90.0), min(lng + dlng, 180.0), min(lat + dlat, 90.0))
+
+
+def parse_bbox(bbox: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    """Parse ``minLng,minLat,maxLng,maxLat``; returns None when missing or invalid."""
+    if not bbox:
+        return None
+    try:
+        min_lng, min_lat, max_lng, max_lat = map(float, bbox.split(","))
+    except ValueError:
+        return None
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def region_for(lat: float, lng: float) -> str:
+    """Region (geohash prefix) a coordinate belongs to."""
+    return geohash_encode(lat, lng, REGION_PRECISION)
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """(lat, lng) extent in degrees of a geohash cell of ``precision`` characters."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def geohash_cells(
+    bbox: Tuple[float, float, float, float], precision: int, max_cells: int
+) -> Optional[List[str]]:
+    """Geohashes of every cell intersecting ``bbox``; None if there would be more than ``max_cells``."""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    if min_lng > max_lng or min_lat > max_lat:
+        return None  # crosses the antimeridian or is malformed
+    cell_lat, cell_lng = geohash_cell_size(precision)
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    min_lng, max_lng = max(min_lng, -180.0), min(max_lng, 180.0)
+
+    # Index range of the cells on each axis, from the -90/-180 origin
+    lat_cells = range(int((min_lat + 90.0) // cell_lat), int(min((max_lat + 90.0) // cell_lat, 180.0 / cell_lat - 1)) + 1)
+    lng_cells = range(int((min_lng + 180.0) // cell_lng), int(min((max_lng + 180.0) // cell_lng, 360.0 / cell_lng - 1)) + 1)
+    if len(lat_cells) * len(lng_cells) > max_cells:
+        return None
+    return [
+        geohash_encode(-90.0 + (i + 0.5) * cell_lat, -180.0 + (j + 0.5) * cell_lng, precision)
+        for i in lat_cells for j in lng_cells
+    ]
@@ -0,0 +1,99 @@
+"""
+Dependency probes behind the health endpoint.
+
+Each probe is time-boxed and the combined result is cached for a few seconds
+so load balancer checks don't turn into a steady stream of DB and ML calls.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from .database import engine
+from .metrics import ml_request_duration_seconds
+from .ml_client import ml_client
+
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2.0"))
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "5.0"))
+
+_cache: Dict[str, Any] = {"result": None, "expires": 0.0}
+_lock = asyncio.Lock()
+
+
+def _ping_db() -> None:
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def probe_db(timeout: float = HEALTH_PROBE_TIMEOUT) -> Dict[str, Any]:
+    """Run ``SELECT 1`` against the database within ``timeout`` seconds."""
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(run_in_threadpool(_ping_db), timeout=timeout)
+        status = "ok"
+        error: Optional[str] = None
+    except asyncio.TimeoutError:
+        status, error = "timeout", f"no response within {timeout}s"
+    except Exception as exc:
+        status, error = "error", exc.__class__.__name__
+    result = {"status": status, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+    if error:
+        result["error"] = error
+    return result
+
+
+async def probe_ml(timeout: float = HEALTH_PROBE_TIMEOUT) -> Dict[str, Any]:
+    """Call the ML service health endpoint within ``timeout`` seconds, on the shared pool."""
+    start = time.perf_counter()
+    error: Optional[str] = None
+    import httpx
+
+    try:
+        response = await ml_client.health(timeout)
+        status = "ok" if response.status_code == 200 else "error"
+        if status == "error":
+            error = f"HTTP {response.status_code}"
+    except httpx.TimeoutException:
+        status, error = "timeout", f"no response within {timeout}s"
+    except httpx.HTTPError as exc:
+        status, error = "error", exc.__class__.__name__
+    elapsed = time.perf_counter() - start
+    ml_request_duration_seconds.observe(elapsed, endpoint="health", outcome=status)
+    result = {"status": status, "latency_ms": round(elapsed * 1000, 2)}
+    if error:
+        result["error"] = error
+    return result
+
+
+async def check_health() -> Dict[str, Any]:
+    """Return the cached probe results, refreshing them when stale."""
+    now = time.monotonic()
+    if _cache["result"] is not None and now < _cache["expires"]:
+        return _cache["result"]
+
+    async with _lock:
+        # Another request may have refreshed the cache while we waited
+        now = time.monotonic()
+        if _cache["result"] is not None and now < _cache["expires"]:
+            return _cache["result"]
+
+        db_result, ml_result = await asyncio.gather(probe_db(), probe_ml())
+        if db_result["status"] != "ok":
+            overall = "error"
+        elif ml_result["status"] != "ok":
+            overall = "degraded"
+        else:
+            overall = "ok"
+
+        result = {
+            "status": overall,
+            "services": {"db": db_result, "ml": ml_result},
+            "checked_at": time.time(),
+        }
+        _cache["result"] = result
+        _cache["expires"] = time.monotonic() + HEALTH_CACHE_SECONDS
+        return result
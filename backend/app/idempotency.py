@@ -0,0 +1,207 @@
+"""
+Idempotent report submission.
+
+Clients send an ``Idempotency-Key`` header (any unique string, e.g. a UUID
+generated once per submission) with ``POST /reports/``. The first request
+reserves the key and, once it succeeds, stores its response; a retry with
+the same key gets that response back instead of creating another report,
+so it costs one lookup rather than an upload, inference and insert.
+
+The report's id is bound to the key (``reserve_report``) before the report
+is inserted. If the request fails after the insert, the key is kept, and a
+retry finishes that report instead of creating a second one. A key is
+released only when nothing was committed.
+
+Keys live in ``idempotency_keys`` in the shard the report goes to (a retry
+carries the same coordinates, so it is routed to the same shard), scoped
+to the submitting user, and expire after IDEMPOTENCY_TTL_SECONDS. Completed
+keys are also held in a bounded in-process LRU, so most retries never
+reach the database.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Tuple
+
+import orjson
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .sharding import shard_router
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# A reservation this old belongs to a request that died; a retry may take it over
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_PURGE_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "3600"))
+MAX_KEY_LENGTH = 255
+
+# scoped key -> (fingerprint, response body, expires_at)
+_completed: "OrderedDict[str, Tuple[str, str, datetime]]" = OrderedDict()
+# Sync endpoints use it from threadpool workers
+_lock = threading.Lock()
+
+
+class IdempotencyError(Exception):
+    """The key cannot be used for this request; ``status_code`` says why."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def scoped_key(key: str, user: Optional[models.User]) -> str:
+    """Keys are per user, so one client cannot replay another's responses."""
+    return f"{user.id if user else 'anonymous'}:{key}"
+
+
+def fingerprint(*values: Any) -> str:
+    """Hash of the request fields, to tell a retry from a different request reusing the key."""
+    return hashlib.sha256(orjson.dumps(values)).hexdigest()
+
+
+def _utc(value: datetime) -> datetime:
+    """Naive UTC, whichever way the backend returned it."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _check(stored_fingerprint: str, request_fingerprint: str) -> None:
+    if stored_fingerprint != request_fingerprint:
+        raise IdempotencyError(422, "Idempotency-Key was already used for a different request")
+
+
+def _remember(key: str, request_fingerprint: str, response: str, expires_at: datetime) -> None:
+    with _lock:
+        _completed[key] = (request_fingerprint, response, expires_at)
+        _completed.move_to_end(key)
+        while len(_completed) > IDEMPOTENCY_CACHE_SIZE:
+            _completed.popitem(last=False)
+
+
+def begin(db: Session, key: str, request_fingerprint: str, now: Optional[datetime] = None) -> Optional[str]:
+    """Reserve ``key`` for this request, or return the response it already produced.
+
+    Raises IdempotencyError while another request holds the key, or when it
+    was used for a different request.
+    """
+    now = now or datetime.utcnow()
+    with _lock:
+        cached = _completed.get(key)
+        if cached is not None and cached[2] <= now:
+            del _completed[key]
+            cached = None
+        elif cached is not None:
+            _completed.move_to_end(key)
+    if cached is not None:
+        _check(cached[0], request_fingerprint)
+        return cached[1]
+
+    table = models.IdempotencyKey.__table__
+    row = db.execute(table.select().where(table.c.key == key)).first()
+    expires_at = now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    if row is None:
+        db.execute(table.insert().values(key=key, fingerprint=request_fingerprint, created_at=now,
+                                         expires_at=expires_at))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise IdempotencyError(409, "A request with this Idempotency-Key is in progress")
+        return None
+
+    live = _utc(row.expires_at) > now
+    if live:
+        _check(row.fingerprint, request_fingerprint)
+        if row.response is not None:
+            _remember(key, row.fingerprint, row.response, _utc(row.expires_at))
+            return row.response
+        if _utc(row.created_at) > now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS):
+            raise IdempotencyError(409, "A request with this Idempotency-Key is in progress")
+
+    # Expired, or abandoned mid-request: take it over unless another retry got there first.
+    # An abandoned request's report is kept for the retry to finish; an expired key starts afresh.
+    taken = db.execute(
+        table.update()
+        .where(table.c.key == key, table.c.created_at == row.created_at)
+        .values(fingerprint=request_fingerprint, response=None, created_at=now, expires_at=expires_at,
+                report_id=row.report_id if live else None)
+    ).rowcount
+    db.commit()
+    if not taken:
+        raise IdempotencyError(409, "A request with this Idempotency-Key is in progress")
+    return None
+
+
+def reserve_report(db: Session, key: str) -> str:
+    """Id of the report the request holding ``key`` creates: bound to the key before the report exists.
+
+    A retry that took over an abandoned request gets the same id back, and
+    finishes that report if it was inserted.
+    """
+    table = models.IdempotencyKey.__table__
+    db.execute(table.update().where(table.c.key == key, table.c.report_id.is_(None))
+               .values(report_id=str(uuid.uuid4())))
+    db.commit()
+    return db.execute(table.select().with_only_columns(table.c.report_id).where(table.c.key == key)).scalar_one()
+
+
+def complete(db: Session, key: str, request_fingerprint: str, response: str) -> None:
+    """Store the response of the request holding ``key``; it is kept for IDEMPOTENCY_TTL_SECONDS from now."""
+    table = models.IdempotencyKey.__table__
+    expires_at = datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    db.execute(table.update().where(table.c.key == key).values(response=response, expires_at=expires_at))
+    db.commit()
+    _remember(key, request_fingerprint, response, expires_at)
+
+
+def release(db: Session, key: str) -> None:
+    """Free the reservation of a request that failed, so a retry can run it again.
+
+    The key is dropped only if nothing was committed. Once its report
+    exists, the key stays bound to it, and its lock is back-dated so the
+    retry can take it over at once and finish that report.
+    """
+    table = models.IdempotencyKey.__table__
+    db.rollback()
+    report_id = db.execute(
+        table.select().with_only_columns(table.c.report_id).where(table.c.key == key, table.c.response.is_(None))
+    ).scalar()
+    if report_id is not None and db.query(models.Report.id).filter(models.Report.id == report_id).first():
+        db.execute(
+            table.update()
+            .where(table.c.key == key, table.c.response.is_(None))
+            .values(created_at=datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS))
+        )
+    else:
+        db.execute(table.delete().where(table.c.key == key, table.c.response.is_(None)))
+    db.commit()
+
+
+def purge(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete expired keys; returns how many."""
+    table = models.IdempotencyKey.__table__
+    deleted = db.execute(table.delete().where(table.c.expires_at <= (now or datetime.utcnow()))).rowcount
+    db.commit()
+    return deleted
+
+
+def purge_job() -> int:
+    """Delete expired keys from every shard."""
+    deleted = 0
+    for shard in shard_router.shards:
+        with shard_router.session(shard) as db:
+            deleted += purge(db)
+    if deleted:
+        logger.info("Purged %d expired idempotency keys", deleted)
+    return deleted
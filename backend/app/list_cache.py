@@ -0,0 +1,290 @@
+"""
+Response cache and warmer for the report list (map viewport) endpoint.
+
+Each worker keeps the encoded bodies of recent ``GET /reports/`` responses,
+keyed by their normalized filters. Entries are tagged with the generation
+of the data they were computed from: the warmer polls every shard's event
+stream position (every write appends an event, see events.py) and starts a
+new generation when any of them moves. An entry stays fresh until then, or
+until LIST_CACHE_TTL_SECONDS have passed for writes that bypass the stream
+(archival, bulk imports). Once stale it may still be served for
+LIST_CACHE_MAX_STALE_SECONDS, which is how long the warmer has to replace it.
+
+Which entries the warmer replaces is learned from traffic: every lookup is
+counted in a sliding-window top-K, and after a batch of writes the
+LIST_CACHE_WARM_TOP_K hottest queries are recomputed in a thread pool
+before viewers ask for them again. Popular viewports are therefore served
+from memory even right after a bulk import or a storm of new reports;
+colder ones are computed on demand as before.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import orjson
+from sqlalchemy.orm import Session
+
+from . import crud, events, serialization
+from .database import SessionLocal
+from .geo import parse_bbox
+from .metrics import REGISTRY, list_cache_requests_total, list_cache_warmed_total
+from .sharding import shard_router
+
+logger = logging.getLogger(__name__)
+
+LIST_CACHE_SIZE = int(os.getenv("LIST_CACHE_SIZE", "1000"))
+LIST_CACHE_TTL_SECONDS = float(os.getenv("LIST_CACHE_TTL_SECONDS", "60"))
+LIST_CACHE_MAX_STALE_SECONDS = float(os.getenv("LIST_CACHE_MAX_STALE_SECONDS", "5"))
+LIST_CACHE_WARM_SECONDS = float(os.getenv("LIST_CACHE_WARM_SECONDS", "1"))
+LIST_CACHE_WARM_TOP_K = int(os.getenv("LIST_CACHE_WARM_TOP_K", "50"))
+LIST_CACHE_WARM_WORKERS = int(os.getenv("LIST_CACHE_WARM_WORKERS", "4"))
+LIST_CACHE_HOT_WINDOW_SECONDS = float(os.getenv("LIST_CACHE_HOT_WINDOW_SECONDS", "300"))
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+BYPASS = "bypass"
+
+
+class ListQuery(NamedTuple):
+    bbox: Optional[Tuple[float, float, float, float]]
+    status: Optional[str]
+    priority_min: Optional[int]
+    page: int
+    per_page: int
+
+
+def list_query(bbox: Optional[str], status: Optional[str], priority_min: Optional[int],
+               page: int, per_page: int) -> ListQuery:
+    """Cache key for a list request; equivalent bbox spellings share it, invalid ones are dropped like crud does."""
+    return ListQuery(parse_bbox(bbox), status or None, priority_min, page, per_page)
+
+
+def render(db: Session, query: ListQuery) -> bytes:
+    """The encoded ``GET /reports/`` body for ``query``.
+
+    ``meta.total`` is the number of reports on this page, not across all
+    pages: counting every match of a viewport costs another scan of it.
+    A page shorter than ``per_page`` is the last one.
+    """
+    rows = crud.get_report_rows(
+        db, serialization.REPORT_SUMMARY_COLUMNS,
+        skip=(query.page - 1) * query.per_page, limit=query.per_page,
+        bbox=",".join(map(repr, query.bbox)) if query.bbox else None,
+        status=query.status, priority_min=query.priority_min
+    )
+    return orjson.dumps({
+        "data": serialization.summary_rows_to_dicts(rows),
+        "meta": {
+            "page": query.page,
+            "per_page": query.per_page,
+            "total": len(rows)
+        }
+    }, option=serialization.ORJSON_OPTIONS)
+
+
+class SlidingTopK:
+    """Approximate access counts over the last ``window`` seconds.
+
+    Counts go into ``buckets`` time slices; the oldest slice is dropped as
+    the window slides. A slice holding more than ``capacity`` keys keeps
+    only its busiest half, which bounds memory without losing hot keys.
+    """
+
+    def __init__(self, window: float = LIST_CACHE_HOT_WINDOW_SECONDS, buckets: int = 10, capacity: int = 10000):
+        self.slice_seconds = window / buckets
+        self.buckets = buckets
+        self.capacity = capacity
+        self._slices: "OrderedDict[int, Counter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, current: int) -> None:
+        while self._slices and next(iter(self._slices)) <= current - self.buckets:
+            self._slices.popitem(last=False)
+
+    def add(self, key: Hashable, now: Optional[float] = None) -> None:
+        current = int((time.monotonic() if now is None else now) // self.slice_seconds)
+        with self._lock:
+            counts = self._slices.get(current)
+            if counts is None:
+                self._expire(current)
+                counts = self._slices[current] = Counter()
+            counts[key] += 1
+            if len(counts) > self.capacity:
+                self._slices[current] = Counter(dict(counts.most_common(self.capacity // 2)))
+
+    def top(self, k: int, now: Optional[float] = None) -> List[Tuple[Hashable, int]]:
+        """The ``k`` most accessed keys in the window, busiest first."""
+        current = int((time.monotonic() if now is None else now) // self.slice_seconds)
+        with self._lock:
+            self._expire(current)
+            totals: Counter = Counter()
+            for counts in self._slices.values():
+                totals.update(counts)
+        return heapq.nlargest(k, totals.items(), key=lambda item: item[1])
+
+
+class _Entry(NamedTuple):
+    generation: int
+    computed_at: float
+    body: bytes
+
+
+class ListCache:
+    """Per-worker LRU of list responses, invalidated by event stream positions."""
+
+    def __init__(self, size: int = LIST_CACHE_SIZE, ttl: float = LIST_CACHE_TTL_SECONDS,
+                 max_stale: float = LIST_CACHE_MAX_STALE_SECONDS):
+        self.size = size
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.hot = SlidingTopK()
+        self._entries: "OrderedDict[ListQuery, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Unknown until the warmer's first poll; the cache is bypassed until then
+        self.positions: Optional[Tuple[int, ...]] = None
+        self.generation = 0
+        # When each recent generation started, for entries of the one before
+        self._started_at: Dict[int, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and self.positions is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _stale_since(self, entry: _Entry) -> float:
+        """When ``entry`` stopped being fresh (possibly in the future)."""
+        expires = entry.computed_at + self.ttl
+        if entry.generation == self.generation:
+            return expires
+        # An evicted start time is older than max_stale: the entry is past serving
+        return min(expires, self._started_at.get(entry.generation + 1, float("-inf")))
+
+    def set_positions(self, positions: Tuple[int, ...], now: Optional[float] = None) -> bool:
+        """Record the latest event stream positions; returns whether the data changed."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if positions == self.positions:
+                return False
+            first = self.positions is None
+            self.positions = positions
+            if first:
+                return False
+            self.generation += 1
+            self._started_at[self.generation] = now
+            for generation, started_at in list(self._started_at.items()):
+                if generation != self.generation and now - started_at > self.max_stale:
+                    del self._started_at[generation]
+            return True
+
+    def get(self, query: ListQuery, now: Optional[float] = None) -> Tuple[Optional[bytes], str]:
+        """The cached body for ``query`` if it may be served, and whether it was fresh, stale or missing."""
+        if not self.enabled:
+            return None, BYPASS
+        now = time.monotonic() if now is None else now
+        self.hot.add(query, now)
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is None:
+                return None, MISS
+            stale_since = self._stale_since(entry)
+            if now < stale_since:
+                self._entries.move_to_end(query)
+                return entry.body, FRESH
+            if now < stale_since + self.max_stale:
+                return entry.body, STALE
+            return None, MISS
+
+    def put(self, query: ListQuery, generation: int, body: bytes, now: Optional[float] = None) -> None:
+        """Store ``body``, computed from the data of ``generation``, unless a newer one is cached."""
+        if not self.enabled:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            current = self._entries.get(query)
+            if current is not None and current.generation > generation:
+                return
+            self._entries[query] = _Entry(generation, now, body)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def fetch(self, db: Session, query: ListQuery) -> bytes:
+        """The response body for ``query``, from the cache or computed (and cached)."""
+        body, result = self.get(query)
+        list_cache_requests_total.inc(result=result)
+        if body is None:
+            generation = self.generation
+            body = render(db, query)
+            self.put(query, generation, body)
+        return body
+
+    def due(self, k: int, horizon: float = 0.0, now: Optional[float] = None) -> List[ListQuery]:
+        """The hottest ``k`` queries whose entry is missing or stale within ``horizon`` seconds."""
+        now = time.monotonic() if now is None else now
+        queries = []
+        for query, _ in self.hot.top(k, now):
+            with self._lock:
+                entry = self._entries.get(query)
+                if entry is None or self._stale_since(entry) <= now + horizon:
+                    queries.append(query)
+        return queries
+
+
+report_lists = ListCache()
+
+REGISTRY.gauge(
+    "civicsense_list_cache_entries", "Report list responses cached by this worker",
+    callback=lambda: {(): float(len(report_lists))},
+)
+
+
+def current_positions() -> Tuple[int, ...]:
+    """Event stream position of every shard."""
+    positions = []
+    for shard in shard_router.shards:
+        with shard_router.session(shard) as db:
+            positions.append(events.last_seq(db))
+    return tuple(positions)
+
+
+def warm(executor: ThreadPoolExecutor, cache: ListCache = report_lists, k: int = LIST_CACHE_WARM_TOP_K,
+         interval: float = LIST_CACHE_WARM_SECONDS) -> int:
+    """Poll for writes, then recompute the hot queries that are (or are about to go) stale; returns how many."""
+    if cache.size <= 0:
+        return 0
+    cache.set_positions(current_positions())
+    generation = cache.generation
+    queries = cache.due(k, horizon=interval)
+
+    def refresh(query: ListQuery) -> None:
+        db = SessionLocal()
+        try:
+            cache.put(query, generation, render(db, query))
+        finally:
+            db.close()
+
+    # Propagate the first failure, after every refresh has finished
+    for future in [executor.submit(refresh, query) for query in queries]:
+        future.result()
+    list_cache_warmed_total.inc(len(queries))
+    return len(queries)
+
+
+_warm_executor = ThreadPoolExecutor(LIST_CACHE_WARM_WORKERS, thread_name_prefix="list-cache")
+
+
+def warm_job() -> int:
+    """Warm this worker's hottest list responses; runs every LIST_CACHE_WARM_SECONDS."""
+    warmed = warm(_warm_executor)
+    if warmed:
+        logger.debug("Warmed %d report list responses", warmed)
+    return warmed
@@ -1,20 +1,25 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from contextlib import asynccontextmanager
 import logging
 import os
-import sentry_sdk
-from .database import engine, get_db
+from .database import get_db
 from .models import Base
 from .api import api_router
+from . import archive, cpu_pool, digests, events, health, idempotency, list_cache, metrics, notifications, query_log, report_index, scheduler, search, verification
+from .cold_storage import COLD_STORAGE_DIR, COLD_STORAGE_URL
+from .ml_client import ml_client
+from .sharding import shard_router
+
+# Schema is owned by Alembic (`alembic upgrade head`); create_all is a dev convenience
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "true").lower() == "true"
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+SENTRY_DSN = os.getenv("SENTRY_DSN")
 
 # Security headers middleware
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
@@ -32,25 +37,63 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting CivicSense API")
-    # Create database tables (in production, use migrations)
-    Base.metadata.create_all(bind=engine)
+    if AUTO_CREATE_SCHEMA:
+        for shard in shard_router.shards:
+            Base.metadata.create_all(bind=shard.engine)
+            search.ensure_index(shard.engine)
+    cpu_pool.start()
+    jobs = scheduler.Scheduler()
+    # Shared jobs: one worker per run, taken by lease
+    jobs.add("verification_retry", verification.VERIFICATION_RETRY_SECONDS, verification.retry_pending_job)
+    if digests.DIGEST_INTERVAL_SECONDS > 0:
+        jobs.add("digests", digests.DIGEST_INTERVAL_SECONDS, digests.digest_job)
+    if events.EVENT_SNAPSHOT_SECONDS > 0:
+        jobs.add("event_snapshots", events.EVENT_SNAPSHOT_SECONDS, events.snapshot_job)
+    if idempotency.IDEMPOTENCY_PURGE_SECONDS > 0:
+        jobs.add("idempotency_purge", idempotency.IDEMPOTENCY_PURGE_SECONDS, idempotency.purge_job)
+    if archive.ARCHIVE_AFTER_DAYS > 0 and archive.ARCHIVE_INTERVAL_SECONDS > 0:
+        jobs.add("archive", archive.ARCHIVE_INTERVAL_SECONDS, archive.archive_job)
+    if notifications.NOTIFY_MATCH_SECONDS > 0:
+        jobs.add("notification_match", notifications.NOTIFY_MATCH_SECONDS, notifications.match_job)
+        jobs.add("notification_delivery", notifications.NOTIFY_DELIVERY_SECONDS, notifications.deliver_job)
+    # Per-worker jobs: they maintain this worker's in-memory state
+    if report_index.REPORT_INDEX_ENABLED:
+        jobs.add("report_index_refresh", report_index.REPORT_INDEX_REFRESH_SECONDS, report_index.refresh_job,
+                 leased=False, run_at_start=True)
+        jobs.add("report_index_reload", report_index.REPORT_INDEX_RELOAD_SECONDS, report_index.reload_job, leased=False)
+    if list_cache.LIST_CACHE_SIZE > 0:
+        jobs.add("list_cache_warm", list_cache.LIST_CACHE_WARM_SECONDS, list_cache.warm_job,
+                 leased=False, run_at_start=True)
+    jobs.start()
     yield
-    # Shutdown
+    # Shutdown: runs after the server has stopped accepting and drained requests
     logger.info("Shutting down CivicSense API")
+    await jobs.stop()
+    await run_in_threadpool(cpu_pool.shutdown)
+    await ml_client.close()
+    for shard in shard_router.shards:
+        shard.engine.dispose()
 
-# Initialize Sentry for error tracking
-sentry_sdk.init(
-    dsn=os.getenv("SENTRY_DSN"),
-    # Set traces_sample_rate to 1.0 to capture 100% of transactions for performance monitoring
-    traces_sample_rate=1.0,
-)
+# Initialize Sentry for error tracking; the SDK is only imported when configured
+if SENTRY_DSN:
+    import sentry_sdk
+
+    sentry_sdk.init(
+        dsn=SENTRY_DSN,
+        # Adaptive sampling keeps tracing cost bounded at high request volume
+        traces_sampler=metrics.traces_sampler_from_env(),
+    )
+
+for shard in shard_router.shards:
+    # Query count/latency and pool stats for /metrics, labelled by shard
+    metrics.instrument_engine(shard.engine, shard.name)
+# Sampled slow-query log, labelled by route, fed from the same statement timings
+metrics.add_statement_hook(query_log.record_statement)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address, default_limits=["100/minute"])
 app = FastAPI(
     title="CivicSense API",
     description="AI-verified Civic & Climate Reporting API",
@@ -60,14 +103,25 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# Add rate limiting middleware
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
+# Rate limiting (slowapi is not imported at all when disabled)
+limiter = None
+if RATE_LIMIT_ENABLED:
+    from slowapi import Limiter, _rate_limit_exceeded_handler
+    from slowapi.util import get_remote_address
+    from slowapi.errors import RateLimitExceeded
+    from slowapi.middleware import SlowAPIMiddleware
+
+    limiter = Limiter(key_func=get_remote_address, default_limits=["100/minute"])
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+    app.add_middleware(SlowAPIMiddleware)
 
 # Add security headers middleware
 app.add_middleware(SecurityHeadersMiddleware)
 
+# Per-route latency histograms
+app.add_middleware(metrics.MetricsMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -85,6 +139,10 @@ app.add_middleware(
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+# Local stand-in for the archive's cold storage tier
+if COLD_STORAGE_URL.startswith("/"):
+    os.makedirs(COLD_STORAGE_DIR, exist_ok=True)
+    app.mount(COLD_STORAGE_URL, StaticFiles(directory=COLD_STORAGE_DIR), name="cold")
 
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
@@ -99,16 +157,25 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 @app.get("/api/v1/health")
-def health_check() -> dict:
-    """Health check endpoint."""
-    return {
-        "status": "ok",
-        "services": {
-            "db": "ok",  # TODO: Add actual db test
-            "ml": "ok"
-        },
-        "version": "0.1.0"
-    }
+async def health_check() -> JSONResponse:
+    """Health check endpoint with cached, time-boxed DB and ML probes."""
+    result = await health.check_health()
+    return JSONResponse(
+        status_code=503 if result["status"] == "error" else 200,
+        content={**result, "version": "0.1.0"}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+if limiter is not None:
+    # Exemptions are looked up by the endpoint's qualified name
+    limiter.exempt(metrics_endpoint)
 
 @app.get("/")
 def root():
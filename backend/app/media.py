@@ -0,0 +1,93 @@
+"""
+Decode-once image processing for uploads.
+
+An uploaded image is decoded and downscaled a single time into a ``Frame``
+(RGB pixels, longest side MEDIA_FRAME_SIZE). The same frame is used for the
+perceptual hash, the thumbnail written next to the upload, and as the
+input sent to the ML service, which then no longer has to fetch and decode
+the original file.
+"""
+
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+MEDIA_FRAME_SIZE = int(os.getenv("MEDIA_FRAME_SIZE", "320"))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_DIR = "thumbnails"  # under the uploads directory
+
+
+@dataclass
+class Frame:
+    """Downscaled RGB pixels, row-major, 3 bytes per pixel."""
+
+    pixels: bytes
+    width: int
+    height: int
+
+    def to_image(self):
+        from PIL import Image
+
+        return Image.frombuffer("RGB", (self.width, self.height), self.pixels, "raw", "RGB", 0, 1)
+
+
+def decode_frame(content: bytes, max_size: int = MEDIA_FRAME_SIZE) -> Optional[Frame]:
+    """Decode and downscale an upload; None if it is not a readable image."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            # Let the JPEG decoder skip straight to a reduced scale
+            image.draft("RGB", (max_size, max_size))
+            image = image.convert("RGB")
+            image.thumbnail((max_size, max_size), Image.BILINEAR)
+            return Frame(image.tobytes(), image.width, image.height)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+
+
+def perceptual_hash(frame: Frame) -> str:
+    """64-bit difference hash (dHash) as 16 hex characters."""
+    from PIL import Image
+
+    small = frame.to_image().convert("L").resize((9, 8), Image.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            bits = (bits << 1) | (left > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+def save_thumbnail(frame: Frame, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame.to_image().save(path, format="JPEG", quality=THUMBNAIL_QUALITY)
+
+
+@dataclass
+class ProcessedImage:
+    frame: Frame
+    perceptual_hash: str
+    thumbnail_path: str
+
+
+def process_upload(content: bytes, upload_dir: str, name: str) -> Optional[ProcessedImage]:
+    """Decode once, then hash and thumbnail from the same frame."""
+    frame = decode_frame(content)
+    if frame is None:
+        return None
+    thumbnail_path = os.path.join(upload_dir, THUMBNAIL_DIR, f"{name}.jpg")
+    save_thumbnail(frame, thumbnail_path)
+    return ProcessedImage(frame, perceptual_hash(frame), thumbnail_path)
+
+
+def content_hash(content: bytes) -> str:
+    """SHA-256 of an upload; hashlib releases the GIL, so this can run in a thread."""
+    return hashlib.sha256(content).hexdigest()
@@ -0,0 +1,433 @@
+"""
+Prometheus-style metrics for the CivicSense API.
+
+A small in-process registry exposing counters, gauges and histograms in the
+Prometheus text exposition format, plus the hooks that feed it: an HTTP
+middleware for per-route latency, SQLAlchemy engine events for query counts
+and latencies, and an adaptive Sentry traces sampler.
+"""
+
+import bisect
+import contextvars
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.middleware.base import BaseHTTPMiddleware
+
+# Latency buckets in seconds, tuned for API and DB calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Size buckets in bytes for uploads (1KB .. 10MB)
+SIZE_BUCKETS = (1024, 10240, 102400, 524288, 1048576, 5242880, 10485760)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for a labelled metric family."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from a callback at scrape time."""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                values = dict(self._callback())
+            except Exception:
+                values = {}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed histogram with sum and count."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels: str) -> float:
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0.0
+
+    def time(self, **labels: str) -> "_Timer":
+        """Context manager observing the elapsed wall time of its block."""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0.0
+            for bound, bucket_count in zip(self.buckets, state):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(state[-1])}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    """Collection of metric families rendered together on scrape."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback=callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP
+http_requests_total = REGISTRY.counter(
+    "civicsense_http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+http_request_duration_seconds = REGISTRY.histogram(
+    "civicsense_http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+
+# Database
+db_queries_total = REGISTRY.counter(
+    "civicsense_db_queries_total", "SQL statements executed", ("shard", "operation")
+)
+db_query_duration_seconds = REGISTRY.histogram(
+    "civicsense_db_query_duration_seconds", "SQL statement latency", ("shard", "operation")
+)
+db_query_errors_total = REGISTRY.counter(
+    "civicsense_db_query_errors_total", "SQL statements that raised", ("shard", "operation")
+)
+
+# Uploads
+upload_bytes_total = REGISTRY.counter(
+    "civicsense_upload_bytes_total", "Bytes received in media uploads", ("kind",)
+)
+upload_size_bytes = REGISTRY.histogram(
+    "civicsense_upload_size_bytes", "Size of individual media uploads", ("kind",), buckets=SIZE_BUCKETS
+)
+upload_deduplicated_total = REGISTRY.counter(
+    "civicsense_upload_deduplicated_total", "Uploads matching a stored file, which were not written again", ("kind",)
+)
+idempotent_replays_total = REGISTRY.counter(
+    "civicsense_idempotent_replays_total", "Requests answered with the stored response of their Idempotency-Key"
+)
+
+# Report list cache
+list_cache_requests_total = REGISTRY.counter(
+    "civicsense_list_cache_requests_total", "Report list requests by cache result (fresh, stale, miss, bypass)", ("result",)
+)
+list_cache_warmed_total = REGISTRY.counter(
+    "civicsense_list_cache_warmed_total", "Report list responses recomputed by the cache warmer"
+)
+
+# ML service
+ml_request_duration_seconds = REGISTRY.histogram(
+    "civicsense_ml_request_duration_seconds", "Latency of calls to the ML service", ("endpoint", "outcome")
+)
+
+
+def _operation(statement: str) -> str:
+    """First SQL keyword of a statement, lower-cased (select, insert, ...)."""
+    head = statement.lstrip().split(None, 1)
+    return head[0].lower() if head else "unknown"
+
+
+# Instrumented engines by shard name, read by the pool gauge at scrape time
+_engines: Dict[str, Engine] = {}
+
+
+def _pool_stats() -> Dict[LabelValues, float]:
+    stats = {}
+    for shard, engine in list(_engines.items()):
+        pool = engine.pool
+        for stat in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, stat, None)
+            if callable(method):
+                stats[(shard, stat)] = float(method())
+    return stats
+
+
+db_pool_connections = REGISTRY.gauge(
+    "civicsense_db_pool_connections", "SQLAlchemy connection pool state", ("shard", "state"), callback=_pool_stats
+)
+
+# Called with (statement, parameters, executemany, seconds) after each statement on instrumented engines
+StatementHook = Callable[[str, Any, bool, float], None]
+_statement_hooks: List[StatementHook] = []
+
+
+def add_statement_hook(hook: StatementHook) -> None:
+    """Pass every statement's latency, as timed for the query metrics, to ``hook`` as well."""
+    if hook not in _statement_hooks:
+        _statement_hooks.append(hook)
+
+
+def instrument_engine(engine: Engine, shard: str = "default") -> None:
+    """Attach query count/latency hooks to a shard's SQLAlchemy engine and add its pool to the gauge."""
+    if getattr(engine, "_civicsense_instrumented", False):
+        return
+    engine._civicsense_instrumented = True
+    _engines[shard] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        operation = _operation(statement)
+        db_queries_total.inc(shard=shard, operation=operation)
+        db_query_duration_seconds.observe(elapsed, shard=shard, operation=operation)
+        for hook in _statement_hooks:
+            hook(statement, parameters, executemany, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
+        db_query_errors_total.inc(shard=shard, operation=_operation(exception_context.statement or ""))
+
+
+# ASGI scope of the request being served; routing fills in its "route"
+current_request: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("current_request", default=None)
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """Record request count and latency labelled by the matched route template."""
+
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        current_request.set(request.scope)
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            elapsed = time.perf_counter() - start
+            http_request_duration_seconds.observe(elapsed, method=request.method, route=route_path)
+            http_requests_total.inc(method=request.method, route=route_path, status=str(status_code))
+
+
+class AdaptiveSampler:
+    """
+    Sentry ``traces_sampler`` that keeps the number of sampled transactions
+    near a per-minute budget.
+
+    Each transaction is sampled with ``base_rate`` until the budget for the
+    current window is spent; after that the rate is scaled down by the ratio
+    of budget to observed traffic from the previous window.
+    """
+
+    def __init__(self, base_rate: float = 0.05, target_per_minute: int = 60, ignored_paths: Iterable[str] = ()):
+        self.base_rate = base_rate
+        self.target_per_minute = target_per_minute
+        self.ignored_paths = tuple(ignored_paths)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._seen = 0
+        self._sampled = 0
+        self._rate = base_rate
+
+    def _roll_window(self, now: float) -> None:
+        if now - self._window_start < 60:
+            return
+        seen_per_minute = self._seen * 60 / max(now - self._window_start, 1e-9)
+        if self.target_per_minute <= 0 or seen_per_minute <= 0:
+            self._rate = self.base_rate
+        else:
+            self._rate = min(self.base_rate, self.target_per_minute / seen_per_minute)
+        self._window_start = now
+        self._seen = 0
+        self._sampled = 0
+
+    def __call__(self, sampling_context: dict) -> float:
+        asgi_scope = sampling_context.get("asgi_scope") or {}
+        if asgi_scope.get("path", "") in self.ignored_paths:
+            return 0.0
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            return float(parent_sampled)
+
+        with self._lock:
+            now = time.monotonic()
+            self._roll_window(now)
+            self._seen += 1
+            if self.target_per_minute > 0 and self._sampled >= self.target_per_minute:
+                return 0.0
+            rate = self._rate
+            if random.random() < rate:
+                self._sampled += 1
+                return 1.0
+            return 0.0
+
+
+def traces_sampler_from_env() -> AdaptiveSampler:
+    """Build the Sentry traces sampler from SENTRY_TRACES_* environment variables."""
+    return AdaptiveSampler(
+        base_rate=float(os.getenv("SENTRY_TRACES_SAMPLE_RATE", "0.05")),
+        target_per_minute=int(os.getenv("SENTRY_TRACES_PER_MINUTE", "60")),
+        ignored_paths=("/metrics", "/api/v1/health"),
+    )
@@ -0,0 +1,245 @@
+"""
+Client for the ML inference service.
+
+One pooled ``httpx.AsyncClient`` is shared by the whole worker so inference
+calls reuse keep-alive connections. Calls are time-boxed, hedged (a second
+request is sent if the first is slower than ``hedge_after``) and guarded by
+a circuit breaker; while the breaker is open callers get
+``MLServiceUnavailable`` immediately and verification is left queued.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from .media import Frame
+from .metrics import REGISTRY, ml_request_duration_seconds
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://localhost:8001")
+ML_TIMEOUT_SECONDS = float(os.getenv("ML_TIMEOUT_SECONDS", "5.0"))
+ML_HEDGE_AFTER_MS = float(os.getenv("ML_HEDGE_AFTER_MS", "300"))  # 0 disables hedging
+ML_MAX_CONNECTIONS = int(os.getenv("ML_MAX_CONNECTIONS", "20"))
+ML_HTTP2 = os.getenv("ML_HTTP2", "false").lower() == "true"  # needs TLS in front of the ML service
+ML_BREAKER_FAILURES = int(os.getenv("ML_BREAKER_FAILURES", "5"))
+ML_BREAKER_RESET_SECONDS = float(os.getenv("ML_BREAKER_RESET_SECONDS", "30"))
+ML_SLOW_CALL_MS = float(os.getenv("ML_SLOW_CALL_MS", "2000"))
+# Directory shared with an ML service on the same host (e.g. a tmpfs under
+# /dev/shm); when set, decoded frames are handed over as files, not request bodies
+ML_SHARED_FRAME_DIR = os.getenv("ML_SHARED_FRAME_DIR")
+
+ml_hedged_requests_total = REGISTRY.counter(
+    "civicsense_ml_hedged_requests_total", "ML calls that sent a hedge request", ("endpoint",)
+)
+ml_circuit_state = REGISTRY.gauge(
+    "civicsense_ml_circuit_open", "1 while the ML circuit breaker is open or half-open"
+)
+
+
+class MLServiceUnavailable(Exception):
+    """The ML service failed, timed out, or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures (errors or calls slower than
+    ``slow_call_seconds``) the circuit opens for ``reset_timeout`` seconds;
+    then a single trial call is let through (half-open) and its outcome
+    closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, slow_call_seconds: float = 2.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record(self, success: bool, elapsed: float) -> None:
+        if success and elapsed <= self.slow_call_seconds:
+            self.failures = 0
+            self.state = self.CLOSED
+            self._trial_in_flight = False
+            ml_circuit_state.set(0)
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("ML circuit breaker opened after %d failures", self.failures)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+            ml_circuit_state.set(1)
+
+    def is_available(self) -> bool:
+        """Whether a call would be let through now, without reserving the half-open trial."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not self._trial_in_flight
+
+
+class MLClient:
+    """Pooled, hedged, circuit-broken client for ``ml/inference_server.py``."""
+
+    def __init__(
+        self,
+        base_url: str = ML_SERVICE_URL,
+        timeout: float = ML_TIMEOUT_SECONDS,
+        hedge_after: Optional[float] = ML_HEDGE_AFTER_MS / 1000,
+        max_connections: int = ML_MAX_CONNECTIONS,
+        http2: bool = ML_HTTP2,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.hedge_after = hedge_after or None
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.breaker = breaker or CircuitBreaker(
+            ML_BREAKER_FAILURES, ML_BREAKER_RESET_SECONDS, ML_SLOW_CALL_MS / 1000
+        )
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """The shared connection pool, created on first use (httpx is imported then too)."""
+        if self._client is None or self._client.is_closed:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60,
+                ),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _send(self, method: str, path: str, **kwargs) -> "httpx.Response":
+        response = await self.client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def _hedged(self, endpoint: str, method: str, path: str, **kwargs) -> "httpx.Response":
+        """Send the request, and a duplicate if it is still pending after ``hedge_after``."""
+        if not self.hedge_after:
+            return await self._send(method, path, **kwargs)
+
+        tasks = {asyncio.ensure_future(self._send(method, path, **kwargs))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                ml_hedged_requests_total.inc(endpoint=endpoint)
+                tasks.add(asyncio.ensure_future(self._send(method, path, **kwargs)))
+
+            # First successful response wins; fail only if every attempt failed
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call(self, endpoint: str, method: str = "POST", **kwargs) -> Dict[str, Any]:
+        """Call ``/internal/ml/<endpoint>`` and return the decoded JSON body."""
+        if not self.breaker.allow_request():
+            ml_request_duration_seconds.observe(0.0, endpoint=endpoint, outcome="circuit_open")
+            raise MLServiceUnavailable("ML circuit breaker is open")
+
+        import httpx
+
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self._hedged(endpoint, method, f"/internal/ml/{endpoint}", **kwargs),
+                timeout=self.timeout,
+            )
+        except (httpx.HTTPError, asyncio.TimeoutError) as exc:
+            elapsed = time.perf_counter() - start
+            self.breaker.record(False, elapsed)
+            outcome = "timeout" if isinstance(exc, (asyncio.TimeoutError, httpx.TimeoutException)) else "error"
+            ml_request_duration_seconds.observe(elapsed, endpoint=endpoint, outcome=outcome)
+            raise MLServiceUnavailable(f"ML {endpoint} failed: {exc.__class__.__name__}") from exc
+
+        elapsed = time.perf_counter() - start
+        self.breaker.record(True, elapsed)
+        ml_request_duration_seconds.observe(elapsed, endpoint=endpoint, outcome="ok")
+        return response.json()
+
+    async def image_infer(self, image_url: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Classify an uploaded image; ``sha256`` lets the ML service answer re-uploads from its cache."""
+        params = {"image_url": image_url}
+        if sha256:
+            params["sha256"] = sha256
+        return await self.call("image_infer", params=params)
+
+    async def image_infer_frame(self, frame: Frame, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Classify an already decoded frame, so the ML service skips the fetch and decode."""
+        params: Dict[str, Any] = {"width": frame.width, "height": frame.height}
+        if sha256:
+            params["sha256"] = sha256
+        if not ML_SHARED_FRAME_DIR:
+            return await self.call(
+                "image_infer_frame", params=params, content=frame.pixels,
+                headers={"Content-Type": "application/octet-stream"},
+            )
+
+        path = os.path.join(ML_SHARED_FRAME_DIR, f"{uuid.uuid4().hex}.rgb")
+        with open(path, "wb") as f:
+            f.write(frame.pixels)
+        try:
+            return await self.call("image_infer_frame", params={**params, "frame_path": path})
+        finally:
+            os.unlink(path)
+
+    async def text_infer(self, text: str) -> Dict[str, Any]:
+        return await self.call("text_infer", params={"text": text})
+
+    async def health(self, timeout: float) -> "httpx.Response":
+        """GET /health on the shared pool, bypassing the breaker and hedging."""
+        return await self.client.get("/health", timeout=timeout)
+
+
+# Shared per-process client; closed by the app lifespan
+ml_client = MLClient()
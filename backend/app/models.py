@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, Text, ForeignKey, JSON, Index, LargeBinary, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -16,7 +16,7 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
-    reports = relationship("Report", back_populates="reporter")
+    reports = relationship("Report", foreign_keys="Report.reporter_id", back_populates="reporter")
 
 class Report(Base):
     __tablename__ = "reports"
@@ -31,6 +31,10 @@ class Report(Base):
     # Location privacy - rounded coordinates for public display
     location_rounded_lat = Column(Float)
     location_rounded_lng = Column(Float)
+    # Geohash prefix the report is sharded by (see sharding.py)
+    region = Column(String(12), index=True)
+    # Geohash of the rounded location, for nearby search
+    geohash = Column(String(12))
 
     # Status and priority
     status = Column(String, default="created")  # created, verified, in_progress, resolved
@@ -59,6 +63,48 @@ class Report(Base):
     media_files = relationship("MediaFile", back_populates="report")
     activities = relationship("Activity", back_populates="report")
 
+# Columns the list endpoint returns beyond the index keys; Postgres stores them
+# in the index leaf pages (INCLUDE) so list queries can be index-only scans.
+REPORT_SUMMARY_INCLUDE = ["id", "title", "lat", "lng", "location_rounded_lat", "location_rounded_lng"]
+UNRESOLVED_REPORTS = text("status != 'resolved'")
+
+# Default list ordering, optionally narrowed by status
+Index(
+    "ix_reports_status_priority_created",
+    Report.status, Report.priority_score.desc(), Report.created_at.desc(),
+    postgresql_include=REPORT_SUMMARY_INCLUDE,
+)
+Index(
+    "ix_reports_priority_created",
+    Report.priority_score.desc(), Report.created_at.desc(),
+    postgresql_include=REPORT_SUMMARY_INCLUDE + ["status"],
+)
+# Map viewport (bbox) queries
+Index(
+    "ix_reports_rounded_location",
+    Report.location_rounded_lat, Report.location_rounded_lng,
+    postgresql_include=["id", "title", "lat", "lng", "status", "priority_score", "created_at"],
+)
+# Nearby search: geohash cell ranges, with everything needed to rank the
+# candidates by distance in the index itself
+Index(
+    "ix_reports_geohash_location",
+    Report.geohash, Report.location_rounded_lat, Report.location_rounded_lng, Report.status, Report.id,
+)
+# Partial index for the open-reports feed, which never needs resolved rows
+Index(
+    "ix_reports_open_priority_created",
+    Report.priority_score.desc(), Report.created_at.desc(),
+    postgresql_where=UNRESOLVED_REPORTS,
+    sqlite_where=UNRESOLVED_REPORTS,
+)
+# Archival picks resolved reports by age and skips those other reports point at
+RESOLVED_REPORTS = text("resolved_at IS NOT NULL")
+Index("ix_reports_resolved_at", Report.resolved_at, postgresql_where=RESOLVED_REPORTS, sqlite_where=RESOLVED_REPORTS)
+DUPLICATE_REPORTS = text("duplicate_of_id IS NOT NULL")
+Index("ix_reports_duplicate_of_id", Report.duplicate_of_id, postgresql_where=DUPLICATE_REPORTS,
+      sqlite_where=DUPLICATE_REPORTS)
+
 class MediaFile(Base):
     __tablename__ = "media_files"
 
@@ -79,14 +125,20 @@ class MediaFile(Base):
     # Relationships
     report = relationship("Report", back_populates="media_files")
 
+# Uploads are deduplicated by content before they are written (see reports.create_report)
+Index("ix_media_files_sha256_hash", MediaFile.sha256_hash)
+
 class Activity(Base):
     __tablename__ = "activities"
 
     id = Column(String, primary_key=True, index=True)
+    # Position in the shard's event stream (see events.py); commit order
+    seq = Column(BigInteger)
     report_id = Column(String, ForeignKey("reports.id"), nullable=False)
     user_id = Column(String, ForeignKey("users.id"))
     action = Column(String, nullable=False)  # created, verified, claimed, resolved, etc.
     details = Column(JSON)  # Additional action-specific data
+    state = Column(JSON(none_as_null=True))  # Report fields this event set, for replay
     ip_address = Column(String)
     user_agent = Column(String)
 
@@ -95,4 +147,154 @@ class Activity(Base):
 
     # Relationships
     report = relationship("Report", back_populates="activities")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+Index("ix_activities_seq", Activity.seq, unique=True)
+# Replay folds each report's events in order; compaction drops old events by age
+Index("ix_activities_report_seq", Activity.report_id, Activity.seq)
+Index("ix_activities_created_at", Activity.created_at)
+
+class EventSequence(Base):
+    """Single-row counter handing out event stream positions."""
+    __tablename__ = "event_sequence"
+
+    id = Column(Integer, primary_key=True)
+    last_seq = Column(BigInteger, nullable=False, default=0)
+
+class ReportSnapshot(Base):
+    """A report's state folded from its events up to ``seq``."""
+    __tablename__ = "report_snapshots"
+
+    report_id = Column(String, primary_key=True)
+    seq = Column(BigInteger, nullable=False)
+    state = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class EventConsumer(Base):
+    """How far a change-data consumer has read the event stream."""
+    __tablename__ = "event_consumers"
+
+    name = Column(String, primary_key=True)
+    position = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ReportStat(Base):
+    """Incrementally maintained report count for one dashboard bucket."""
+    __tablename__ = "report_stats"
+
+    dimension = Column(String, primary_key=True)  # status, priority_level, category, neighborhood
+    key = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+class StatsSketch(Base):
+    """Serialized quantile sketch (t-digest) for a dashboard metric."""
+    __tablename__ = "stats_sketches"
+
+    name = Column(String, primary_key=True)  # e.g. resolution_hours
+    data = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class AuthorityDigest(Base):
+    """One batched authority message: open reports of a jurisdiction, category and priority."""
+    __tablename__ = "authority_digests"
+
+    id = Column(String, primary_key=True, index=True)
+    jurisdiction = Column(String, nullable=False)  # geohash prefix, see digests.py
+    category = Column(String, nullable=False)
+    priority_level = Column(String, nullable=False)
+    report_count = Column(Integer, nullable=False)
+    report_ids = Column(JSON, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    period_end = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+Index("ix_authority_digests_jurisdiction_created", AuthorityDigest.jurisdiction, AuthorityDigest.created_at.desc())
+
+class DigestRun(Base):
+    """A completed digest pass over one shard; the next pass starts at ``period_end``."""
+    __tablename__ = "digest_runs"
+
+    shard = Column(String, primary_key=True)
+    # Part of the key so two workers running the same window cannot both commit it
+    period_start = Column(DateTime(timezone=True), primary_key=True)
+    period_end = Column(DateTime(timezone=True), nullable=False)
+    digests = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class IdempotencyKey(Base):
+    """A client-supplied request key and the response it produced (see idempotency.py)."""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)  # user id or "anonymous", then the client's key
+    fingerprint = Column(String, nullable=False)
+    response = Column(Text)  # null while the first request is still running
+    report_id = Column(String)  # report the request creates, chosen before it is inserted (see reserve_report)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+Index("ix_idempotency_keys_expires_at", IdempotencyKey.expires_at)
+
+class ReportArchive(Base):
+    """A resolved report moved out of the hot tables with its media and activities (see archive.py)."""
+    __tablename__ = "report_archive"
+
+    report_id = Column(String, primary_key=True)
+    region = Column(String(12))
+    resolved_at = Column(DateTime(timezone=True))
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed JSON
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class JobLease(Base):
+    """Which worker may run a scheduled job, until when, and when it is next due (see scheduler.py)."""
+    __tablename__ = "job_leases"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String)  # host:pid:nonce of the worker holding the lease
+    expires_at = Column(DateTime(timezone=True))  # null when no run is in progress
+    next_run_at = Column(DateTime(timezone=True), nullable=False)
+    last_started_at = Column(DateTime(timezone=True))
+    last_finished_at = Column(DateTime(timezone=True))
+    last_duration_ms = Column(Float)
+    last_status = Column(String)  # success or error
+
+class Subscription(Base):
+    """A resident's geofence: a circle or a polygon to be alerted about (see notifications.py)."""
+    __tablename__ = "subscriptions"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    lat = Column(Float)  # circle center and radius; null for polygons
+    lng = Column(Float)
+    radius_m = Column(Float)
+    polygon = Column(JSON)  # [[lng, lat], ...] ring; null for circles
+    min_priority = Column(Integer, nullable=False)
+    active = Column(Boolean, nullable=False, default=True)  # deleted subscriptions stay, for the matcher to see
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+Index("ix_subscriptions_user_id", Subscription.user_id)
+Index("ix_subscriptions_updated_at", Subscription.updated_at)
+
+class Notification(Base):
+    """A subscriber alert for one report, queued until the sender takes it."""
+    __tablename__ = "notifications"
+
+    id = Column(String, primary_key=True)
+    subscription_id = Column(String, ForeignKey("subscriptions.id"), nullable=False)  # the first fence matched
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    report_id = Column(String, nullable=False)  # in whichever shard holds the report
+    payload = Column(JSON, nullable=False)  # title, priority, public location and link at match time
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    sent_at = Column(DateTime(timezone=True))
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String)
+
+# One alert per user and report, however many of their fences match
+Index("ix_notifications_user_report", Notification.user_id, Notification.report_id, unique=True)
+Index("ix_notifications_user_created", Notification.user_id, Notification.created_at.desc())
+# The delivery queue: only unsent rows, oldest first
+PENDING_NOTIFICATIONS = text("sent_at IS NULL")
+Index("ix_notifications_pending", Notification.created_at, postgresql_where=PENDING_NOTIFICATIONS,
+      sqlite_where=PENDING_NOTIFICATIONS)
@@ -0,0 +1,402 @@
+"""
+Geofenced alerts: residents subscribe to an area and are notified when a
+high-priority report there is verified.
+
+Subscriptions (a circle or a polygon, and a minimum priority) live in the
+primary database. Two scheduled jobs do the work, each on one worker at a
+time (see scheduler.py):
+
+  - ``match_job`` tails every shard's event stream as the ``notifications``
+    consumer (see events.consume). For each report that became verified,
+    or whose priority changed while verified, it looks up the containing
+    fences in an in-memory grid index (see geofence.py) and queues one
+    notification per subscriber. A unique (user, report) key makes
+    overlapping fences and redelivered events harmless. The index follows subscription
+    changes by their ``updated_at`` and is rebuilt every
+    GEOFENCE_RELOAD_SECONDS.
+  - ``deliver_job`` takes up to NOTIFY_BATCH_SIZE queued notifications at a
+    time, folds each user's into one message and hands the batch to
+    ``notification_sender``. Failed batches are retried on the next pass,
+    up to NOTIFY_MAX_ATTEMPTS times.
+
+``LogNotificationSender`` is the stand-in used until a push or email
+provider is configured: it logs the messages and keeps the most recent
+ones. Another sender only needs the same ``send`` method.
+"""
+
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import events, models, schemas
+from .database import SessionLocal
+from .digests import REPORT_PUBLIC_URL
+from .geofence import Fence, GeofenceIndex
+from .metrics import REGISTRY
+from .sharding import shard_router
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_MATCH_SECONDS = float(os.getenv("NOTIFY_MATCH_SECONDS", "5"))
+NOTIFY_DELIVERY_SECONDS = float(os.getenv("NOTIFY_DELIVERY_SECONDS", "30"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "500"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+# Default subscription threshold: the "high" priority level (see verification.priority_from_score)
+NOTIFY_MIN_PRIORITY = int(os.getenv("NOTIFY_MIN_PRIORITY", "70"))
+GEOFENCE_RELOAD_SECONDS = float(os.getenv("GEOFENCE_RELOAD_SECONDS", "3600"))
+# Subscriptions changed this long before the last sync are read again, for transactions still in flight
+GEOFENCE_SYNC_LAG_SECONDS = float(os.getenv("GEOFENCE_SYNC_LAG_SECONDS", "60"))
+SUBSCRIPTION_MAX_RADIUS_M = float(os.getenv("SUBSCRIPTION_MAX_RADIUS_M", "50000"))
+SUBSCRIPTION_MAX_VERTICES = int(os.getenv("SUBSCRIPTION_MAX_VERTICES", "100"))
+SUBSCRIPTION_LIMIT_PER_USER = int(os.getenv("SUBSCRIPTION_LIMIT_PER_USER", "20"))
+
+CONSUMER = "notifications"
+NOTIFIED_STATUS = "verified"
+
+notifications_queued_total = REGISTRY.counter(
+    "civicsense_notifications_queued_total", "Notifications queued for matched subscriptions"
+)
+notifications_sent_total = REGISTRY.counter(
+    "civicsense_notifications_sent_total", "Queued notifications handed to the sender, by outcome", ("outcome",)
+)
+geofence_match_seconds = REGISTRY.histogram(
+    "civicsense_geofence_match_seconds", "Time to find the subscriptions containing one report",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+
+
+class SubscriptionError(ValueError):
+    """A subscription that cannot be stored; the message is safe to show the user."""
+
+
+def validate_fence(data: schemas.SubscriptionCreate) -> None:
+    circle = data.lat is not None and data.lng is not None and data.radius_m is not None
+    if circle == bool(data.polygon):
+        raise SubscriptionError("Give either lat, lng and radius_m, or a polygon")
+    if circle:
+        if not (-90 <= data.lat <= 90 and -180 <= data.lng <= 180):
+            raise SubscriptionError("Invalid coordinates")
+        if not 0 < data.radius_m <= SUBSCRIPTION_MAX_RADIUS_M:
+            raise SubscriptionError(f"radius_m must be between 0 and {SUBSCRIPTION_MAX_RADIUS_M:g}")
+        return
+    ring = data.polygon
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring = ring[:-1]
+    if not 3 <= len(ring) <= SUBSCRIPTION_MAX_VERTICES:
+        raise SubscriptionError(f"A polygon needs 3 to {SUBSCRIPTION_MAX_VERTICES} [lng, lat] points")
+    if any(len(point) != 2 or not (-180 <= point[0] <= 180 and -90 <= point[1] <= 90) for point in ring):
+        raise SubscriptionError("Polygon points must be [lng, lat] pairs")
+
+
+def create_subscription(db: Session, user_id: str, data: schemas.SubscriptionCreate) -> models.Subscription:
+    validate_fence(data)
+    count = db.query(models.Subscription.id).filter(
+        models.Subscription.user_id == user_id, models.Subscription.active.is_(True)
+    ).count()
+    if count >= SUBSCRIPTION_LIMIT_PER_USER:
+        raise SubscriptionError(f"At most {SUBSCRIPTION_LIMIT_PER_USER} subscriptions per user")
+    circle = not data.polygon
+    subscription = models.Subscription(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        lat=data.lat if circle else None,
+        lng=data.lng if circle else None,
+        radius_m=data.radius_m if circle else None,
+        polygon=None if circle else data.polygon,
+        min_priority=NOTIFY_MIN_PRIORITY if data.min_priority is None else data.min_priority,
+        active=True,
+        updated_at=datetime.utcnow(),
+    )
+    db.add(subscription)
+    db.commit()
+    db.refresh(subscription)
+    return subscription
+
+
+def get_subscriptions(db: Session, user_id: str) -> List[models.Subscription]:
+    return (
+        db.query(models.Subscription)
+        .filter(models.Subscription.user_id == user_id, models.Subscription.active.is_(True))
+        .order_by(models.Subscription.created_at)
+        .all()
+    )
+
+
+def delete_subscription(db: Session, user_id: str, subscription_id: str) -> bool:
+    """Deactivate a subscription; kept as a row so the matcher sees the change."""
+    subscription = db.get(models.Subscription, subscription_id)
+    if subscription is None or subscription.user_id != user_id or not subscription.active:
+        return False
+    subscription.active = False
+    subscription.updated_at = datetime.utcnow()
+    db.commit()
+    return True
+
+
+def get_notifications(db: Session, user_id: str, skip: int = 0, limit: int = 20) -> List[models.Notification]:
+    return (
+        db.query(models.Notification)
+        .filter(models.Notification.user_id == user_id)
+        .order_by(models.Notification.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+# Matching
+
+_FENCE_COLUMNS = (
+    models.Subscription.id, models.Subscription.user_id, models.Subscription.lat, models.Subscription.lng,
+    models.Subscription.radius_m, models.Subscription.polygon, models.Subscription.min_priority,
+    models.Subscription.active, models.Subscription.updated_at,
+)
+
+
+def _fence(row) -> Fence:
+    return Fence(row.id, row.user_id, row.lat, row.lng, row.radius_m, row.polygon, row.min_priority, row.updated_at)
+
+
+class SubscriptionMatcher:
+    """The grid index of active subscriptions, kept in step with the subscriptions table."""
+
+    def __init__(self):
+        self.index = GeofenceIndex()
+        self.synced_until: Optional[datetime] = None
+        self.loaded_at: Optional[float] = None
+
+    def load(self, db: Session) -> int:
+        """Rebuild the index from every active subscription; returns how many."""
+        index = GeofenceIndex()
+        started = datetime.utcnow()
+        query = db.query(*_FENCE_COLUMNS).filter(models.Subscription.active.is_(True))
+        index.update(_fence(row) for row in query.yield_per(10000))
+        self.index, self.synced_until, self.loaded_at = index, started, time.monotonic()
+        return len(index)
+
+    def sync(self, db: Session) -> int:
+        """Apply subscriptions created, changed or deleted since the last sync; returns how many changed."""
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= GEOFENCE_RELOAD_SECONDS:
+            indexed = self.load(db)
+            logger.info("Indexed %d subscriptions (%d bytes)", indexed, self.index.nbytes)
+            return indexed
+        started = datetime.utcnow()
+        changed = 0
+        for row in db.query(*_FENCE_COLUMNS).filter(
+            models.Subscription.updated_at > self.synced_until - timedelta(seconds=GEOFENCE_SYNC_LAG_SECONDS)
+        ):
+            if row.active:
+                changed += self.index.add(_fence(row))
+            elif row.id in self.index:
+                self.index.remove(row.id)
+                changed += 1
+        self.synced_until = started
+        return changed
+
+    def match(self, lat: float, lng: float, priority: int) -> List[Tuple[str, str]]:
+        """(subscription id, user id) of every subscription that wants a report here at ``priority``."""
+        start = time.perf_counter()
+        matched = self.index.fences(self.index.match(lat, lng, priority))
+        geofence_match_seconds.observe(time.perf_counter() - start)
+        return matched
+
+
+matcher = SubscriptionMatcher()
+
+REGISTRY.gauge(
+    "civicsense_geofence_subscriptions", "Subscriptions in this worker's geofence index",
+    callback=lambda: {(): float(len(matcher.index))},
+)
+
+_REPORT_COLUMNS = (
+    models.Report.id, models.Report.title, models.Report.lat, models.Report.lng,
+    models.Report.location_rounded_lat, models.Report.location_rounded_lng,
+    models.Report.priority_score, models.Report.priority_level, models.Report.status,
+)
+
+
+def _insert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def _payload(report) -> Dict[str, Any]:
+    return {
+        "title": report.title,
+        "priority_score": report.priority_score,
+        "priority_level": report.priority_level,
+        # Alerts show the public (rounded) location, like the map
+        "lat": report.location_rounded_lat,
+        "lng": report.location_rounded_lng,
+        "url": REPORT_PUBLIC_URL.format(id=report.id),
+    }
+
+
+def queue_for_reports(db: Session, reports: List[Any], subscriptions: SubscriptionMatcher = matcher) -> int:
+    """Queue notifications in primary session ``db`` for the subscriptions matching ``reports``."""
+    now = datetime.utcnow()
+    rows = []
+    for report in reports:
+        if report.status != NOTIFIED_STATUS or report.priority_score is None:
+            continue
+        payload = _payload(report)
+        users = set()
+        for subscription_id, user_id in subscriptions.match(report.lat, report.lng, report.priority_score):
+            if user_id in users:
+                continue
+            users.add(user_id)
+            rows.append({
+                "id": str(uuid.uuid4()), "subscription_id": subscription_id, "user_id": user_id,
+                "report_id": report.id, "payload": payload, "created_at": now, "attempts": 0,
+            })
+    if not rows:
+        return 0
+    table = models.Notification.__table__
+    # Matched before (a redelivered event, or a second priority change): already queued
+    statement = _insert(db)(table).on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.report_id])
+    queued = db.execute(statement, rows).rowcount
+    db.commit()
+    queued = len(rows) if queued is None or queued < 0 else queued
+    notifications_queued_total.inc(queued)
+    return queued
+
+
+def _notifiable(batch: List[events.Event]) -> List[str]:
+    """Reports whose events may make them notifiable: newly verified, or re-prioritized."""
+    report_ids = []
+    for event in batch:
+        state = event.state or {}
+        if state.get("status") == NOTIFIED_STATUS or "priority_score" in state:
+            report_ids.append(event.report_id)
+    return list(dict.fromkeys(report_ids))
+
+
+def _start_consumer(db: Session) -> None:
+    """Register the consumer at the head of a shard's stream: history is not notified."""
+    if db.get(models.EventConsumer, CONSUMER) is None:
+        db.add(models.EventConsumer(name=CONSUMER, position=events.last_seq(db)))
+        db.commit()
+
+
+def match_job() -> int:
+    """Queue notifications for the reports verified since the previous pass, in every shard."""
+    primary = SessionLocal()
+    queued = 0
+    try:
+        matcher.sync(primary)
+
+        def handle(db: Session, batch: List[events.Event]) -> None:
+            nonlocal queued
+            report_ids = _notifiable(batch)
+            if report_ids:
+                reports = db.query(*_REPORT_COLUMNS).filter(models.Report.id.in_(report_ids)).all()
+                queued += queue_for_reports(primary, reports)
+
+        for shard in shard_router.shards:
+            with shard_router.session(shard) as db:
+                _start_consumer(db)
+                while events.consume(db, CONSUMER, handle):
+                    pass
+    finally:
+        primary.close()
+    if queued:
+        logger.info("Queued %d subscriber notifications", queued)
+    return queued
+
+
+# Delivery
+
+class Message(NamedTuple):
+    user_id: str
+    email: Optional[str]
+    subject: str
+    body: str
+    notification_ids: List[str]
+
+
+class LogNotificationSender:
+    """Logs each message and keeps the last ``keep`` of them, in place of a push or email provider."""
+
+    def __init__(self, keep: int = 1000):
+        self.sent: deque = deque(maxlen=keep)
+
+    def send(self, messages: List[Message]) -> None:
+        """Deliver a batch; raising marks every message in it for retry."""
+        for message in messages:
+            logger.info("Notification to %s: %s", message.user_id, message.subject)
+            self.sent.append(message)
+
+
+notification_sender = LogNotificationSender()
+
+
+def render(user_id: str, email: Optional[str], notifications: List[models.Notification]) -> Message:
+    """One message for a user's queued notifications, highest priority first."""
+    ordered = sorted(notifications, key=lambda n: -(n.payload.get("priority_score") or 0))
+    count = len(ordered)
+    subject = (f"[CivicSense] {ordered[0].payload['title']}" if count == 1
+               else f"[CivicSense] {count} high-priority reports near you")
+    lines = [
+        f"- {n.payload['title']} (priority {n.payload.get('priority_score')}): {n.payload['url']}"
+        for n in ordered
+    ]
+    return Message(user_id, email, subject, "\n".join(lines), [n.id for n in ordered])
+
+
+def deliver(db: Session, sender=None, batch_size: int = NOTIFY_BATCH_SIZE) -> Tuple[int, int]:
+    """Send one batch of queued notifications; returns (sent, failed)."""
+    sender = sender or notification_sender
+    pending = (
+        db.query(models.Notification)
+        .filter(models.Notification.sent_at.is_(None), models.Notification.attempts < NOTIFY_MAX_ATTEMPTS)
+        .order_by(models.Notification.created_at)
+        .limit(batch_size)
+        .all()
+    )
+    if not pending:
+        return 0, 0
+    by_user: Dict[str, List[models.Notification]] = {}
+    for notification in pending:
+        by_user.setdefault(notification.user_id, []).append(notification)
+    emails = dict(db.query(models.User.id, models.User.email).filter(models.User.id.in_(list(by_user))))
+    messages = [render(user_id, emails.get(user_id), notifications) for user_id, notifications in by_user.items()]
+    ids = [notification.id for notification in pending]
+    table = models.Notification.__table__
+    try:
+        sender.send(messages)
+    except Exception as exc:
+        logger.exception("Notification batch of %d failed", len(ids))
+        db.execute(update(table).where(table.c.id.in_(ids))
+                   .values(attempts=table.c.attempts + 1, last_error=str(exc)[:500]))
+        db.commit()
+        notifications_sent_total.inc(len(ids), outcome="error")
+        return 0, len(ids)
+    db.execute(update(table).where(table.c.id.in_(ids))
+               .values(sent_at=datetime.utcnow(), attempts=table.c.attempts + 1))
+    db.commit()
+    notifications_sent_total.inc(len(ids), outcome="sent")
+    return len(ids), 0
+
+
+def deliver_job() -> int:
+    """Send queued notifications batch by batch until the queue is empty or a batch fails."""
+    db = SessionLocal()
+    delivered = 0
+    try:
+        while True:
+            sent, failed = deliver(db)
+            delivered += sent
+            if failed or not sent:
+                break
+    finally:
+        db.close()
+    if delivered:
+        logger.info("Delivered %d subscriber notifications", delivered)
+    return delivered
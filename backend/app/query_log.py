@@ -0,0 +1,112 @@
+"""
+Per-statement query hooks: a sampled slow-query log and a capture for checks.
+
+``record_statement`` is registered with ``metrics.add_statement_hook``, so
+it gets the latency the query metrics already measure for every statement
+on an instrumented engine. In production, statements slower than
+SLOW_QUERY_MS are logged (a SLOW_QUERY_SAMPLE_RATE fraction of them) with
+the route that issued them and the shape of their bound parameters: types
+and lengths, never the values, which can hold emails and password hashes.
+
+In development and checks, ``capture()`` records every statement run while
+it is open, with the same route and timing, so that a script can EXPLAIN
+what the endpoints actually issued (see scripts/check_endpoint_queries.py).
+
+The route comes from the request scope that MetricsMiddleware publishes in
+``metrics.current_request``; statements run outside a request are labelled
+``background``.
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, List, NamedTuple
+
+from .metrics import REGISTRY, current_request
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+SLOW_QUERY_MAX_SQL = 1000
+
+slow_queries_total = REGISTRY.counter(
+    "civicsense_db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ("route",)
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class CapturedQuery(NamedTuple):
+    route: str
+    statement: str
+    parameters: Any
+    executemany: bool
+    seconds: float
+
+
+_captures: List[List[CapturedQuery]] = []
+_captures_lock = threading.Lock()
+
+
+def current_route() -> str:
+    """Method and route template of the request being served (its path before routing), or ``background``."""
+    scope = current_request.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return f"{scope.get('method', '')} {getattr(route, 'path', None) or scope.get('path', 'unmatched')}"
+
+
+def _shape(value: Any) -> str:
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def parameter_shapes(parameters: Any, executemany: bool = False) -> str:
+    """Types and lengths of bound parameters, without their values."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x {parameter_shapes(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {_shape(value)}" for name, value in parameters.items()) + "}"
+    return "(" + ", ".join(_shape(value) for value in parameters or ()) + ")"
+
+
+def compact_sql(statement: str, limit: int = SLOW_QUERY_MAX_SQL) -> str:
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    return sql if len(sql) <= limit else sql[:limit] + "..."
+
+
+def record_statement(statement: str, parameters: Any, executemany: bool, seconds: float) -> None:
+    """Add a timed statement to open captures, and to the slow-query log if it was slow."""
+    if _captures:
+        query = CapturedQuery(current_route(), statement, parameters, executemany, seconds)
+        with _captures_lock:
+            for captured in _captures:
+                captured.append(query)
+    if SLOW_QUERY_MS > 0 and seconds * 1000 >= SLOW_QUERY_MS:
+        route = current_route()
+        slow_queries_total.inc(route=route)
+        if random.random() < SLOW_QUERY_SAMPLE_RATE:
+            logger.warning(
+                "Slow query %.1f ms on %s: %s params=%s",
+                seconds * 1000, route, compact_sql(statement), parameter_shapes(parameters, executemany),
+            )
+
+
+@contextmanager
+def capture() -> Iterator[List[CapturedQuery]]:
+    """Collect every statement run on instrumented engines, from any thread, while open."""
+    captured: List[CapturedQuery] = []
+    with _captures_lock:
+        _captures.append(captured)
+    try:
+        yield captured
+    finally:
+        with _captures_lock:
+            _captures.remove(captured)
@@ -0,0 +1,52 @@
+"""
+EXPLAIN helpers shared by the query plan checks.
+
+Works with SQLite (``EXPLAIN QUERY PLAN``) and Postgres (``EXPLAIN``) and
+flags plans that read a table with a full sequential scan.
+"""
+
+import re
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import ClauseElement
+
+_SQLITE_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+_POSTGRES_FULL_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def compile_statement(statement: ClauseElement, conn: Connection):
+    """Compile ``statement`` for the connection's dialect, returning (sql, params)."""
+    compiled = statement.compile(dialect=conn.dialect)
+    if compiled.positional:
+        params: Any = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    return str(compiled), params
+
+
+def explain(conn: Connection, sql: str, params: Any = None) -> List[str]:
+    """Return the plan for ``sql`` as a list of text lines."""
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params or ())
+        # Rows are (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    rows = conn.exec_driver_sql(f"EXPLAIN {sql}", params or {})
+    return [row[0] for row in rows]
+
+
+def explain_statement(conn: Connection, statement: ClauseElement) -> List[str]:
+    """Compile and explain a SQLAlchemy statement."""
+    sql, params = compile_statement(statement, conn)
+    return explain(conn, sql, params)
+
+
+def full_scans(plan: Sequence[str], dialect: str, tables: Optional[Sequence[str]] = None) -> List[str]:
+    """Tables read by a full sequential scan in ``plan``, optionally limited to ``tables``."""
+    pattern = _SQLITE_FULL_SCAN if dialect == "sqlite" else _POSTGRES_FULL_SCAN
+    scanned = []
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match and (tables is None or match.group(1) in tables):
+            scanned.append(match.group(1))
+    return scanned
@@ -0,0 +1,339 @@
+"""
+In-memory index of open reports for the list hot path.
+
+Each worker keeps the fields that filter and rank ``GET /reports/`` for
+every unresolved report: id, rounded lat/lng, status, priority and
+created_at, as NumPy columns of 44 bytes per report (a 16-byte UUID, two
+float64 coordinates, a status code, an int16 priority, int64 microseconds
+and a shard number). A list query restricted to open statuses is answered
+with vectorized masks over the columns and an argpartition top-K of the
+page, without scanning the reports table; crud then loads that page's
+rows by primary key and re-checks them, so the database stays the source
+of truth and a report that changed since the index saw it is dropped
+rather than shown stale.
+
+The index is loaded when the worker starts and kept up to date from the
+event stream, which every crud mutation appends to (see events.py). The
+refresh job folds new events into a copy of the columns and swaps it in,
+so readers never see a half-applied batch. It reloads from scratch when
+the events it needs were compacted away, and every REPORT_INDEX_RELOAD_SECONDS
+for writes made outside the stream (bulk imports).
+"""
+
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import events, models
+from .geo import parse_bbox
+from .sharding import shard_router
+
+logger = logging.getLogger(__name__)
+
+REPORT_INDEX_ENABLED = os.getenv("REPORT_INDEX_ENABLED", "true").lower() == "true"
+REPORT_INDEX_REFRESH_SECONDS = float(os.getenv("REPORT_INDEX_REFRESH_SECONDS", "1"))
+REPORT_INDEX_RELOAD_SECONDS = float(os.getenv("REPORT_INDEX_RELOAD_SECONDS", "3600"))
+REPORT_INDEX_LOAD_BATCH = 20000
+
+# Status code of a report that left the index; its row is dropped at the next compaction
+REMOVED = 0
+NULL_PRIORITY = -1
+# Rank keys pack (priority + 1) above 52 bits of created_at microseconds (good until 2112)
+CREATED_BITS = 52
+EPOCH = datetime(1970, 1, 1)
+INDEXED_FIELDS = ("location_rounded_lat", "location_rounded_lng", "status", "priority_score", "created_at")
+
+_LOAD_COLUMNS = (
+    models.Report.id,
+    models.Report.location_rounded_lat,
+    models.Report.location_rounded_lng,
+    models.Report.status,
+    models.Report.priority_score,
+    models.Report.created_at,
+)
+
+
+class Columns(NamedTuple):
+    id: np.ndarray        # S16 UUID bytes, sorted
+    lat: np.ndarray       # float64 rounded latitude, NaN when missing
+    lng: np.ndarray       # float64 rounded longitude, NaN when missing
+    status: np.ndarray    # uint8 code into OpenReportIndex.statuses
+    priority: np.ndarray  # int16, NULL_PRIORITY when missing
+    created: np.ndarray   # int64 microseconds since the epoch
+    shard: np.ndarray     # uint8 position in shard_router.shards
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self)
+
+
+def _empty() -> Columns:
+    return Columns(
+        np.empty(0, "S16"), np.empty(0, np.float64), np.empty(0, np.float64), np.empty(0, np.uint8),
+        np.empty(0, np.int16), np.empty(0, np.int64), np.empty(0, np.uint8),
+    )
+
+
+def _upsert(columns: Columns, rows: Columns) -> Columns:
+    """``columns`` with ``rows`` written over the rows with the same id and inserted in id order otherwise."""
+    order = np.argsort(rows.id, kind="stable")
+    rows = Columns(*(column[order] for column in rows))
+    at = np.searchsorted(columns.id, rows.id)
+    found = at < len(columns.id)
+    found[found] = columns.id[at[found]] == rows.id[found]
+    for column, new in zip(columns, rows):
+        column[at[found]] = new[found]
+    return Columns(*(np.insert(column, at[~found], new[~found]) for column, new in zip(columns, rows)))
+
+
+def id_key(report_id: str) -> bytes:
+    """Key of a report id as the id column holds it; raises ValueError for ids that are not UUIDs."""
+    # NumPy strips trailing NUL bytes from S16 values, so keys compare equal only without them
+    return uuid.UUID(report_id).bytes.rstrip(b"\0")
+
+
+def id_from_key(key: bytes) -> str:
+    return str(uuid.UUID(bytes=key.ljust(16, b"\0")))
+
+
+def _micros(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return max(0, (value - EPOCH) // timedelta(microseconds=1))
+
+
+def _coordinate(value: Optional[float]) -> float:
+    return float("nan") if value is None else value
+
+
+def _priority(value: Optional[int]) -> int:
+    return NULL_PRIORITY if value is None else value
+
+
+class OpenReportIndex:
+    """Columns of the open reports, their event stream positions and the status codes."""
+
+    def __init__(self):
+        self._columns: Optional[Columns] = None
+        self.positions: Dict[str, int] = {}
+        self.statuses: List[Optional[str]] = [None]
+        self._codes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        columns = self._columns
+        return 0 if columns is None else int(np.count_nonzero(columns.status != REMOVED))
+
+    @property
+    def loaded(self) -> bool:
+        return self._columns is not None
+
+    @property
+    def nbytes(self) -> int:
+        columns = self._columns
+        return 0 if columns is None else columns.nbytes
+
+    def _code(self, status: str) -> int:
+        code = self._codes.get(status)
+        if code is None:
+            if len(self.statuses) > np.iinfo(np.uint8).max:
+                raise ValueError("Too many distinct report statuses to index")
+            code = self._codes[status] = len(self.statuses)
+            self.statuses.append(status)
+        return code
+
+    def _build(self, rows: Sequence[tuple], shard_position: int) -> Columns:
+        """Columns for (id, lat, lng, status, priority_score, created_at) rows, unsorted."""
+        count = len(rows)
+        return Columns(
+            np.fromiter((id_key(row[0]) for row in rows), "S16", count),
+            np.fromiter((_coordinate(row[1]) for row in rows), np.float64, count),
+            np.fromiter((_coordinate(row[2]) for row in rows), np.float64, count),
+            np.fromiter((self._code(row[3]) for row in rows), np.uint8, count),
+            np.fromiter((_priority(row[4]) for row in rows), np.int16, count),
+            np.fromiter((_micros(row[5]) for row in rows), np.int64, count),
+            np.full(count, shard_position, np.uint8),
+        )
+
+    def load(self) -> int:
+        """Read every open report of every shard; returns how many are indexed."""
+        with self._lock:
+            parts, positions = [], {}
+            for position, shard in enumerate(shard_router.shards):
+                with shard_router.session(shard) as db:
+                    # Taken first: events committed during the load are folded in again, harmlessly
+                    positions[shard.name] = events.last_seq(db)
+                    query = db.query(*_LOAD_COLUMNS).filter(models.UNRESOLVED_REPORTS)
+                    batch = []
+                    for row in query.yield_per(REPORT_INDEX_LOAD_BATCH):
+                        batch.append(row)
+                        if len(batch) >= REPORT_INDEX_LOAD_BATCH:
+                            parts.append(self._build(batch, position))
+                            batch = []
+                    parts.append(self._build(batch, position))
+            merged = Columns(*(np.concatenate(column) for column in zip(_empty(), *parts)))
+            order = np.argsort(merged.id, kind="stable")
+            self._columns = Columns(*(column[order] for column in merged))
+            self.positions = positions
+            return len(order)
+
+    def _changes(self, db: Session, after: int) -> Optional[Tuple[Dict[str, Dict[str, Any]], int]]:
+        """Indexed fields set by events after ``after``, folded per report, and the new position.
+
+        None when events after ``after`` were compacted away.
+        """
+        changes: Dict[str, Dict[str, Any]] = {}
+        position = after
+        while True:
+            batch = events.read(db, position)
+            if not batch:
+                if position == after and events.last_seq(db) > after:
+                    return None
+                return changes, position
+            if position == after and batch[0].seq > after + 1:
+                return None
+            for event in batch:
+                if event.state:
+                    fields = {name: event.state[name] for name in INDEXED_FIELDS if name in event.state}
+                    if fields:
+                        changes.setdefault(event.report_id, {}).update(fields)
+            position = batch[-1].seq
+            if len(batch) < events.EVENT_BATCH:
+                return changes, position
+
+    def refresh(self) -> int:
+        """Fold new events into a loaded index; returns how many reports changed."""
+        if self._columns is None:
+            return 0
+        with self._lock:
+            changed = self._fold()
+        if changed is None:
+            logger.info("Report index is behind compacted events; reloading")
+            self.load()
+            return 0
+        return changed
+
+    def _fold(self) -> Optional[int]:
+        columns = Columns(*(column.copy() for column in self._columns))
+        positions = dict(self.positions)
+        changed = 0
+        fetched: List[Columns] = []
+        for shard_position, shard in enumerate(shard_router.shards):
+            with shard_router.session(shard) as db:
+                found = self._changes(db, positions.get(shard.name, 0))
+                if found is None:
+                    return None
+                changes, positions[shard.name] = found
+                if not changes:
+                    continue
+                changed += len(changes)
+                missing = self._apply(columns, changes)
+                if missing:
+                    rows = db.query(*_LOAD_COLUMNS).filter(
+                        models.Report.id.in_(missing), models.UNRESOLVED_REPORTS
+                    ).all()
+                    fetched.append(self._build(rows, shard_position))
+
+        if fetched:
+            columns = _upsert(columns, Columns(*(np.concatenate(column) for column in zip(*fetched))))
+        removed = columns.status == REMOVED
+        if np.count_nonzero(removed) * 4 > len(removed):
+            columns = Columns(*(column[~removed] for column in columns))
+        self._columns = columns
+        self.positions = positions
+        return changed
+
+    def _apply(self, columns: Columns, changes: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Apply folded changes in place; returns open reports that are not indexed yet."""
+        missing = []
+        for report_id, fields in changes.items():
+            try:
+                key = id_key(report_id)
+            except ValueError:
+                continue
+            at = int(np.searchsorted(columns.id, key))
+            indexed = at < len(columns.id) and columns.id[at] == key and columns.status[at] != REMOVED
+            if fields.get("status") == "resolved":
+                if indexed:
+                    columns.status[at] = REMOVED
+                continue
+            if not indexed:
+                # Loaded from the database rather than from partial event fields
+                if fields.get("status") is not None or "created_at" in fields:
+                    missing.append(report_id)
+                continue
+            if "location_rounded_lat" in fields:
+                columns.lat[at] = _coordinate(fields["location_rounded_lat"])
+            if "location_rounded_lng" in fields:
+                columns.lng[at] = _coordinate(fields["location_rounded_lng"])
+            if fields.get("status") is not None:
+                columns.status[at] = self._code(fields["status"])
+            if "priority_score" in fields:
+                columns.priority[at] = _priority(fields["priority_score"])
+            if "created_at" in fields:
+                columns.created[at] = _micros(fields["created_at"])
+        return missing
+
+    def search(self, bbox: Optional[str], status: Optional[str], priority_min: Optional[int],
+               skip: int, limit: int) -> Optional[List[Tuple[str, int]]]:
+        """Ids and shard positions of one page of open reports, in list order.
+
+        None when the index cannot answer: it is not loaded yet, or the
+        query can match resolved reports (no status filter, or "resolved").
+        """
+        columns = self._columns
+        if columns is None or status is None or status == "resolved":
+            return None
+        if status == "open":
+            mask = columns.status != REMOVED
+        else:
+            code = self._codes.get(status)
+            if code is None:
+                return []
+            mask = columns.status == code
+        bounds = parse_bbox(bbox)
+        if bounds:
+            min_lng, min_lat, max_lng, max_lat = bounds
+            mask &= (columns.lat >= min_lat) & (columns.lat <= max_lat)
+            mask &= (columns.lng >= min_lng) & (columns.lng <= max_lng)
+        if priority_min is not None:
+            mask &= (columns.priority >= priority_min) & (columns.priority != NULL_PRIORITY)
+
+        candidates = np.flatnonzero(mask)
+        wanted = skip + limit
+        if not len(candidates) or skip >= len(candidates):
+            return []
+        keys = ((columns.priority[candidates].astype(np.int64) + 1) << CREATED_BITS) | columns.created[candidates]
+        if wanted < len(candidates):
+            top = np.argpartition(keys, len(candidates) - wanted)[len(candidates) - wanted:]
+        else:
+            top = np.arange(len(candidates))
+        page = candidates[top[np.argsort(keys[top], kind="stable")[::-1]]][skip:wanted]
+        return [(id_from_key(key), int(shard)) for key, shard in zip(columns.id[page], columns.shard[page])]
+
+
+open_reports = OpenReportIndex()
+
+
+def refresh_job() -> int:
+    """Load the index if this worker has none yet, else fold in new events."""
+    if not open_reports.loaded:
+        return reload_job()
+    return open_reports.refresh()
+
+
+def reload_job() -> int:
+    """Rebuild the index from the tables, dropping any drift from writes outside the stream."""
+    indexed = open_reports.load()
+    logger.info("Indexed %d open reports (%d bytes)", indexed, open_reports.nbytes)
+    return indexed
@@ -0,0 +1,270 @@
+"""
+Background job scheduler for deployments with several API workers.
+
+Every worker runs the same scheduler, started from the FastAPI lifespan in
+main.py. Shared jobs (digests, archival, snapshots, purges, verification
+retries) are guarded by a lease row in ``job_leases`` on the primary
+database, so each run happens on exactly one worker:
+
+  - A worker wakes when the job is due and tries to take the lease: on
+    Postgres with ``SELECT ... FOR UPDATE SKIP LOCKED`` over the due,
+    unleased row, on SQLite with a conditional UPDATE (its writes are
+    serialized, so only one worker's update matches).
+  - While the job runs, the owner extends the lease every third of
+    SCHEDULER_LEASE_SECONDS. A worker that dies mid-run stops extending it,
+    and another worker takes the job over once it expires.
+  - On completion the owner records the run and sets the next due time one
+    interval after the end of the run, so slow runs never queue up.
+
+Wake-ups are delayed by a random fraction (SCHEDULER_JITTER) of the job's
+interval, so workers do not all hit the lease table at once and whichever
+wakes first takes the run; over time the jobs spread across workers rather
+than piling onto one.
+
+Per-worker jobs (the list cache warmer, the open report index) maintain
+state in each worker's memory, so every worker runs them without a lease.
+SCHEDULER_ENABLED=false keeps a worker out of the shared jobs only.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal, naive_utc
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "60"))
+
+# Job durations range from milliseconds (cache warming) to minutes (archival)
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+job_runs_total = REGISTRY.counter(
+    "civicsense_scheduler_job_runs_total",
+    "Scheduled job wake-ups by outcome (success, error, not_acquired)", ("job", "outcome"),
+)
+job_duration_seconds = REGISTRY.histogram(
+    "civicsense_scheduler_job_duration_seconds", "Run time of scheduled jobs", ("job",), buckets=JOB_BUCKETS
+)
+job_last_success = REGISTRY.gauge(
+    "civicsense_scheduler_job_last_success_timestamp_seconds", "When each job last succeeded on this worker", ("job",)
+)
+
+JobFunction = Callable[[], Union[object, Awaitable[object]]]
+
+
+class Job(NamedTuple):
+    name: str
+    interval: float
+    run: JobFunction  # sync functions run in a thread, coroutine functions on the event loop
+    leased: bool = True
+    run_at_start: bool = False  # per-worker jobs only; shared jobs follow their lease row
+
+
+def worker_id() -> str:
+    """Lease owner name for this process: host, pid and a nonce against pid reuse."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _insert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def try_acquire(db: Session, job: Job, owner: str, lease_seconds: float = SCHEDULER_LEASE_SECONDS,
+                now: Optional[datetime] = None) -> Tuple[bool, datetime]:
+    """Take ``job``'s lease if it is due and free.
+
+    Returns whether it was taken, and otherwise when to try again: when it
+    is next due or, while another worker runs it, when that run could end
+    (its next due time is at least one interval away) or its lease expire.
+    """
+    now = now or datetime.utcnow()
+    table = models.JobLease.__table__
+    # First sighting of the job anywhere: due one interval from now
+    db.execute(
+        _insert(db)(table)
+        .values(name=job.name, next_run_at=now + timedelta(seconds=job.interval))
+        .on_conflict_do_nothing(index_elements=[table.c.name])
+    )
+    available = (
+        table.c.name == job.name,
+        table.c.next_run_at <= now,
+        or_(table.c.expires_at.is_(None), table.c.expires_at <= now),
+    )
+    take = {"owner": owner, "expires_at": now + timedelta(seconds=lease_seconds), "last_started_at": now}
+    if db.get_bind().dialect.name == "postgresql":
+        # A worker that finds the row locked by another's acquisition skips it instead of queueing
+        row = db.execute(select(table.c.name).where(*available).with_for_update(skip_locked=True)).first()
+        acquired = row is not None
+        if acquired:
+            db.execute(update(table).where(table.c.name == job.name).values(**take))
+    else:
+        acquired = db.execute(update(table).where(*available).values(**take)).rowcount == 1
+    if acquired:
+        db.commit()
+        return True, now
+    row = db.execute(select(table.c.next_run_at, table.c.expires_at).where(table.c.name == job.name)).first()
+    db.commit()
+    if row is None:
+        return False, now + timedelta(seconds=job.interval)
+    next_run_at, expires_at = naive_utc(row.next_run_at), naive_utc(row.expires_at)
+    if expires_at is None or expires_at <= now:
+        return False, next_run_at
+    return False, max(next_run_at, min(expires_at, now + timedelta(seconds=job.interval)))
+
+
+def renew(db: Session, job: Job, owner: str, lease_seconds: float = SCHEDULER_LEASE_SECONDS) -> bool:
+    """Extend a held lease; False if it was lost (expired and taken over)."""
+    table = models.JobLease.__table__
+    renewed = db.execute(
+        update(table)
+        .where(table.c.name == job.name, table.c.owner == owner, table.c.expires_at.is_not(None))
+        .values(expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+    ).rowcount == 1
+    db.commit()
+    return renewed
+
+
+def release(db: Session, job: Job, owner: str, status: str, duration: float) -> datetime:
+    """Record a finished run and free the lease; returns when the job is next due."""
+    table = models.JobLease.__table__
+    now = datetime.utcnow()
+    next_run_at = now + timedelta(seconds=job.interval)
+    db.execute(
+        update(table)
+        .where(table.c.name == job.name, table.c.owner == owner)
+        .values(expires_at=None, next_run_at=next_run_at, last_finished_at=now,
+                last_duration_ms=round(duration * 1000, 3), last_status=status)
+    )
+    db.commit()
+    return next_run_at
+
+
+def _with_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+class Scheduler:
+    """Runs registered jobs as asyncio tasks until stopped."""
+
+    def __init__(self, owner: Optional[str] = None, jitter: float = SCHEDULER_JITTER,
+                 lease_seconds: float = SCHEDULER_LEASE_SECONDS, leased_jobs: bool = SCHEDULER_ENABLED):
+        self.owner = owner or worker_id()
+        self.jitter = jitter
+        self.lease_seconds = lease_seconds
+        self.leased_jobs = leased_jobs
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, name: str, interval: float, run: JobFunction, leased: bool = True,
+            run_at_start: bool = False) -> None:
+        if name in self.jobs:
+            raise ValueError(f"Job {name} is already scheduled")
+        self.jobs[name] = Job(name, interval, run, leased, run_at_start)
+
+    def start(self) -> None:
+        for job in self.jobs.values():
+            if job.leased and not self.leased_jobs:
+                continue
+            loop = self._leased_loop(job) if job.leased else self._local_loop(job)
+            self._tasks.append(asyncio.create_task(loop, name=f"job:{job.name}"))
+        logger.info("Scheduler %s started %d jobs", self.owner, len(self._tasks))
+
+    async def stop(self) -> None:
+        # A shared job cut off mid-run keeps its lease until it expires, in case its thread is still going
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def _jitter(self, job: Job) -> float:
+        return random.uniform(0, self.jitter * job.interval)
+
+    async def _execute(self, job: Job) -> str:
+        """Run ``job`` once, recording its metrics; returns success or error."""
+        start = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(job.run):
+                await job.run()
+            else:
+                await asyncio.to_thread(job.run)
+            outcome = "success"
+        except Exception:
+            logger.exception("Job %s failed", job.name)
+            outcome = "error"
+        job_duration_seconds.observe(time.perf_counter() - start, job=job.name)
+        job_runs_total.inc(job=job.name, outcome=outcome)
+        if outcome == "success":
+            job_last_success.set(time.time(), job=job.name)
+        return outcome
+
+    async def _local_loop(self, job: Job) -> None:
+        if not job.run_at_start:
+            await asyncio.sleep(job.interval + self._jitter(job))
+        while True:
+            await self._execute(job)
+            await asyncio.sleep(job.interval + self._jitter(job))
+
+    async def _heartbeat(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await asyncio.to_thread(_with_session, renew, job, self.owner, self.lease_seconds):
+                    logger.warning("Job %s lost its lease while running", job.name)
+                    return
+            except Exception:
+                logger.exception("Could not renew the lease of job %s", job.name)
+
+    async def _leased_loop(self, job: Job) -> None:
+        while True:
+            try:
+                acquired, wake_at = await asyncio.to_thread(
+                    _with_session, try_acquire, job, self.owner, self.lease_seconds
+                )
+            except Exception:
+                logger.exception("Could not acquire the lease of job %s", job.name)
+                acquired, wake_at = False, datetime.utcnow() + timedelta(seconds=job.interval)
+            if acquired:
+                start = time.perf_counter()
+                heartbeat = asyncio.create_task(self._heartbeat(job))
+                try:
+                    outcome = await self._execute(job)
+                finally:
+                    heartbeat.cancel()
+                try:
+                    wake_at = await asyncio.to_thread(
+                        _with_session, release, job, self.owner, outcome, time.perf_counter() - start
+                    )
+                except Exception:
+                    # The lease expires on its own; the job is due again after that
+                    logger.exception("Could not release the lease of job %s", job.name)
+                    wake_at = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+            else:
+                job_runs_total.inc(job=job.name, outcome="not_acquired")
+            delay = (wake_at - datetime.utcnow()).total_seconds()
+            if not acquired and delay <= 0:
+                # Lost a race for a due row: look again shortly rather than spin
+                delay = min(1.0, job.interval / 10)
+            await asyncio.sleep(max(0.0, delay) + self._jitter(job))
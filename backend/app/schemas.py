@@ -61,6 +61,8 @@ class ReportUpdate(BaseModel):
     status: Optional[str] = None
     priority_score: Optional[int] = None
     priority_level: Optional[str] = None
+    verification_score: Optional[float] = None
+    verification_labels: Optional[List[str]] = None
 
 class Report(ReportBase):
     id: str
@@ -97,6 +99,74 @@ class ReportSummary(BaseModel):
     priority_score: int
     created_at: datetime
 
+class NearbyReport(ReportSummary):
+    distance_m: float
+
+# Digest schemas
+class DigestSummary(BaseModel):
+    id: str
+    jurisdiction: str
+    category: str
+    priority_level: str
+    report_count: int
+    subject: str
+    period_start: datetime
+    period_end: datetime
+    created_at: Optional[datetime]
+
+class Digest(DigestSummary):
+    report_ids: List[str]
+    body: str
+
+    class Config:
+        from_attributes = True
+
+# Sync schemas
+class SyncOperation(BaseModel):
+    id: str = Field(..., max_length=100)  # client-side id, echoed in the operation's result
+    op: str  # claim, resolve, confirm, attach
+    report_id: str
+    notes: Optional[str] = Field(None, max_length=2000)
+    resolution_notes: Optional[str] = Field(None, max_length=2000)
+    media_ref: Optional[str] = None  # returned by POST /sync/uploads
+
+class SyncRequest(BaseModel):
+    token: Optional[str] = None  # from the previous sync; omit on the first
+    bbox: Optional[str] = None  # only return changes inside minLng,minLat,maxLng,maxLat
+    operations: List[SyncOperation] = []
+
+# Subscription schemas
+class SubscriptionCreate(BaseModel):
+    # A circle (lat, lng, radius_m) or a polygon of [lng, lat] points, not both
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    radius_m: Optional[float] = None
+    polygon: Optional[List[List[float]]] = None
+    min_priority: Optional[int] = Field(None, ge=0, le=100)  # defaults to high priority only
+
+class Subscription(BaseModel):
+    id: str
+    lat: Optional[float]
+    lng: Optional[float]
+    radius_m: Optional[float]
+    polygon: Optional[List[List[float]]]
+    min_priority: int
+    created_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+class Notification(BaseModel):
+    id: str
+    subscription_id: str
+    report_id: str
+    payload: Dict[str, Any]
+    created_at: datetime
+    sent_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
 # Activity schemas
 class ActivityBase(BaseModel):
     action: str
@@ -112,6 +182,21 @@ class Activity(ActivityBase):
     class Config:
         from_attributes = True
 
+# Dashboard statistics schemas
+class ResolutionTimeStats(BaseModel):
+    count: int
+    p50: Optional[float]
+    p90: Optional[float]
+    p99: Optional[float]
+
+class DashboardStats(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_priority_level: Dict[str, int]
+    by_category: Dict[str, int]
+    by_neighborhood: Dict[str, int]
+    resolution_hours: ResolutionTimeStats
+
 # API Response schemas
 class APIResponse(BaseModel):
     success: bool = True
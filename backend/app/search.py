@@ -0,0 +1,131 @@
+"""
+Full-text search over report titles and descriptions.
+
+Postgres: ``reports.search_vector`` is a stored generated tsvector column
+with a GIN index (migration 0005), so the database keeps it current on
+every write. SQLite: an FTS5 table, ``reports_fts``, keyed by the reports
+rowid, which crud updates alongside the report (``index_report``).
+
+The best SEARCH_CANDIDATES text matches are re-scored with priority and
+recency:
+
+    score = relevance * (1 + SEARCH_PRIORITY_WEIGHT * priority / 100)
+                      * 0.5 ** (age_days / SEARCH_RECENCY_HALF_LIFE_DAYS)
+
+FTS5 relevance is BM25 (title weighted twice the description); Postgres has
+no BM25, so ts_rank_cd (cover density, length-normalized) stands in.
+"""
+
+import math
+import os
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, column, func, literal_column, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import naive_utc
+
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "200"))
+SEARCH_PRIORITY_WEIGHT = float(os.getenv("SEARCH_PRIORITY_WEIGHT", "1.0"))
+SEARCH_RECENCY_HALF_LIFE_DAYS = float(os.getenv("SEARCH_RECENCY_HALF_LIFE_DAYS", "30"))
+MAX_QUERY_TERMS = 8
+
+FTS_TABLE = "reports_fts"
+# Must match migration 0005
+POSTGRES_DOCUMENT = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+_fts = table(FTS_TABLE, column("rowid"))
+_INDEX_DOCUMENTS = (
+    f"INSERT INTO {FTS_TABLE} (rowid, title, description) "
+    "SELECT rowid, title, coalesce(description, '') FROM reports"
+)
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(q: str) -> List[str]:
+    """Lowercased word tokens of a user query; punctuation and operators are dropped."""
+    return _TERM.findall(q.lower())[:MAX_QUERY_TERMS]
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def match(query, db: Session, terms: List[str]) -> Tuple[object, object]:
+    """Restrict a reports query to rows matching every term (as a prefix).
+
+    Returns the filtered query and its text relevance expression (higher is better).
+    """
+    if _dialect(db) == "postgresql":
+        document = literal_column("reports.search_vector")
+        tsquery = func.to_tsquery(literal_column("'english'"), " & ".join(f"{term}:*" for term in terms))
+        return query.filter(document.op("@@")(tsquery)), func.ts_rank_cd(document, tsquery, 32)
+
+    fts = literal_column(FTS_TABLE)
+    query = query.join(_fts, _fts.c.rowid == literal_column("reports.rowid")).filter(
+        fts.op("MATCH")(" ".join(f'"{term}"*' for term in terms))
+    )
+    # bm25() is lower-is-better; title matches count double
+    return query, -func.bm25(fts, 2.0, 1.0)
+
+
+def combined_score(relevance: float, priority_score: Optional[int], created_at: Optional[datetime],
+                   now: Optional[datetime] = None) -> float:
+    """Text relevance boosted by priority and decayed by age."""
+    now = now or datetime.utcnow()
+    # reports.created_at is timezone-aware on Postgres
+    age_days = max((now - naive_utc(created_at)).total_seconds() / 86400.0, 0.0) if created_at else 0.0
+    boost = 1.0 + SEARCH_PRIORITY_WEIGHT * (priority_score or 0) / 100.0
+    return (relevance or 0.0) * boost * math.pow(0.5, age_days / SEARCH_RECENCY_HALF_LIFE_DAYS)
+
+
+def index_report(db: Session, report: models.Report) -> None:
+    """Bring the FTS row of ``report`` up to date (SQLite; Postgres maintains its own)."""
+    if _dialect(db) != "sqlite":
+        return
+    db.flush()
+    params = {"id": report.id}
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = (SELECT rowid FROM reports WHERE id = :id)"), params)
+    db.execute(text(_INDEX_DOCUMENTS + " WHERE id = :id"), params)
+
+
+def remove_reports(db: Session, report_ids: List[str]) -> None:
+    """Drop reports about to be deleted from the FTS index (SQLite; Postgres maintains its own)."""
+    if _dialect(db) != "sqlite" or not report_ids:
+        return
+    db.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT rowid FROM reports WHERE id IN :ids)")
+        .bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(report_ids)},
+    )
+
+
+def rebuild(db: Session) -> None:
+    """Re-index every report (SQLite); needed after bulk INSERTs that bypass crud."""
+    if _dialect(db) != "sqlite":
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    db.execute(text(_INDEX_DOCUMENTS))
+    db.commit()
+
+
+def ensure_index(engine: Engine) -> None:
+    """Create the search index next to a create_all schema (dev; migrations do this otherwise)."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(
+                "ALTER TABLE reports ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ({POSTGRES_DOCUMENT}) STORED"
+            ))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_search ON reports USING gin (search_vector)"))
+        elif engine.dialect.name == "sqlite":
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}).first()
+            if exists:
+                return
+            conn.execute(text(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, description, tokenize='porter unicode61')"))
+            conn.execute(text(_INDEX_DOCUMENTS))
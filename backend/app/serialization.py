@@ -0,0 +1,92 @@
+"""
+Fast response serialization for hot read endpoints.
+
+List and detail queries select plain column tuples; these helpers turn them
+straight into JSON bytes with orjson, skipping the per-row Pydantic model
+construction and FastAPI's second validation pass over ``response_model``.
+The output matches what the Pydantic schemas in ``schemas.py`` produce.
+"""
+
+from typing import Any, Dict, Iterable, List, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from . import models
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+# Columns selected for schemas.ReportSummary, in tuple order
+REPORT_SUMMARY_COLUMNS = (
+    models.Report.id,
+    models.Report.title,
+    models.Report.lat,
+    models.Report.lng,
+    models.Report.location_rounded_lat,
+    models.Report.location_rounded_lng,
+    models.Report.status,
+    models.Report.priority_score,
+    models.Report.created_at,
+)
+
+# Columns selected for schemas.Report, in tuple order
+REPORT_DETAIL_COLUMNS = (
+    models.Report.id,
+    models.Report.title,
+    models.Report.description,
+    models.Report.lat,
+    models.Report.lng,
+    models.Report.accuracy_m,
+    models.Report.location_rounded_lat,
+    models.Report.location_rounded_lng,
+    models.Report.status,
+    models.Report.priority_score,
+    models.Report.priority_level,
+    models.Report.verification_score,
+    models.Report.verification_labels,
+    models.Report.is_duplicate,
+    models.Report.duplicate_of_id,
+    models.Report.anonymous,
+    models.Report.reporter_id,
+    models.Report.assigned_to_id,
+    models.Report.created_at,
+    models.Report.updated_at,
+    models.Report.resolved_at,
+)
+REPORT_DETAIL_FIELDS = tuple(column.key for column in REPORT_DETAIL_COLUMNS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson; also accepts pre-encoded bytes."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def summary_rows_to_dicts(rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Map REPORT_SUMMARY_COLUMNS tuples to ReportSummary-shaped dicts."""
+    return [
+        {
+            "id": report_id,
+            "title": title,
+            # Public views only expose rounded coordinates when available
+            "lat": rounded_lat or lat,
+            "lng": rounded_lng or lng,
+            "status": status,
+            "priority_score": priority_score,
+            "created_at": created_at,
+        }
+        for report_id, title, lat, lng, rounded_lat, rounded_lng, status, priority_score, created_at in rows
+    ]
+
+
+def detail_row_to_dict(row: Sequence[Any], media_urls: List[str]) -> Dict[str, Any]:
+    """Map a REPORT_DETAIL_COLUMNS tuple to a schemas.Report-shaped dict."""
+    data = dict(zip(REPORT_DETAIL_FIELDS, row))
+    data["verification_labels"] = data["verification_labels"] or []
+    data["media_urls"] = media_urls
+    data["reporter"] = None
+    data["assigned_to"] = None
+    return data
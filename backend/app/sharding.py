@@ -0,0 +1,192 @@
+"""
+Geographic sharding of reports.
+
+Every report gets a ``region`` (geohash prefix, see geo.REGION_PRECISION)
+when it is created. REPORT_SHARDS maps region prefixes to databases:
+
+    REPORT_SHARDS='{"nyc": {"url": "postgresql://.../civicsense_nyc", "regions": ["dr5", "dr7"]},
+                    "sf":  {"url": "postgresql://.../civicsense_sf",  "regions": ["9q8", "9q9"]}}'
+
+A report and everything hanging off it (media, activities, stats counters)
+live in the shard owning its region; regions no shard claims stay in the
+default DATABASE_URL database, which also keeps the global tables (users).
+Without REPORT_SHARDS there is just the default shard and nothing changes.
+
+List queries only visit the shards whose regions intersect the requested
+bbox and merge their ranked results; queries without a bbox (or spanning
+too many regions to enumerate) scatter to every shard.
+"""
+
+import heapq
+import json
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi import Depends, Form
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models
+from .database import SessionLocal, engine, get_db
+from .geo import REGION_PRECISION, geohash_cells, region_for
+
+logger = logging.getLogger(__name__)
+
+REPORT_SHARDS = os.getenv("REPORT_SHARDS")
+# Larger bboxes are not enumerated cell by cell; they scatter to every shard
+MAX_BBOX_REGIONS = int(os.getenv("MAX_BBOX_REGIONS", "256"))
+REPORT_LOCATION_CACHE_SIZE = 100_000
+
+T = TypeVar("T")
+
+
+@dataclass
+class Shard:
+    name: str
+    session_factory: Callable[[], Session]
+    prefixes: Tuple[str, ...] = ()
+    engine: object = field(default=None, repr=False)
+
+    @property
+    def is_default(self) -> bool:
+        return not self.prefixes
+
+
+class ShardRouter:
+    """Maps regions to shards and runs queries across them."""
+
+    def __init__(self, config: Optional[str] = REPORT_SHARDS):
+        self.default = Shard("default", SessionLocal, engine=engine)
+        self.shards: List[Shard] = [self.default]
+        self._locations: "OrderedDict[str, Shard]" = OrderedDict()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        for name, spec in (json.loads(config) if config else {}).items():
+            prefixes = tuple(spec["regions"])
+            if not prefixes or any(len(p) > REGION_PRECISION for p in prefixes):
+                raise ValueError(f"Shard {name}: regions must be 1-{REGION_PRECISION} character geohash prefixes")
+            shard_engine = create_engine(spec["url"], pool_pre_ping=True)
+            self.shards.append(Shard(name, sessionmaker(autocommit=False, autoflush=False, bind=shard_engine),
+                                     prefixes, shard_engine))
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.shards) > 1
+
+    def shard_for_region(self, region: str) -> Shard:
+        """The shard with the longest prefix matching ``region``, else the default."""
+        best, best_length = self.default, 0
+        for shard in self.shards[1:]:
+            for prefix in shard.prefixes:
+                if region.startswith(prefix) and len(prefix) > best_length:
+                    best, best_length = shard, len(prefix)
+        return best
+
+    def shard_for_point(self, lat: float, lng: float) -> Shard:
+        return self.shard_for_region(region_for(lat, lng))
+
+    def shards_for_bbox(self, bbox: Optional[Tuple[float, float, float, float]]) -> List[Shard]:
+        """Shards owning at least one region that intersects ``bbox`` (all of them without one)."""
+        if not self.enabled:
+            return [self.default]
+        regions = geohash_cells(bbox, REGION_PRECISION, MAX_BBOX_REGIONS) if bbox else None
+        if regions is None:
+            return list(self.shards)
+        wanted = {id(self.shard_for_region(region)) for region in regions}
+        return [shard for shard in self.shards if id(shard) in wanted]
+
+    @contextmanager
+    def session(self, shard: Shard, db: Optional[Session] = None) -> Iterator[Session]:
+        """``db`` when it already belongs to ``shard`` (the default one), else a new session."""
+        if shard.is_default and db is not None:
+            yield db
+            return
+        session = shard.session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def locate_report(self, report_id: str, db: Optional[Session] = None) -> Optional[Shard]:
+        """Shard holding ``report_id``, hot or archived: a cached answer or a primary key probe of each shard."""
+        if not self.enabled:
+            return self.default
+        shard = self._locations.get(report_id)
+        if shard is not None:
+            self._locations.move_to_end(report_id)
+            return shard
+        # Hot tables first, then the archive (see archive.py)
+        for column in (models.Report.id, models.ReportArchive.report_id):
+            for shard in self.shards:
+                with self.session(shard, db) as session:
+                    if session.query(column).filter(column == report_id).first():
+                        self.remember(report_id, shard)
+                        return shard
+        return None
+
+    def remember(self, report_id: str, shard: Shard) -> None:
+        if not self.enabled:
+            return
+        self._locations[report_id] = shard
+        self._locations.move_to_end(report_id)
+        while len(self._locations) > REPORT_LOCATION_CACHE_SIZE:
+            self._locations.popitem(last=False)
+
+    def scatter(self, shards: Sequence[Shard], fn: Callable[[Session], T], db: Optional[Session] = None) -> List[T]:
+        """Run ``fn`` once per shard, concurrently; the default shard reuses ``db`` in this thread."""
+        if len(shards) == 1:
+            with self.session(shards[0], db) as session:
+                return [fn(session)]
+
+        def run(shard: Shard) -> T:
+            with self.session(shard) as session:
+                return fn(session)
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=max(len(self.shards), 2), thread_name_prefix="shard")
+        remote = [(shard, self._pool.submit(run, shard)) for shard in shards if not (shard.is_default and db is not None)]
+        results = []
+        if any(shard.is_default for shard in shards) and db is not None:
+            results.append(fn(db))
+        results.extend(future.result() for _, future in remote)
+        return results
+
+
+def merge_ranked(results: Sequence[List[T]], rank: Callable[[T], tuple], skip: int, limit: int) -> List[T]:
+    """Merge per-shard lists, each already sorted by ``rank`` descending, and page the result."""
+    merged = heapq.merge(*results, key=rank, reverse=True)
+    return list(islice(merged, skip, skip + limit))
+
+
+def rank_key(priority_score: Optional[int], created_at: Optional[datetime]) -> tuple:
+    """Sort key matching the SQL list ordering (priority_score desc, created_at desc)."""
+    return (priority_score or 0, created_at or datetime.min)
+
+
+def replicate_user(db: Session, user: Optional[models.User]) -> None:
+    """Copy a user row (without credentials) into a shard so report foreign keys resolve there."""
+    if user is None or not shard_router.enabled or db.get(models.User, user.id) is not None:
+        return
+    db.merge(models.User(id=user.id, email=user.email, name=user.name, role=user.role, is_active=user.is_active))
+
+
+shard_router = ShardRouter()
+
+
+def get_report_db(report_id: str, db: Session = Depends(get_db)) -> Iterator[Session]:
+    """Dependency: a session on the shard holding ``report_id`` (the default one if unknown)."""
+    shard = shard_router.locate_report(report_id, db) or shard_router.default
+    with shard_router.session(shard, db) as session:
+        yield session
+
+
+def get_point_db(lat: float = Form(...), lng: float = Form(...), db: Session = Depends(get_db)) -> Iterator[Session]:
+    """Dependency: a session on the shard owning the submitted location."""
+    with shard_router.session(shard_router.shard_for_point(lat, lng), db) as session:
+        yield session
@@ -0,0 +1,196 @@
+"""
+Dashboard statistics maintained incrementally.
+
+The crud mutators call ``record_change`` with a snapshot of the report's
+bucket keys taken before the mutation; the difference is applied to the
+``report_stats`` counters inside the same transaction. Resolution times are
+folded into a t-digest stored in ``stats_sketches``. ``rebuild`` recomputes
+everything from the reports table in one streaming pass.
+"""
+
+from collections import Counter
+from itertools import chain
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import archive, models
+from .geo import geohash_encode
+from .sharding import shard_router
+from .tdigest import TDigest
+
+DIMENSIONS = ("status", "priority_level", "category", "neighborhood")
+RESOLUTION_SKETCH = "resolution_hours"
+UNCATEGORIZED = "uncategorized"
+
+StatKeys = Dict[str, str]
+
+
+def category_for(labels: Optional[List[str]]) -> str:
+    """A report's category: its most confident verification label."""
+    return str(labels[0]) if labels else UNCATEGORIZED
+
+
+def report_keys(report: models.Report) -> StatKeys:
+    """Bucket keys a report counts towards, one per dimension."""
+    lat = report.location_rounded_lat if report.location_rounded_lat is not None else report.lat
+    lng = report.location_rounded_lng if report.location_rounded_lng is not None else report.lng
+    return {
+        # Column defaults are only applied on INSERT, so fall back to them here
+        "status": report.status or "created",
+        "priority_level": report.priority_level or "medium",
+        "category": category_for(report.verification_labels),
+        "neighborhood": geohash_encode(lat, lng),
+    }
+
+
+def _increment(db: Session, dimension: str, key: str, delta: int) -> None:
+    """Atomically add ``delta`` to one counter, creating it if needed."""
+    dialect = db.get_bind().dialect.name
+    table = models.ReportStat.__table__
+    values = {"dimension": dimension, "key": key, "count": delta}
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(table).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.dimension, table.c.key],
+            set_={"count": table.c.count + statement.excluded.count},
+        )
+        db.execute(statement)
+        return
+
+    result = db.execute(
+        update(table)
+        .where(table.c.dimension == dimension, table.c.key == key)
+        .values(count=table.c.count + delta)
+    )
+    if result.rowcount == 0:
+        db.execute(table.insert().values(**values))
+
+
+def record_change(db: Session, before: Optional[StatKeys], report: Optional[models.Report]) -> None:
+    """
+    Move a report's counts from its ``before`` buckets to its current ones.
+
+    Pass ``before=None`` for a new report and ``report=None`` for a deleted one.
+    Does not commit; the caller's transaction covers the counters too.
+    """
+    after = report_keys(report) if report is not None else None
+    for dimension in DIMENSIONS:
+        old = before[dimension] if before else None
+        new = after[dimension] if after else None
+        if old == new:
+            continue
+        if old is not None:
+            _increment(db, dimension, old, -1)
+        if new is not None:
+            _increment(db, dimension, new, 1)
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def resolution_hours(report: models.Report) -> Optional[float]:
+    if not report.created_at or not report.resolved_at:
+        return None
+    delta = _as_naive_utc(report.resolved_at) - _as_naive_utc(report.created_at)
+    return max(delta.total_seconds() / 3600, 0.0)
+
+
+def record_resolution(db: Session, report: models.Report) -> None:
+    """Add a resolved report's time-to-resolution to the percentile sketch."""
+    hours = resolution_hours(report)
+    if hours is None:
+        return
+    # Row lock serializes concurrent read-modify-write of the sketch on Postgres
+    sketch = (
+        db.query(models.StatsSketch)
+        .filter(models.StatsSketch.name == RESOLUTION_SKETCH)
+        .with_for_update()
+        .first()
+    )
+    digest = TDigest.from_dict(sketch.data if sketch else None)
+    digest.add(hours)
+    if sketch is None:
+        db.add(models.StatsSketch(name=RESOLUTION_SKETCH, data=digest.to_dict()))
+    else:
+        sketch.data = digest.to_dict()
+
+
+def _read_shard(db: Session) -> Tuple[List[Tuple[str, str, int]], Optional[dict]]:
+    rows = db.query(models.ReportStat.dimension, models.ReportStat.key, models.ReportStat.count).all()
+    sketch = db.query(models.StatsSketch).filter(models.StatsSketch.name == RESOLUTION_SKETCH).first()
+    return [tuple(row) for row in rows], (sketch.data if sketch else None)
+
+
+def get_stats(db: Session, neighborhood_limit: int = 50) -> dict:
+    """Read the dashboard summary from the stats tables, summed over every shard."""
+    counts: Dict[str, Counter] = {dimension: Counter() for dimension in DIMENSIONS}
+    digest = TDigest()
+    for rows, sketch in shard_router.scatter(shard_router.shards, _read_shard, db):
+        for dimension, key, count in rows:
+            if count > 0 and dimension in counts:
+                counts[dimension][key] += count
+        if sketch:
+            digest.merge(TDigest.from_dict(sketch))
+
+    neighborhoods = sorted(counts["neighborhood"].items(), key=lambda item: (-item[1], item[0]))
+
+    def _quantile(q: float) -> Optional[float]:
+        value = digest.quantile(q)
+        return round(value, 2) if value is not None else None
+
+    return {
+        "total": sum(counts["status"].values()),
+        "by_status": dict(counts["status"]),
+        "by_priority_level": dict(counts["priority_level"]),
+        "by_category": dict(counts["category"]),
+        "by_neighborhood": dict(neighborhoods[:neighborhood_limit]),
+        "resolution_hours": {
+            "count": len(digest),
+            "p50": _quantile(0.5),
+            "p90": _quantile(0.9),
+            "p99": _quantile(0.99),
+        },
+    }
+
+
+def rebuild(db: Session, batch_size: int = 5000) -> int:
+    """Recompute all counters and sketches from the reports table and archive; returns reports seen."""
+    counters: Dict[str, Counter] = {dimension: Counter() for dimension in DIMENSIONS}
+    digest = TDigest()
+    columns = (
+        models.Report.status, models.Report.priority_level, models.Report.verification_labels,
+        models.Report.lat, models.Report.lng,
+        models.Report.location_rounded_lat, models.Report.location_rounded_lng,
+        models.Report.created_at, models.Report.resolved_at,
+    )
+    seen = 0
+    # Archived reports are out of the table but still count
+    for row in chain(db.query(*columns).yield_per(batch_size), archive.iter_reports(db, batch_size)):
+        keys = report_keys(row)
+        for dimension in DIMENSIONS:
+            counters[dimension][keys[dimension]] += 1
+        hours = resolution_hours(row)
+        if hours is not None and row.status == "resolved":
+            digest.add(hours)
+        seen += 1
+
+    db.query(models.ReportStat).delete()
+    db.query(models.StatsSketch).filter(models.StatsSketch.name == RESOLUTION_SKETCH).delete()
+    rows: List[dict] = [
+        {"dimension": dimension, "key": key, "count": count}
+        for dimension, counter in counters.items()
+        for key, count in counter.items()
+    ]
+    if rows:
+        db.execute(models.ReportStat.__table__.insert(), rows)
+    db.add(models.StatsSketch(name=RESOLUTION_SKETCH, data=digest.to_dict()))
+    db.commit()
+    return seen
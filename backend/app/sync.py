@@ -0,0 +1,241 @@
+"""
+Offline-first sync for field volunteers.
+
+A client queues claims, resolutions, confirmations and photo attachments
+while offline and sends them in one ``POST /sync``. Operations run in
+order, each checked against the report's current state before it writes
+anything: one that no longer applies (the report was claimed by someone
+else meanwhile) is reported as a conflict, with the server's view of the
+report, and skipped while the rest go through. What applies is committed
+together, in one transaction per shard the operations touch.
+
+The response also carries the reports changed since the client's previous
+sync. The sync token is the client's position in each shard's event stream
+(see events.py), and the delta is the reports with events after it. A
+first sync, or a token older than compacted history, gets ``reset``: the
+client should refetch what it needs from the list endpoints and keep the
+new token.
+
+Photos are uploaded separately (``POST /sync/uploads``, whenever the
+connection allows), stored under their content hash, and referenced from
+operations by the returned ``ref``.
+"""
+
+import base64
+import binascii
+import mimetypes
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import crud, events, models, schemas, serialization
+from .geo import parse_bbox
+from .sharding import Shard, replicate_user, shard_router
+
+SYNC_MAX_OPERATIONS = int(os.getenv("SYNC_MAX_OPERATIONS", "200"))
+SYNC_DELTA_LIMIT = int(os.getenv("SYNC_DELTA_LIMIT", "500"))
+
+APPLIED = "applied"
+CONFLICT = "conflict"
+REJECTED = "rejected"
+
+# sha256 hex digest plus the uploaded file's extension
+MEDIA_REF = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]{1,10})?$")
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode_token(positions: Dict[str, int]) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(positions)).decode()
+
+
+def decode_token(token: Optional[str]) -> Optional[Dict[str, int]]:
+    if not token:
+        return None
+    try:
+        positions = orjson.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, ValueError):
+        raise InvalidToken("Malformed sync token")
+    if not isinstance(positions, dict) or not all(isinstance(seq, int) for seq in positions.values()):
+        raise InvalidToken("Malformed sync token")
+    return positions
+
+
+def media_ref_name(sha256_hash: str, filename: Optional[str]) -> str:
+    """The ``ref`` (and stored filename) of an upload."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    return sha256_hash + (extension if MEDIA_REF.match(sha256_hash + extension) else "")
+
+
+def _media_for_ref(ref: Optional[str], upload_dir: str) -> Optional[schemas.MediaFileBase]:
+    if not ref or not MEDIA_REF.match(ref):
+        return None
+    file_path = os.path.join(upload_dir, ref)
+    if not os.path.exists(file_path):
+        return None
+    mime_type = mimetypes.guess_type(ref)[0] or ""
+    return schemas.MediaFileBase(
+        filename=ref,
+        original_filename=ref,
+        file_path=file_path,
+        file_type="image" if mime_type.startswith("image") else "video",
+        file_size=os.path.getsize(file_path),
+        mime_type=mime_type,
+        sha256_hash=ref[:64],
+        perceptual_hash=None
+    )
+
+
+def _result(operation: schemas.SyncOperation, status: str, reason: Optional[str] = None,
+            report: Optional[models.Report] = None) -> dict:
+    result = {"id": operation.id, "status": status, "reason": reason}
+    if report is not None:
+        result["report"] = {
+            "id": report.id,
+            "status": report.status,
+            "assigned_to_id": report.assigned_to_id,
+            "updated_at": report.updated_at,
+        }
+    return result
+
+
+def _apply(db: Session, user: models.User, operation: schemas.SyncOperation, upload_dir: str) -> dict:
+    """Check one operation against the report's current state, then apply it (uncommitted)."""
+    report = crud.get_report(db, operation.report_id)
+    if report is None:
+        return _result(operation, REJECTED, "not_found")
+    media = None
+    if operation.media_ref is not None:
+        media = _media_for_ref(operation.media_ref, upload_dir)
+        if media is None:
+            return _result(operation, REJECTED, "unknown_media_ref", report)
+
+    if operation.op == "claim":
+        if user.role not in ["volunteer", "admin"]:
+            return _result(operation, REJECTED, "forbidden", report)
+        if report.assigned_to_id == user.id:
+            return _result(operation, APPLIED, "already_applied", report)
+        if report.assigned_to_id:
+            return _result(operation, CONFLICT, "claimed_by_other", report)
+        crud.apply_claim(db, report, user.id, operation.notes)
+    elif operation.op == "resolve":
+        if not operation.resolution_notes:
+            return _result(operation, REJECTED, "missing_resolution_notes", report)
+        if report.assigned_to_id != user.id:
+            return _result(operation, CONFLICT, "not_assigned", report)
+        if report.status == "resolved":
+            return _result(operation, APPLIED, "already_applied", report)
+        if media is not None:
+            crud.add_media_file(db, media, report.id)
+        crud.apply_resolve(db, report, user.id, operation.resolution_notes)
+    elif operation.op == "confirm":
+        crud.apply_confirm(db, report, user.id)
+    elif operation.op == "attach":
+        if media is None:
+            return _result(operation, REJECTED, "missing_media_ref", report)
+        if user.id not in (report.assigned_to_id, report.reporter_id):
+            return _result(operation, CONFLICT, "not_assigned", report)
+        crud.add_media_file(db, media, report.id)
+        # The delta other clients sync is read from the event stream
+        events.append(db, report.id, "media_added", user_id=user.id, details={"media_count": 1})
+    else:
+        return _result(operation, REJECTED, "unknown_op")
+    return _result(operation, APPLIED, report=report)
+
+
+def apply_operations(db: Session, user: models.User, operations: List[schemas.SyncOperation],
+                     upload_dir: str) -> List[dict]:
+    """Apply ``operations`` in order; one result per operation, in the same order."""
+    results: List[Optional[dict]] = [None] * len(operations)
+    groups: Dict[str, Tuple[Shard, List[int]]] = {}
+    for index, operation in enumerate(operations):
+        shard = shard_router.locate_report(operation.report_id, db)
+        if shard is None:
+            results[index] = _result(operation, REJECTED, "not_found")
+            continue
+        groups.setdefault(shard.name, (shard, []))[1].append(index)
+
+    for shard, indexes in groups.values():
+        with shard_router.session(shard, db) as shard_db:
+            replicate_user(shard_db, user)
+            try:
+                for index in indexes:
+                    results[index] = _apply(shard_db, user, operations[index], upload_dir)
+                shard_db.commit()
+            except Exception:
+                shard_db.rollback()
+                raise
+    return results
+
+
+def _changed_report_ids(db: Session, after: int, limit: int) -> Tuple[List[str], int, bool]:
+    """Up to ``limit`` reports with events after ``after``; returns them, the position read to, and whether there is more."""
+    activities = models.Activity.__table__
+    report_ids: Dict[str, None] = {}
+    position = after
+    while True:
+        rows = db.connection().execute(
+            select(activities.c.seq, activities.c.report_id)
+            .where(activities.c.seq > position)
+            .order_by(activities.c.seq)
+            .limit(limit)
+        ).all()
+        if not rows:
+            return list(report_ids), position, False
+        for seq, report_id in rows:
+            if report_id not in report_ids:
+                if len(report_ids) >= limit:
+                    return list(report_ids), position, True
+                report_ids[report_id] = None
+            position = seq
+
+
+def _shard_changes(db: Session, after: Optional[int], bbox, limit: int) -> Tuple[List[dict], int, bool, bool]:
+    """One shard's part of the delta: reports, new position, has_more, reset."""
+    last = db.query(models.EventSequence.last_seq).filter(models.EventSequence.id == 1).scalar() or 0
+    oldest = db.query(func.min(models.Activity.seq)).scalar()
+    if after is None or (oldest is None and last > after) or (oldest is not None and oldest > after + 1):
+        return [], last, False, True
+
+    report_ids, position, has_more = _changed_report_ids(db, after, limit)
+    if not report_ids:
+        return [], position, has_more, False
+    query = db.query(*serialization.REPORT_DETAIL_COLUMNS).filter(models.Report.id.in_(report_ids))
+    if bbox:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        query = query.filter(models.Report.lat.between(min_lat, max_lat), models.Report.lng.between(min_lng, max_lng))
+    rows = query.all()
+    media: Dict[str, List[str]] = {}
+    if rows:
+        for report_id, filename in db.query(models.MediaFile.report_id, models.MediaFile.filename).filter(
+            models.MediaFile.report_id.in_([row[0] for row in rows])
+        ):
+            media.setdefault(report_id, []).append(f"/uploads/{filename}")
+    return [serialization.detail_row_to_dict(row, media.get(row[0], [])) for row in rows], position, has_more, False
+
+
+def changes_since(db: Session, token: Optional[str], bbox: Optional[str] = None,
+                  limit: int = SYNC_DELTA_LIMIT) -> dict:
+    """Reports changed after ``token`` (optionally only inside ``bbox``) and the token to send next time.
+
+    Raises InvalidToken for a token this server did not issue.
+    """
+    positions = decode_token(token)
+    bounds = parse_bbox(bbox)
+    changes: List[dict] = []
+    new_positions: Dict[str, int] = {}
+    has_more = reset = False
+    for shard in shard_router.shards:
+        after = None if positions is None else positions.get(shard.name, 0)
+        with shard_router.session(shard, db) as shard_db:
+            reports, new_positions[shard.name], more, shard_reset = _shard_changes(shard_db, after, bounds, limit)
+        changes.extend(reports)
+        has_more = has_more or more
+        reset = reset or shard_reset
+    return {"changes": changes, "token": encode_token(new_positions), "has_more": has_more, "reset": reset}
@@ -0,0 +1,126 @@
+"""
+Merging t-digest for streaming percentile estimates.
+
+A t-digest summarizes a distribution as a small sorted list of weighted
+centroids, with more resolution near the tails. Digests can be updated one
+value at a time and merged with each other, which lets the stats tables
+keep resolution-time percentiles current without re-reading every report.
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class TDigest:
+    """Mergeable quantile sketch (merging variant with the k1 scale function)."""
+
+    def __init__(self, compression: float = 100.0):
+        self.compression = compression
+        self.centroids: List[List[float]] = []  # [[mean, weight], ...] sorted by mean
+        self._buffer: List[List[float]] = []
+        self.total_weight = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def __len__(self) -> int:
+        return int(self.total_weight)
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _q(self, k: float) -> float:
+        angle = k * 2 * math.pi / self.compression
+        if angle >= math.pi / 2:
+            return 1.0
+        return (math.sin(angle) + 1) / 2
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        """Add ``value`` with ``weight`` to the digest."""
+        self._buffer.append([float(value), float(weight)])
+        self.total_weight += weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self._buffer) >= self.compression * 5:
+            self.compress()
+
+    def update(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "TDigest") -> None:
+        """Fold another digest into this one."""
+        other.compress()
+        if not other.centroids:
+            return
+        self._buffer.extend([list(c) for c in other.centroids])
+        self.total_weight += other.total_weight
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.compress()
+
+    def compress(self) -> None:
+        """Merge buffered points into the centroid list."""
+        if not self._buffer:
+            return
+        points = sorted(self.centroids + self._buffer, key=lambda c: c[0])
+        self._buffer = []
+        total = self.total_weight
+        merged: List[List[float]] = []
+        mean, weight = points[0]
+        weight_so_far = 0.0
+        q_limit = self._q(self._k(0.0) + 1)
+        for point_mean, point_weight in points[1:]:
+            if (weight_so_far + weight + point_weight) / total <= q_limit:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                merged.append([mean, weight])
+                weight_so_far += weight
+                q_limit = self._q(self._k(weight_so_far / total) + 1)
+                mean, weight = point_mean, point_weight
+        merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile ``q`` (0..1), or None when empty."""
+        self.compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        q = min(max(q, 0.0), 1.0)
+        target = q * self.total_weight
+
+        # Centroid i sits at cumulative weight (sum of previous weights + w_i / 2)
+        cumulative = 0.0
+        prev_mean, prev_center = self.min, 0.0
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - prev_center
+                fraction = (target - prev_center) / span if span > 0 else 0.0
+                return prev_mean + (mean - prev_mean) * fraction
+            prev_mean, prev_center = mean, center
+            cumulative += weight
+        span = self.total_weight - prev_center
+        fraction = (target - prev_center) / span if span > 0 else 1.0
+        return prev_mean + (self.max - prev_mean) * fraction
+
+    def to_dict(self) -> Dict[str, Any]:
+        self.compress()
+        return {
+            "compression": self.compression,
+            "centroids": self.centroids,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "TDigest":
+        digest = cls(compression=(data or {}).get("compression", 100.0))
+        if data:
+            digest.centroids = [list(c) for c in data.get("centroids", [])]
+            digest.total_weight = sum(weight for _, weight in digest.centroids)
+            digest.min = data.get("min")
+            digest.max = data.get("max")
+        return digest
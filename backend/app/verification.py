@@ -0,0 +1,165 @@
+"""
+AI verification of new reports through the ML service.
+
+Verification runs after the create-report response has been sent. Reports
+that could not be verified (ML slow, down, or circuit open) keep status
+``created``, which doubles as the retry queue: ``verify_pending`` picks them
+up again once the ML service is healthy.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import crud, models, schemas
+from .media import Frame
+from .ml_client import MLServiceUnavailable, ml_client
+from .sharding import Shard, shard_router
+
+logger = logging.getLogger(__name__)
+
+BACKEND_PUBLIC_URL = os.getenv("BACKEND_PUBLIC_URL", "http://localhost:8000")
+VERIFICATION_RETRY_SECONDS = float(os.getenv("VERIFICATION_RETRY_SECONDS", "60"))
+VERIFICATION_RETRY_BATCH = int(os.getenv("VERIFICATION_RETRY_BATCH", "50"))
+
+
+def priority_from_score(score: float) -> Tuple[int, str]:
+    """Map a veracity score (0..1) to a priority score and level."""
+    priority_score = int(round(min(max(score, 0.0), 1.0) * 100))
+    if priority_score >= 70:
+        return priority_score, "high"
+    if priority_score >= 40:
+        return priority_score, "medium"
+    return priority_score, "low"
+
+
+def combine_results(results: List[Dict[str, Any]]) -> Tuple[float, List[str]]:
+    """Merge text/image inference results into one score and a label list (most confident first)."""
+    scores = [r.get("veracity_score", 0.0) for r in results]
+    labels = sorted(
+        (label for r in results for label in r.get("labels", [])),
+        key=lambda label: label.get("confidence", 0.0),
+        reverse=True,
+    )
+    names: List[str] = []
+    for label in labels:
+        if label.get("label") and label["label"] not in names:
+            names.append(label["label"])
+    return (max(scores) if scores else 0.0), names
+
+
+def media_url(filename: str) -> str:
+    return f"{BACKEND_PUBLIC_URL.rstrip('/')}/uploads/{filename}"
+
+
+def _load_text(report_id: str) -> Optional[Tuple[Shard, str]]:
+    """Shard and inference text of a report still awaiting verification."""
+    shard = shard_router.locate_report(report_id)
+    if shard is None:
+        return None
+    with shard_router.session(shard) as db:
+        db_report = crud.get_report(db, report_id)
+        if not db_report or db_report.status != "created":
+            return None
+        return shard, f"{db_report.title}\n{db_report.description or ''}".strip()
+
+
+def _save_result(shard: Shard, report_id: str, results: List[Dict[str, Any]]) -> bool:
+    """Record the inference results, unless the report left ``created`` while they ran."""
+    score, labels = combine_results(results)
+    priority_score, priority_level = priority_from_score(score)
+    with shard_router.session(shard) as db:
+        db_report = crud.get_report(db, report_id)
+        if not db_report or db_report.status != "created":
+            return False
+        crud.update_report(db, report_id, schemas.ReportUpdate(
+            verification_score=score,
+            verification_labels=labels,
+            priority_score=priority_score,
+            priority_level=priority_level,
+            status="verified"
+        ))
+        return True
+
+
+async def verify_report(
+    report_id: str,
+    image_url: Optional[str] = None,
+    image_sha256: Optional[str] = None,
+    image_frame: Optional[Frame] = None,
+) -> bool:
+    """
+    Run inference for a report still in ``created`` state; returns True once verified.
+
+    ``image_frame`` is the upload decoded at create time; retries only have
+    the stored file and fall back to ``image_url``. Database work runs in the
+    threadpool, and no connection is held while the ML calls are awaited:
+    they can take up to ML_TIMEOUT_SECONDS plus hedging, and concurrent
+    verifications would otherwise drain the connection pool.
+    """
+    loaded = await run_in_threadpool(_load_text, report_id)
+    if loaded is None:
+        return False
+    shard, text = loaded
+
+    calls = [ml_client.text_infer(text)]
+    if image_frame is not None:
+        calls.append(ml_client.image_infer_frame(image_frame, image_sha256))
+    elif image_url:
+        calls.append(ml_client.image_infer(image_url, image_sha256))
+    try:
+        results = await asyncio.gather(*calls)
+    except MLServiceUnavailable as exc:
+        logger.info("Verification of %s queued for retry: %s", report_id, exc)
+        return False
+
+    return await run_in_threadpool(_save_result, shard, report_id, results)
+
+
+async def verify_pending(limit: int = VERIFICATION_RETRY_BATCH) -> int:
+    """Retry verification for reports left in ``created``; returns how many were verified."""
+    if not ml_client.breaker.is_available():
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(seconds=VERIFICATION_RETRY_SECONDS)
+
+    def find_pending(db) -> List[Tuple[str, Optional[Tuple[str, str]]]]:
+        pending = (
+            db.query(models.Report.id)
+            .filter(models.Report.status == "created", models.Report.created_at <= cutoff)
+            .order_by(models.Report.created_at)
+            .limit(limit)
+            .all()
+        )
+        images = {}
+        for report_id, filename, sha256_hash in (
+            db.query(models.MediaFile.report_id, models.MediaFile.filename, models.MediaFile.sha256_hash)
+            .filter(models.MediaFile.report_id.in_([report_id for (report_id,) in pending]),
+                    models.MediaFile.file_type == "image")
+        ):
+            images.setdefault(report_id, (media_url(filename), sha256_hash))
+        return [(report_id, images.get(report_id)) for (report_id,) in pending]
+
+    # Each shard contributes up to `limit` of its oldest pending reports
+    scattered = await run_in_threadpool(shard_router.scatter, shard_router.shards, find_pending)
+    pending = [item for items in scattered for item in items]
+
+    verified = 0
+    for report_id, image in pending:
+        if await verify_report(report_id, *(image or (None, None))):
+            verified += 1
+        elif not ml_client.breaker.is_available():
+            break
+    return verified
+
+
+async def retry_pending_job() -> int:
+    """Retry the reports whose ML verification failed or timed out."""
+    verified = await verify_pending()
+    if verified:
+        logger.info("Verified %d queued reports", verified)
+    return verified
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Archival benchmark: moving old resolved reports out of the hot tables.
+
+Seeds the bulk report set (reports created over the last 180 days, a
+sixth of them resolved), archives everything resolved more than --days
+ago and reports
+
+  - archive:       reports moved per second
+  - hot_detail:    GET /reports/{id} for reports still in the hot table
+  - archived_detail: the same for archived reports (archive fallback)
+
+along with the hot tables' rows and data bytes (rows plus indexes, on
+SQLite) before and after, and the size of the archive. Archived reads must
+return the same report as before archival.
+
+    python benchmarks/archive_bench.py --reports 200000 --days 30
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from common import compare_results, print_table, save_results, summarize
+
+import api_bench
+
+HOT_TABLES = ("reports", "media_files", "activities", "report_snapshots")
+
+
+def table_bytes(db, tables) -> int:
+    """Bytes of row and index data held by ``tables`` (SQLite with dbstat; 0 elsewhere)."""
+    from sqlalchemy import bindparam, text
+
+    if db.get_bind().dialect.name != "sqlite":
+        return 0
+    return db.execute(
+        text("SELECT coalesce(sum(d.payload), 0) FROM dbstat d JOIN sqlite_master m ON m.name = d.name "
+             "WHERE m.tbl_name IN :tables").bindparams(bindparam("tables", expanding=True)),
+        {"tables": list(tables)},
+    ).scalar()
+
+
+def time_reads(client, report_ids: List[str], iterations: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(iterations):
+        report_id = rng.choice(report_ids)
+        start = time.perf_counter()
+        response = client.get(f"/api/v1/reports/{report_id}")
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return summarize(timings, sum(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark archiving resolved reports")
+    parser.add_argument("--reports", type=int, default=200_000)
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="civicsense-archive-")
+    # Uploads and cold storage live relative to the working directory
+    os.chdir(workdir)
+    fixtures = api_bench.prepare_database(args, workdir)
+
+    from datetime import datetime, timedelta
+
+    from fastapi.testclient import TestClient
+
+    from app import archive, models
+    from app.database import SessionLocal
+    from app.main import app
+
+    cutoff = datetime.utcnow() - timedelta(days=args.days)
+    db = SessionLocal()
+    results: Dict[str, dict] = {}
+    try:
+        due = [
+            report_id for (report_id,) in db.query(models.Report.id)
+            .filter(models.Report.status == "resolved", models.Report.resolved_at < cutoff)
+        ]
+        hot = [
+            report_id for (report_id,) in db.query(models.Report.id)
+            .filter(models.Report.status != "resolved").limit(10000)
+        ]
+        rows_before, bytes_before = db.query(models.Report).count(), table_bytes(db, HOT_TABLES)
+
+        with TestClient(app) as client:
+            sample = random.Random(args.seed).sample(due, min(50, len(due)))
+            expected = {report_id: client.get(f"/api/v1/reports/{report_id}").json() for report_id in sample}
+
+            start = time.perf_counter()
+            moved = archive.archive(db, days=args.days, batch_size=args.batch_size)
+            seconds = time.perf_counter() - start
+            results["archive"] = {"count": moved, "seconds": round(seconds, 2),
+                                  "per_s": round(moved / seconds) if seconds else 0}
+            assert moved == len(due), f"archived {moved} of {len(due)} due reports"
+
+            for report_id, before in expected.items():
+                after = client.get(f"/api/v1/reports/{report_id}").json()
+                assert {k: v for k, v in after.items() if k != "media_urls"} == \
+                    {k: v for k, v in before.items() if k != "media_urls"}, f"archived {report_id} differs"
+
+            results["hot_detail"] = time_reads(client, hot, args.iterations, args.seed)
+            results["archived_detail"] = time_reads(client, due, args.iterations, args.seed)
+        rows_after, bytes_after = db.query(models.Report).count(), table_bytes(db, HOT_TABLES)
+        archive_bytes = table_bytes(db, ["report_archive"])
+    finally:
+        db.close()
+
+    print_table(f"Archiving reports resolved over {args.days:.0f} days ago ({fixtures['total_reports']} reports)",
+                {"archive": results["archive"]}, ("count", "seconds", "per_s"))
+    print_table("Detail reads", {name: results[name] for name in ("hot_detail", "archived_detail")},
+                ("count", "p50_ms", "p95_ms", "p99_ms"))
+    print(f"\nhot reports {rows_before} -> {rows_after}; hot table data {bytes_before / 2**20:.1f} MB -> "
+          f"{bytes_after / 2**20:.1f} MB; archive {archive_bytes / 2**20:.1f} MB")
+
+    payload = {
+        "config": {
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "reports": fixtures["total_reports"],
+            "days": args.days,
+            "batch_size": args.batch_size,
+            "hot_reports_before": rows_before,
+            "hot_reports_after": rows_after,
+            "hot_bytes_before": bytes_before,
+            "hot_bytes_after": bytes_after,
+            "archive_bytes": archive_bytes,
+        },
+        "results": {"archive": results},
+    }
+    path = save_results("archive", payload, args.output)
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("p50_ms", "p99_ms", "per_s"))
+
+
+if __name__ == "__main__":
+    main()
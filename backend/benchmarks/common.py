@@ -0,0 +1,113 @@
+"""
+Shared helpers for the CivicSense benchmark scripts.
+
+Latency summaries, JSON result files tagged with the git revision, and a
+side-by-side comparison against a previous result file.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+# Make `import app` work when a benchmark is run as a plain script
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(latencies: Iterable[float], wall_seconds: float, errors: int = 0) -> Dict[str, Any]:
+    """Throughput and latency percentiles (in ms) for a list of per-call seconds."""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "count": count,
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_per_s": round(count / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+def git_revision() -> str:
+    """Short hash of HEAD, with a -dirty suffix for uncommitted changes."""
+    try:
+        rev = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+        dirty = subprocess.call(
+            ["git", "diff", "--quiet", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        )
+        return f"{rev}-dirty" if dirty else rev
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name: str, payload: Dict[str, Any], output_dir: Optional[str] = None) -> str:
+    """Write ``payload`` as ``<name>-<revision>-<timestamp>.json`` and return the path."""
+    output_dir = output_dir or RESULTS_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    revision = git_revision()
+    document = {
+        "benchmark": name,
+        "revision": revision,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": sys.version.split()[0],
+        **payload,
+    }
+    path = os.path.join(output_dir, f"{name}-{revision}-{int(time.time())}.json")
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    return path
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, Any]], columns: Iterable[str]) -> None:
+    """Print one row per workload with the selected summary columns."""
+    columns = list(columns)
+    print(f"\n{title}")
+    header = f"{'workload':<24}" + "".join(f"{col:>18}" for col in columns)
+    print(header)
+    print("-" * len(header))
+    for name, summary in rows.items():
+        print(f"{name:<24}" + "".join(f"{summary.get(col, ''):>18}" for col in columns))
+
+
+def compare_results(current: Dict[str, Any], baseline_path: str, metrics: Iterable[str] = ("throughput_per_s", "p95_ms")) -> None:
+    """Print the relative change of ``metrics`` for every result present in both files."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison against {baseline.get('revision', '?')} ({os.path.basename(baseline_path)})")
+    for group, results in current.get("results", {}).items():
+        base_group = baseline.get("results", {}).get(group, {})
+        for name, summary in results.items():
+            base = base_group.get(name)
+            if not base:
+                continue
+            deltas = []
+            for metric in metrics:
+                old, new = base.get(metric), summary.get(metric)
+                if not old or new is None:
+                    continue
+                deltas.append(f"{metric} {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+            print(f"  {group}/{name}: " + ", ".join(deltas))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Geofence matching benchmark: subscriptions containing a new report.
+
+Builds the grid index (app/geofence.py) over --subscriptions synthetic
+fences around the bulk seeding cities: circles with radii log-uniform
+between 200 m and 5 km, and --polygons of them as irregular hexagons of a
+similar size. Then times matching --reports random report locations and
+priorities
+
+  - grid:  GeofenceIndex.match (cell lookups + vectorized exact tests)
+  - scan:  haversine distance to every circle and ray casting of every
+           polygon whose bounding box holds the report, without the grid
+
+and checks both find the same subscriptions. The target is under a
+millisecond per report at 1M subscriptions.
+
+    python benchmarks/geofence_bench.py --subscriptions 1000000 --reports 2000
+"""
+
+import argparse
+import math
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from common import compare_results, print_table, save_results, summarize
+
+from app import geofence
+from scripts.seed_demo import BULK_CITIES
+
+SPREAD_DEGREES = 0.15  # as in seed_demo's bulk reports
+
+
+def random_point(rng: random.Random):
+    lat, lng = rng.choice(BULK_CITIES)
+    return lat + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES), lng + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+
+
+def random_fence(number: int, rng: random.Random, polygon: bool) -> geofence.Fence:
+    lat, lng = random_point(rng)
+    radius_m = math.exp(rng.uniform(math.log(200), math.log(5000)))
+    min_priority = rng.choice((40, 70, 70, 70, 90))
+    if not polygon:
+        return geofence.Fence(f"s{number}", f"u{number % 50000}", lat, lng, radius_m, None, min_priority, 0)
+    dlat = radius_m / geofence.EARTH_RADIUS_M * 180 / math.pi
+    dlng = dlat / math.cos(math.radians(lat))
+    ring = []
+    for vertex in range(6):
+        angle = vertex * math.pi / 3 + rng.uniform(-0.3, 0.3)
+        scale = rng.uniform(0.6, 1.0)
+        ring.append([lng + dlng * scale * math.cos(angle), lat + dlat * scale * math.sin(angle)])
+    return geofence.Fence(f"s{number}", f"u{number % 50000}", None, None, None, ring, min_priority, 0)
+
+
+class Scan:
+    """Every fence tested against a report, independently of the index; returns positions in ``fences``."""
+
+    def __init__(self, fences: List[geofence.Fence]):
+        circles = [(slot, f) for slot, f in enumerate(fences) if not f.polygon]
+        self.circle_slots = np.array([slot for slot, _ in circles], np.int64)
+        self.lat = np.array([f.lat for _, f in circles])
+        self.lng = np.array([f.lng for _, f in circles])
+        self.radius_m = np.array([f.radius_m for _, f in circles])
+        self.circle_priority = np.array([f.min_priority for _, f in circles])
+        self.polygons = [(slot, f) for slot, f in enumerate(fences) if f.polygon]
+        self.bounds = np.array([geofence.fence_bbox(f) for _, f in self.polygons]).reshape(-1, 4)
+
+    def __call__(self, lat: float, lng: float, priority: int) -> np.ndarray:
+        phi1, phi2 = math.radians(lat), np.radians(self.lat)
+        a = (np.sin((phi2 - phi1) / 2) ** 2
+             + math.cos(phi1) * np.cos(phi2) * np.sin(np.radians(self.lng - lng) / 2) ** 2)
+        distances = 2 * geofence.EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+        inside = self.circle_slots[(distances <= self.radius_m) & (self.circle_priority <= priority)]
+        boxed = np.flatnonzero((self.bounds[:, 0] <= lng) & (lng <= self.bounds[:, 2])
+                               & (self.bounds[:, 1] <= lat) & (lat <= self.bounds[:, 3]))
+        polygons = [
+            self.polygons[i][0] for i in boxed
+            if self.polygons[i][1].min_priority <= priority and ray_cast(self.polygons[i][1].polygon, lat, lng)
+        ]
+        return np.concatenate((inside, np.asarray(polygons, np.int64)))
+
+
+def ray_cast(ring, lat: float, lng: float) -> bool:
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 > lat) != (y2 > lat) and lng < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def time_matches(fn, points: List[tuple]) -> dict:
+    timings = []
+    for point in points:
+        start = time.perf_counter()
+        fn(*point)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings, sum(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark geofenced subscription matching")
+    parser.add_argument("--subscriptions", type=int, default=1_000_000)
+    parser.add_argument("--polygons", type=float, default=0.05, help="Fraction of fences that are polygons")
+    parser.add_argument("--reports", type=int, default=2000)
+    parser.add_argument("--checked", type=int, default=200, help="Reports also matched by a full scan")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    fences = [random_fence(number, rng, rng.random() < args.polygons) for number in range(args.subscriptions)]
+    index = geofence.GeofenceIndex()
+    start = time.perf_counter()
+    index.update(fences)
+    build_seconds = time.perf_counter() - start
+    print(f"Indexed {len(index)} subscriptions in {build_seconds:.1f}s ({index.nbytes / 2**20:.0f} MB)")
+
+    points = [(*random_point(rng), rng.randint(0, 100)) for _ in range(args.reports)]
+    matched = [len(index.match(*point)) for point in points]
+    scan = Scan(fences)
+
+    results: Dict[str, dict] = {
+        "grid": time_matches(index.match, points),
+        "scan": time_matches(scan, points[:args.checked]),
+    }
+    # Slots follow the index's own (spatial) order; compare subscription ids
+    mismatches = sum(
+        {fence_id for fence_id, _ in index.fences(index.match(*point))} != {fences[i].id for i in scan(*point)}
+        for point in points[:args.checked]
+    )
+
+    print_table(f"Subscriptions matched per report ({args.subscriptions} subscriptions)",
+                results, ("count", "p50_ms", "p95_ms", "p99_ms"))
+    print(f"\n{sum(matched) / len(matched):.1f} subscriptions matched per report on average; "
+          f"{mismatches} of {min(args.checked, len(points))} reports differ from the full scan")
+
+    payload = {
+        "config": {
+            "subscriptions": args.subscriptions,
+            "polygons": args.polygons,
+            "reports": args.reports,
+            "build_seconds": round(build_seconds, 1),
+            "index_mb": round(index.nbytes / 2**20, 1),
+            "mismatches": mismatches,
+        },
+        "results": {"geofence": results},
+    }
+    path = save_results("geofence", payload, args.output)
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("p50_ms", "p99_ms"))
+    if mismatches:
+        raise SystemExit("Grid and full scan matches differ")
+
+
+if __name__ == "__main__":
+    main()
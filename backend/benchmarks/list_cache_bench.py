@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+List cache benchmark: map viewport latency right after a bulk change.
+
+Seeds the bulk report set and replays map traffic over --viewports
+viewports with Zipf-distributed popularity, so the cache warmer can learn
+which ones are hot. Then a storm of --batch new, verified high-priority
+reports lands in the busiest areas, and the benchmark keeps browsing for
+--after-seconds, timing
+
+  - hot:  requests for the --top-k most popular viewports
+  - cold: all other requests
+
+once with the list cache disabled (``uncached``) and once with it and its
+warmer running (``cached``). After the run, every warmed response must
+match what the database returns.
+
+    python benchmarks/list_cache_bench.py --reports 200000 --batch 1000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from itertools import accumulate
+from typing import Dict, List
+
+from common import compare_results, print_table, save_results, summarize
+
+import api_bench
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark list cache warming after bulk changes")
+    parser.add_argument("--reports", type=int, default=100000)
+    parser.add_argument("--viewports", type=int, default=500)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Popularity skew of the viewports")
+    parser.add_argument("--top-k", type=int, default=20, help="Viewports counted as hot")
+    parser.add_argument("--warmup", type=int, default=3000, help="Requests before the bulk change")
+    parser.add_argument("--batch", type=int, default=500, help="Reports created by the bulk change")
+    parser.add_argument("--after-seconds", type=float, default=5.0)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    return parser.parse_args()
+
+
+def bulk_change(viewports: List[str], count: int, rng: random.Random) -> None:
+    """Create ``count`` verified high-priority reports inside the given viewports."""
+    from app import crud, schemas
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for index in range(count):
+            min_lng, min_lat, max_lng, max_lat = map(float, rng.choice(viewports).split(","))
+            report = crud.create_report(db, schemas.ReportCreate(
+                title=f"Storm damage {index}", description="Fallen tree blocking the road",
+                lat=rng.uniform(min_lat, max_lat), lng=rng.uniform(min_lng, max_lng),
+            ), None)
+            crud.update_report(db, report.id, schemas.ReportUpdate(
+                status="verified", priority_score=95, priority_level="high"
+            ))
+    finally:
+        db.close()
+
+
+def browse(client, viewports: List[str], weights: List[float], hot: set, seconds: float, count: int,
+           rng: random.Random) -> Dict[str, List[float]]:
+    """Request Zipf-sampled viewports for ``seconds`` (or ``count`` requests); latencies by hot/cold."""
+    timings: Dict[str, List[float]] = {"hot": [], "cold": []}
+    deadline = time.perf_counter() + seconds if seconds else None
+    done = 0
+    while (deadline and time.perf_counter() < deadline) or (not deadline and done < count):
+        bbox = rng.choices(viewports, cum_weights=weights)[0]
+        start = time.perf_counter()
+        response = client.get("/api/v1/reports/", params={"bbox": bbox, "per_page": 50})
+        timings["hot" if bbox in hot else "cold"].append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+        done += 1
+    return timings
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="civicsense-list-cache-")
+    os.chdir(workdir)
+    fixtures = api_bench.prepare_database(args, workdir)
+
+    import orjson
+    from fastapi.testclient import TestClient
+
+    from app import list_cache
+    from app.database import SessionLocal
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    viewports = [api_bench.random_bbox(rng) for _ in range(args.viewports)]
+    weights = list(accumulate(1 / (rank + 1) ** args.zipf for rank in range(args.viewports)))
+    hot = set(viewports[:args.top_k])
+    cache = list_cache.report_lists
+    size = cache.size or 1000
+
+    results: Dict[str, dict] = {}
+    with TestClient(app) as client:
+        for mode in ("uncached", "cached"):
+            cache.size = size if mode == "cached" else 0
+            browse(client, viewports, weights, hot, 0, args.warmup, rng)
+            # Let the warmer see the traffic before the storm
+            time.sleep(2 * list_cache.LIST_CACHE_WARM_SECONDS)
+            bulk_change(viewports[:args.top_k], args.batch, rng)
+            timings = browse(client, viewports, weights, hot, args.after_seconds, 0, rng)
+            for kind, values in timings.items():
+                results[f"{mode}_{kind}"] = summarize(values, sum(values))
+
+        # Warmed responses must match the database once the warmer has caught up
+        time.sleep(2 * list_cache.LIST_CACHE_WARM_SECONDS)
+        db = SessionLocal()
+        try:
+            checked = 0
+            for bbox in viewports[:args.top_k]:
+                query = list_cache.list_query(bbox, None, None, 1, 50)
+                body, result = cache.get(query)
+                if body is not None and result == list_cache.FRESH:
+                    assert orjson.loads(body) == orjson.loads(list_cache.render(db, query)), f"stale cache for {bbox}"
+                    checked += 1
+        finally:
+            db.close()
+
+    print_table(f"Viewport latency after {args.batch} new reports ({fixtures['total_reports']} reports)",
+                results, ("count", "p50_ms", "p95_ms", "p99_ms"))
+    print(f"\n{checked} of {args.top_k} hot viewports warm and matching the database")
+
+    payload = {
+        "config": {
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "reports": fixtures["total_reports"],
+            "viewports": args.viewports,
+            "zipf": args.zipf,
+            "top_k": args.top_k,
+            "batch": args.batch,
+            "after_seconds": args.after_seconds,
+            "warm_seconds": list_cache.LIST_CACHE_WARM_SECONDS,
+        },
+        "results": {"list_cache": results},
+    }
+    path = save_results("list_cache", payload, args.output)
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("p50_ms", "p99_ms"))
+
+
+if __name__ == "__main__":
+    main()
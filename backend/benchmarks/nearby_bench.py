@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Nearby-reports benchmark: geohash ring expansion vs ORDER BY distance.
+
+Seeds the bulk report set (1M reports by default) and times
+crud.nearby_report_rows for random points around the seeded cities, plus a
+full-table ORDER BY distance baseline. The first queries of each case are
+also checked against the baseline, so the ring search must return the
+same neighbours. Target: p99 under 10 ms at 1M reports.
+
+    python benchmarks/nearby_bench.py --reports 1000000
+    python benchmarks/nearby_bench.py --k 20 --radius-m 5000 --iterations 500
+"""
+
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from common import compare_results, print_table, save_results, summarize
+
+import api_bench
+
+CHECKED_QUERIES = 20
+
+
+def random_point(rng: random.Random) -> Tuple[float, float]:
+    from scripts.seed_demo import BULK_CITIES
+
+    lat, lng = rng.choice(BULK_CITIES)
+    return lat + rng.uniform(-0.2, 0.2), lng + rng.uniform(-0.2, 0.2)
+
+
+def ordered_scan(db, columns, lat: float, lng: float, k: int, radius_m: float) -> List[Tuple[float, tuple]]:
+    """The naive query: sort the whole table by (equirectangular) distance."""
+    from sqlalchemy import func
+
+    from app import models
+    from app.geo import haversine_m
+
+    scale = math.cos(math.radians(lat)) ** 2
+    distance = (func.pow(models.Report.location_rounded_lat - lat, 2)
+                + func.pow(models.Report.location_rounded_lng - lng, 2) * scale)
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite may be built without math functions
+        distance = ((models.Report.location_rounded_lat - lat) * (models.Report.location_rounded_lat - lat)
+                    + (models.Report.location_rounded_lng - lng) * (models.Report.location_rounded_lng - lng) * scale)
+    rows = db.query(*columns).order_by(distance).limit(k * 2)
+    found = [(haversine_m(lat, lng, row[4], row[5]), tuple(row)) for row in rows]
+    return sorted((item for item in found if item[0] <= radius_m), key=lambda item: item[0])[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark k-nearest report search")
+    parser.add_argument("--reports", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--baseline-iterations", type=int, default=20)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius-m", type=float, default=1000.0)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="civicsense-nearby-")
+    fixtures = api_bench.prepare_database(args, workdir)
+
+    from app import crud, serialization
+    from app.database import SessionLocal
+
+    columns = serialization.REPORT_SUMMARY_COLUMNS
+    cases = {
+        "ring": lambda db, lat, lng: crud.nearby_report_rows(db, columns, lat, lng, k=args.k, radius_m=args.radius_m),
+        "order_by_distance": lambda db, lat, lng: ordered_scan(db, columns, lat, lng, args.k, args.radius_m),
+    }
+    results: Dict[str, dict] = {}
+    db = SessionLocal()
+    try:
+        rng = random.Random(args.seed)
+        for lat, lng in (random_point(rng) for _ in range(CHECKED_QUERIES)):
+            expected = [round(distance, 3) for distance, _ in cases["order_by_distance"](db, lat, lng)]
+            actual = [round(distance, 3) for distance, _ in cases["ring"](db, lat, lng)]
+            assert actual == expected, f"ring search differs at ({lat}, {lng}): {actual} != {expected}"
+
+        for name, fn in cases.items():
+            iterations = args.iterations if name == "ring" else args.baseline_iterations
+            rng = random.Random(args.seed)
+            timings, hits = [], 0
+            for _ in range(iterations):
+                lat, lng = random_point(rng)
+                start = time.perf_counter()
+                hits += len(fn(db, lat, lng))
+                timings.append(time.perf_counter() - start)
+            results[name] = {**summarize(timings, sum(timings)), "mean_hits": round(hits / iterations, 1)}
+    finally:
+        db.close()
+
+    print_table(f"k={args.k} within {args.radius_m:.0f} m ({fixtures['total_reports']} reports)",
+                results, ("count", "mean_hits", "p50_ms", "p95_ms", "p99_ms"))
+    print(f"\nring p99 {results['ring']['p99_ms']} ms (target < 10 ms)")
+
+    payload = {
+        "config": {
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "reports": fixtures["total_reports"],
+            "k": args.k,
+            "radius_m": args.radius_m,
+        },
+        "results": {"nearby": results},
+    }
+    path = save_results("nearby", payload, args.output)
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("p50_ms", "p99_ms"))
+
+
+if __name__ == "__main__":
+    main()
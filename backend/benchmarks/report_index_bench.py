@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Open report index benchmark: list queries ranked in memory vs in SQL.
+
+Seeds the bulk report set, loads the in-memory index of open reports and
+runs --queries random list queries (bbox, status and priority filters,
+with and without paging) through
+
+  - index_search: the index alone (vectorized masks + argpartition top-K)
+  - index_list:   crud.get_report_rows with the index (search + page rows by primary key)
+  - db_list:      crud.get_report_rows without it (the indexed SQL query)
+
+and reports the index's memory per open report. Every query must return
+the same ranking from both list paths, before and after a batch of
+creates, claims, resolutions and verifications folded in from the event
+stream.
+
+    python benchmarks/report_index_bench.py --reports 1000000 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from common import compare_results, print_table, save_results, summarize
+
+import api_bench
+
+STATUSES = ("open", "open", "verified", "created", "in_progress")
+
+
+def random_query(rng: random.Random) -> dict:
+    query = {"status": rng.choice(STATUSES), "skip": 0, "limit": rng.choice((20, 50, 100))}
+    if rng.random() < 0.8:
+        query["bbox"] = api_bench.random_bbox(rng)
+    if rng.random() < 0.3:
+        query["priority_min"] = rng.choice((50, 70, 90))
+    if rng.random() < 0.2:
+        query["skip"] = rng.choice((20, 100, 400))
+    return query
+
+
+def time_queries(fn: Callable[[dict], object], queries: List[dict]) -> dict:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings, sum(timings))
+
+
+def mutate(count: int, rng: random.Random) -> None:
+    """Create, claim, resolve and re-prioritize ``count`` reports each."""
+    from app import crud, models, schemas
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).first()
+        for index in range(count):
+            lat, lng = api_bench.random_bbox(rng).split(",")[1::2]
+            crud.create_report(db, schemas.ReportCreate(
+                title=f"Index check {index}", description="Water main break", lat=float(lat), lng=float(lng)
+            ), None)
+        open_ids = [
+            report_id for (report_id,) in db.query(models.Report.id)
+            .filter(models.UNRESOLVED_REPORTS, models.Report.assigned_to_id.is_(None)).limit(3 * count)
+        ]
+        for report_id in open_ids[:count]:
+            crud.update_report(db, report_id, schemas.ReportUpdate(status="verified", priority_score=rng.randint(0, 100)))
+        for report_id in open_ids[count:]:
+            crud.claim_report(db, report_id, user.id, "On it")
+        for report_id in open_ids[2 * count:]:
+            crud.resolve_report(db, report_id, user.id, "Fixed")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory open report index")
+    parser.add_argument("--reports", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--mutations", type=int, default=200)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="civicsense-index-")
+    os.chdir(workdir)
+    fixtures = api_bench.prepare_database(args, workdir)
+
+    from app import crud, report_index, serialization
+    from app.database import SessionLocal
+
+    index = report_index.open_reports
+    unindexed = report_index.OpenReportIndex()
+    start = time.perf_counter()
+    indexed = index.load()
+    load_seconds = time.perf_counter() - start
+    bytes_per_report = index.nbytes / max(1, indexed)
+
+    rng = random.Random(args.seed)
+    queries = [random_query(rng) for _ in range(args.queries)]
+    db = SessionLocal()
+
+    def rows(query: dict, use_index: bool) -> list:
+        report_index.open_reports = index if use_index else unindexed
+        try:
+            return crud.get_report_rows(db, serialization.REPORT_SUMMARY_COLUMNS, **query)
+        finally:
+            report_index.open_reports = index
+
+    def check(stage: str) -> int:
+        mismatches = 0
+        for query in queries:
+            # Ties on (priority, created_at) may come back in any order
+            expected = [(row[7], row[8]) for row in rows(query, False)]
+            if [(row[7], row[8]) for row in rows(query, True)] != expected:
+                mismatches += 1
+        print(f"{stage}: {mismatches} of {len(queries)} queries differ")
+        return mismatches
+
+    results: Dict[str, dict] = {}
+    try:
+        mismatches = check("loaded")
+        results["index_search"] = time_queries(
+            lambda q: index.search(q.get("bbox"), q["status"], q.get("priority_min"), q["skip"], q["limit"]), queries
+        )
+        results["index_list"] = time_queries(lambda q: rows(q, True), queries)
+        results["db_list"] = time_queries(lambda q: rows(q, False), queries)
+
+        mutate(args.mutations, rng)
+        start = time.perf_counter()
+        changed = index.refresh()
+        refresh_ms = (time.perf_counter() - start) * 1000
+        db.rollback()
+        mismatches += check(f"after {changed} changed reports folded in ({refresh_ms:.1f} ms)")
+    finally:
+        db.close()
+
+    print_table(f"List queries ({indexed} open of {fixtures['total_reports']} reports)",
+                results, ("count", "p50_ms", "p95_ms", "p99_ms"))
+    print(f"\nindex: {index.nbytes / 2**20:.1f} MB, {bytes_per_report:.1f} bytes per open report, "
+          f"loaded in {load_seconds:.2f}s")
+
+    payload = {
+        "config": {
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "reports": fixtures["total_reports"],
+            "open_reports": indexed,
+            "queries": args.queries,
+            "bytes_per_report": round(bytes_per_report, 1),
+            "load_seconds": round(load_seconds, 2),
+            "refresh_ms": round(refresh_ms, 1),
+            "mismatches": mismatches,
+        },
+        "results": {"report_index": results},
+    }
+    path = save_results("report_index", payload, args.output)
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("p50_ms", "p99_ms"))
+    if mismatches:
+        raise SystemExit("Index and database rankings differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Multi-process scaling benchmark.
+
+Runs the production serving profile (gunicorn.conf.py) with 1, 2, 4 ... N
+workers against the same seeded database and reports throughput per
+workload, the speedup over one worker and the parallel efficiency
+(speedup / workers). Client concurrency grows with the worker count so
+every configuration is saturated.
+
+    python benchmarks/scaling_bench.py --max-workers 4
+    python benchmarks/scaling_bench.py --workloads map,login --requests 400 --concurrency-per-worker 8
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from common import BACKEND_DIR, compare_results, print_table, save_results
+
+import api_bench
+
+
+def worker_counts(max_workers: int) -> List[int]:
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    return counts + [max_workers]
+
+
+async def run_with_workers(args, fixtures, workdir: str, workers: int) -> Dict[str, dict]:
+    import httpx
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=BACKEND_DIR,
+        PORT=str(args.port),
+        WEB_CONCURRENCY=str(workers),
+        CPU_POOL_WORKERS=str(args.cpu_pool_workers),
+        AUTO_CREATE_SCHEMA="false",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"),
+         "--bind", f"127.0.0.1:{args.port}", "--log-level", os.getenv("BENCH_LOG_LEVEL", "warning")],
+        cwd=workdir, env=env,
+    )
+    concurrency = args.concurrency_per_worker * workers
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60, limits=limits) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("gunicorn did not start")
+                await asyncio.sleep(0.2)
+            # Requests scale with workers so each configuration runs for a similar time
+            suite_args = argparse.Namespace(
+                workloads=args.workloads, requests=args.requests * workers,
+                concurrency=concurrency, seed=args.seed,
+            )
+            return await api_bench.run_suite(client, suite_args, fixtures)
+    finally:
+        # SIGTERM: gunicorn drains in-flight requests and runs each worker's lifespan shutdown
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API throughput scaling across worker processes")
+    parser.add_argument("--max-workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--workloads", default="map,detail,login")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per workload per worker")
+    parser.add_argument("--concurrency-per-worker", type=int, default=8)
+    parser.add_argument("--cpu-pool-workers", type=int, default=1, help="CPU pool processes per worker")
+    parser.add_argument("--reports", type=int, default=10000)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="civicsense-scaling-")
+    os.chdir(workdir)
+    fixtures = api_bench.prepare_database(args, workdir)
+
+    by_workers: Dict[int, Dict[str, dict]] = {}
+    for workers in worker_counts(args.max_workers):
+        by_workers[workers] = asyncio.run(run_with_workers(args, fixtures, workdir, workers))
+        print(f"{workers} worker(s): " + ", ".join(
+            f"{name} {summary['throughput_per_s']}/s" for name, summary in by_workers[workers].items()
+        ))
+
+    results: Dict[str, Dict[str, dict]] = {}
+    for name in by_workers[1]:
+        base = by_workers[1][name]["throughput_per_s"] or 1.0
+        results[name] = {}
+        for workers, summaries in by_workers.items():
+            summary = summaries[name]
+            speedup = summary["throughput_per_s"] / base
+            results[name][f"{workers}_workers"] = {
+                **summary,
+                "speedup": round(speedup, 2),
+                "efficiency": round(speedup / workers, 2),
+            }
+
+    for name, rows in results.items():
+        print_table(f"{name} scaling (cpu count {multiprocessing.cpu_count()})", rows,
+                    ("throughput_per_s", "speedup", "efficiency", "p95_ms", "errors"))
+
+    payload = {
+        "config": {
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "reports": fixtures["total_reports"],
+            "max_workers": args.max_workers,
+            "cpu_pool_workers": args.cpu_pool_workers,
+            "requests_per_worker": args.requests,
+            "concurrency_per_worker": args.concurrency_per_worker,
+            "cpu_count": multiprocessing.cpu_count(),
+        },
+        "results": results,
+    }
+    path = save_results("scaling", payload, args.output)
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("throughput_per_s", "speedup"))
+
+
+if __name__ == "__main__":
+    main()
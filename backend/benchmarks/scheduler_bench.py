@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Job scheduler benchmark: shared jobs across several worker processes.
+
+Starts --workers processes that each run a scheduler over the same
+database with --jobs shared jobs (every --interval seconds, each run
+sleeping --work seconds), for --seconds. Every run is recorded with the
+worker that ran it. Once with leases (``leased``, as in production) and
+once without (``unleased``, every worker runs every job, like the
+per-process loops before the scheduler), it reports
+
+  - runs: job runs in total and per job
+  - duplicates: runs that overlapped another run of the same job
+  - busiest_share: the busiest worker's share of all runs
+  - gap: time from the end of a job's run to the start of its next one
+
+With leases there must be no duplicates.
+
+    python benchmarks/scheduler_bench.py --workers 4 --jobs 8 --seconds 20
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from common import compare_results, print_table, save_results, summarize
+
+Run = Tuple[str, str, float, float]  # job, worker, start, end (wall clock)
+
+
+def run_worker(index: int, args, leased: bool, runs: "multiprocessing.Queue") -> None:
+    from app import scheduler
+
+    recorded: List[Run] = []
+    owner = f"worker-{index}"
+
+    def job(name: str):
+        def run() -> None:
+            start = time.time()
+            time.sleep(args.work)
+            recorded.append((name, owner, start, time.time()))
+        return run
+
+    async def main() -> None:
+        jobs = scheduler.Scheduler(owner=owner, jitter=args.jitter, lease_seconds=args.lease_seconds)
+        for number in range(args.jobs):
+            name = f"job-{number}"
+            jobs.add(name, args.interval, job(name), leased=leased)
+        jobs.start()
+        await asyncio.sleep(args.seconds)
+        await jobs.stop()
+
+    asyncio.run(main())
+    runs.put(recorded)
+
+
+def run_mode(args, leased: bool) -> List[Run]:
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        db.query(models.JobLease).delete()
+        db.commit()
+    finally:
+        db.close()
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    workers = [context.Process(target=run_worker, args=(index, args, leased, queue)) for index in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    runs = [run for _ in workers for run in queue.get()]
+    for worker in workers:
+        worker.join()
+    return runs
+
+
+def analyze(runs: List[Run]) -> Dict[str, float]:
+    by_job: Dict[str, List[Run]] = defaultdict(list)
+    for run in runs:
+        by_job[run[0]].append(run)
+    duplicates = 0
+    gaps = []
+    for job_runs in by_job.values():
+        job_runs.sort(key=lambda run: run[2])
+        for previous, current in zip(job_runs, job_runs[1:]):
+            if current[2] < previous[3]:
+                duplicates += 1
+            else:
+                gaps.append(current[2] - previous[3])
+    per_worker = Counter(run[1] for run in runs)
+    return {
+        "runs": len(runs),
+        "runs_per_job": round(len(runs) / max(1, len(by_job)), 1),
+        "duplicates": duplicates,
+        "workers_used": len(per_worker),
+        "busiest_share": round(max(per_worker.values(), default=0) / max(1, len(runs)), 3),
+        "gap": summarize(gaps, sum(gaps)) if gaps else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark leased background jobs across worker processes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--work", type=float, default=0.1, help="Seconds each job run takes")
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--lease-seconds", type=float, default=5.0)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="civicsense-scheduler-")
+    os.chdir(workdir)
+    # Inherited by the spawned workers
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app.database import engine
+    from app.models import Base
+
+    Base.metadata.create_all(bind=engine)
+
+    results: Dict[str, dict] = {}
+    gaps: Dict[str, dict] = {}
+    for mode in ("unleased", "leased"):
+        results[mode] = analyze(run_mode(args, leased=mode == "leased"))
+        gap = results[mode].pop("gap")
+        if gap:
+            gaps[f"{mode}_gap_between_runs"] = gap
+
+    print_table(f"{args.jobs} jobs every {args.interval}s on {args.workers} workers for {args.seconds}s",
+                results, ("runs", "runs_per_job", "duplicates", "workers_used", "busiest_share"))
+    print_table("Gap between consecutive runs of a job", gaps, ("count", "p50_ms", "p95_ms", "p99_ms"))
+
+    payload = {
+        "config": {
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "workers": args.workers,
+            "jobs": args.jobs,
+            "interval": args.interval,
+            "work": args.work,
+            "seconds": args.seconds,
+            "jitter": args.jitter,
+        },
+        "results": {"scheduler": {**results, **gaps}},
+    }
+    path = save_results("scheduler", payload, args.output)
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("p50_ms", "p95_ms"))
+    if results["leased"]["duplicates"]:
+        raise SystemExit("Leased jobs ran concurrently on more than one worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Serialization CPU benchmark for report list and detail responses.
+
+Compares the previous path (one schemas.ReportSummary per row wrapped in
+PaginatedResponse, then validated and encoded again by FastAPI's
+response_model handling) with the column-tuple + orjson path in
+app/serialization.py. Reports CPU time per 100-row page and per detail
+response; no database is involved.
+
+    python benchmarks/serialization_bench.py --iterations 2000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import compare_results, print_table, save_results, summarize
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import schemas, serialization
+
+
+def make_summary_rows(count: int, rng: random.Random):
+    now = datetime.utcnow()
+    rows = []
+    for _ in range(count):
+        lat, lng = 40.7 + rng.uniform(-0.1, 0.1), -74.0 + rng.uniform(-0.1, 0.1)
+        rows.append((
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "Pothole on Main Street",
+            lat, lng, round(lat, 4), round(lng, 4),
+            "verified", rng.randint(0, 100),
+            now - timedelta(seconds=rng.randint(0, 10 ** 6)),
+        ))
+    return rows
+
+
+def make_detail_row(rng: random.Random):
+    now = datetime.utcnow()
+    return (
+        str(uuid.uuid4()), "Flooding near River Park", "Water overflowing onto sidewalks " * 10,
+        40.7589, -73.9851, 12.5, 40.7589, -73.9851, "verified", 75, "high", 0.85, ["flood"],
+        False, None, True, None, None, now, now, None,
+    )
+
+
+async def legacy_list_page(rows, field):
+    summaries = [
+        schemas.ReportSummary(
+            id=r[0], title=r[1], lat=r[4] or r[2], lng=r[5] or r[3],
+            status=r[6], priority_score=r[7], created_at=r[8],
+        )
+        for r in rows
+    ]
+    response = schemas.PaginatedResponse(data=summaries, meta={"page": 1, "per_page": len(rows), "total": len(rows)})
+    content = await serialize_response(field=field, response_content=response, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+def fast_list_page(rows):
+    content = {
+        "data": serialization.summary_rows_to_dicts(rows),
+        "meta": {"page": 1, "per_page": len(rows), "total": len(rows)},
+    }
+    return serialization.FastJSONResponse(content).body
+
+
+async def legacy_detail(row, field):
+    data = dict(zip(serialization.REPORT_DETAIL_FIELDS, row))
+    report = schemas.Report(**data, media_urls=["/uploads/a.jpg"])
+    content = await serialize_response(field=field, response_content=report, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+def fast_detail(row):
+    return serialization.FastJSONResponse(serialization.detail_row_to_dict(row, ["/uploads/a.jpg"])).body
+
+
+def measure(fn, iterations: int):
+    """Per-call CPU seconds for ``fn`` over ``iterations`` runs."""
+    timings = []
+    for _ in range(iterations):
+        start = time.process_time()
+        fn()
+        timings.append(time.process_time() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report response serialization")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = make_summary_rows(args.page_size, rng)
+    detail_row = make_detail_row(rng)
+    list_field = create_response_field(name="response", type_=schemas.PaginatedResponse)
+    detail_field = create_response_field(name="response", type_=schemas.Report)
+
+    loop = asyncio.new_event_loop()
+    # Both paths must produce the same JSON document
+    legacy_body = loop.run_until_complete(legacy_list_page(rows, list_field))
+    assert json.loads(legacy_body) == json.loads(fast_list_page(rows)), "list payloads differ"
+    legacy_body = loop.run_until_complete(legacy_detail(detail_row, detail_field))
+    assert json.loads(legacy_body) == json.loads(fast_detail(detail_row)), "detail payloads differ"
+
+    cases = {
+        "list_legacy": lambda: loop.run_until_complete(legacy_list_page(rows, list_field)),
+        "list_fast": lambda: fast_list_page(rows),
+        "detail_legacy": lambda: loop.run_until_complete(legacy_detail(detail_row, detail_field)),
+        "detail_fast": lambda: fast_detail(detail_row),
+    }
+    results = {}
+    for name, fn in cases.items():
+        measure(fn, min(50, args.iterations))  # warm up
+        timings = measure(fn, args.iterations)
+        results[name] = summarize(timings, sum(timings))
+    loop.close()
+
+    print_table(
+        f"CPU per response ({args.page_size}-row pages, {args.iterations} iterations)",
+        results, ("mean_ms", "p50_ms", "p95_ms", "throughput_per_s"),
+    )
+    speedup = results["list_legacy"]["mean_ms"] / max(results["list_fast"]["mean_ms"], 1e-9)
+    print(f"\nList page speedup: {speedup:.1f}x")
+
+    payload = {"config": vars(args), "results": {"serialization": results}}
+    path = save_results("serialization", payload, args.output)
+    print(f"Saved results to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("mean_ms", "p95_ms"))
+
+
+if __name__ == "__main__":
+    main()
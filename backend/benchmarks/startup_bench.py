@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the API worker.
+
+Starts fresh interpreters that import ``app.main`` under ``python -X
+importtime`` and then run the app's lifespan startup, and reports the
+median import and ready times plus the slowest modules. Fails (exit 1)
+when an integration that should load lazily shows up at startup or when
+``--budget-ms`` is exceeded, so it can run as a regression check:
+
+    python benchmarks/startup_bench.py --runs 5
+    python benchmarks/startup_bench.py --budget-ms 1500 --compare results/startup-abc123-1700000000.json
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+from common import BACKEND_DIR, compare_results, save_results
+
+# Modules the API must not import until a request (or configuration) needs them
+LAZY_MODULES = ("sentry_sdk", "passlib", "jose", "httpx", "PIL", "slowapi")
+
+STARTUP_SNIPPET = """
+import asyncio, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def startup():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        pass
+
+asyncio.run(startup())
+print(f"{(imported - start) * 1000:.3f} {(time.perf_counter() - start) * 1000:.3f}")
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every line of ``-X importtime`` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def run_once(env: Dict[str, str]) -> Dict[str, object]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SNIPPET],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    import_ms, ready_ms = (float(value) for value in proc.stdout.split()[-2:])
+    return {"import_ms": import_ms, "ready_ms": ready_ms, "modules": parse_importtime(proc.stderr)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API import and startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules (self time) to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if the median import time exceeds this")
+    parser.add_argument("--rate-limit", action="store_true", help="Start with rate limiting enabled (imports slowapi)")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {k: v for k, v in os.environ.items() if k != "SENTRY_DSN"}
+        env.update(
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+            AUTO_CREATE_SCHEMA="false",
+            RATE_LIMIT_ENABLED="true" if args.rate_limit else "false",
+        )
+        run_once(env)  # populate the bytecode cache so every timed run is equally warm
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    lazy = [name for name in LAZY_MODULES if not (name == "slowapi" and args.rate_limit)]
+    imported = sorted({module for module, _, _ in runs[-1]["modules"]})
+    eager = [name for name in lazy if name in imported]
+
+    # Median self time per module across runs
+    self_times: Dict[str, List[int]] = {}
+    for run in runs:
+        for module, self_us, _ in run["modules"]:
+            self_times.setdefault(module, []).append(self_us)
+    slowest = sorted(((statistics.median(v) / 1000, m) for m, v in self_times.items()), reverse=True)[: args.top]
+
+    summary = {
+        "import_ms": round(statistics.median(run["import_ms"] for run in runs), 2),
+        "ready_ms": round(statistics.median(run["ready_ms"] for run in runs), 2),
+        "modules": len(imported),
+    }
+    print(f"import {summary['import_ms']} ms, ready {summary['ready_ms']} ms, {summary['modules']} modules "
+          f"(median of {args.runs})")
+    print("\nSlowest modules (self time):")
+    for ms, module in slowest:
+        print(f"  {ms:8.2f} ms  {module}")
+
+    payload = {
+        "config": {"runs": args.runs, "rate_limit": args.rate_limit},
+        "results": {"startup": {"api": summary}},
+        "slowest_modules": [{"module": m, "self_ms": round(ms, 3)} for ms, m in slowest],
+        "eager_lazy_modules": eager,
+    }
+    path = save_results("startup", payload, args.output)
+    print(f"\nResults written to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("import_ms", "ready_ms"))
+
+    failed = False
+    if eager:
+        print(f"\nFAIL: imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and summary["import_ms"] > args.budget_ms:
+        print(f"\nFAIL: import took {summary['import_ms']} ms, budget is {args.budget_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Offline sync benchmark: one ``POST /sync`` vs one request per queued action.
+
+Seeds the bulk report set, then replays field sessions: a volunteer comes
+back online with ``--actions`` queued actions (a claim and a resolution per
+report) and flushes them either one endpoint call at a time (``individual``)
+or as a single sync batch (``sync``). Requests run in-process over ASGI;
+``--rtt-ms`` adds a simulated mobile round trip to each request, which is
+what the batching saves in the field. Every action must succeed either way.
+
+    python benchmarks/sync_bench.py --reports 50000 --sessions 50 --actions 20
+    python benchmarks/sync_bench.py --rtt-ms 0      # server cost only
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from common import compare_results, print_table, save_results, summarize
+
+import api_bench
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark batched offline sync")
+    parser.add_argument("--reports", type=int, default=50000)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--actions", type=int, default=20, help="Queued actions per session (claim + resolve per report)")
+    parser.add_argument("--rtt-ms", type=float, default=150.0, help="Simulated network round trip per request")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    return parser.parse_args()
+
+
+def unassigned_reports(count: int) -> List[str]:
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(models.Report.id)
+            .filter(models.Report.assigned_to_id.is_(None), models.UNRESOLVED_REPORTS)
+            .order_by(models.Report.id)
+            .limit(count)
+        )
+        return [report_id for (report_id,) in rows]
+    finally:
+        db.close()
+
+
+async def run(args, report_ids: List[str]) -> Dict[str, dict]:
+    import httpx
+    from app.main import app
+
+    per_session = max(1, args.actions // 2)
+    rtt = args.rtt_ms / 1000
+
+    async def request(client, method, url, **kwargs):
+        await asyncio.sleep(rtt)
+        response = await client.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def individual(client, headers, batch):
+        for report_id in batch:
+            await request(client, "POST", f"/api/v1/reports/{report_id}/claim", headers=headers)
+            await request(client, "POST", f"/api/v1/reports/{report_id}/resolve",
+                          data={"resolution_notes": "Fixed on site"}, headers=headers)
+        return 2 * len(batch)
+
+    async def batched(client, headers, batch):
+        operations = []
+        for report_id in batch:
+            operations.append({"id": f"{report_id}:claim", "op": "claim", "report_id": report_id})
+            operations.append({"id": f"{report_id}:resolve", "op": "resolve", "report_id": report_id,
+                               "resolution_notes": "Fixed on site"})
+        response = await request(client, "POST", "/api/v1/sync/", json={"token": token, "operations": operations},
+                                 headers=headers)
+        results = response.json()["data"]["results"]
+        assert all(result["status"] == "applied" for result in results), results
+        return len(operations)
+
+    results: Dict[str, dict] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        response = await client.post("/api/v1/auth/login",
+                                     data={"username": api_bench.BENCH_EMAIL, "password": api_bench.BENCH_PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        token = (await client.post("/api/v1/sync/", json={}, headers=headers)).json()["data"]["token"]
+
+        remaining = iter(report_ids)
+        for name, flush in (("individual", individual), ("sync", batched)):
+            timings, actions, requests = [], 0, 0
+            for _ in range(args.sessions):
+                batch = [next(remaining) for _ in range(per_session)]
+                start = time.perf_counter()
+                actions += await flush(client, headers, batch)
+                timings.append(time.perf_counter() - start)
+                requests += 2 * len(batch) if flush is individual else 1
+            results[name] = {
+                **summarize(timings, sum(timings)),
+                "actions": actions,
+                "requests": requests,
+                "actions_per_s": round(actions / sum(timings), 1),
+            }
+    return results
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="civicsense-sync-")
+    # Uploads are written relative to the working directory
+    os.chdir(workdir)
+    fixtures = api_bench.prepare_database(args, workdir)
+
+    needed = 2 * args.sessions * max(1, args.actions // 2)
+    report_ids = unassigned_reports(needed)
+    if len(report_ids) < needed:
+        raise SystemExit(f"Need {needed} unassigned reports, found {len(report_ids)}; seed more with --reports")
+    results = asyncio.run(run(args, report_ids))
+
+    print_table(f"Flushing {args.actions} queued actions, rtt {args.rtt_ms:.0f} ms ({fixtures['total_reports']} reports)",
+                results, ("count", "requests", "p50_ms", "p95_ms", "p99_ms", "actions_per_s"))
+
+    payload = {
+        "config": {
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "reports": fixtures["total_reports"],
+            "sessions": args.sessions,
+            "actions": args.actions,
+            "rtt_ms": args.rtt_ms,
+        },
+        "results": {"sync": results},
+    }
+    path = save_results("sync", payload, args.output)
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        compare_results(payload, args.compare, metrics=("p50_ms", "p99_ms"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Gunicorn settings for production API serving.
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+The app is imported once in the master (preload_app) and forked into
+WEB_CONCURRENCY Uvicorn workers, which share the imported modules
+copy-on-write. Workers are recycled after MAX_REQUESTS (+ jitter, so they
+don't all restart at once) and get GRACEFUL_TIMEOUT seconds on shutdown to
+finish in-flight requests and run the app's lifespan teardown.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+max_requests = int(os.getenv("MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", str(max_requests // 10)))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# Longer than typical load balancer idle timeouts so the proxy, not us, closes idle connections
+keepalive = int(os.getenv("KEEPALIVE_SECONDS", "65"))
+accesslog = os.getenv("ACCESS_LOG")  # unset keeps access logging off
+
+# Each worker gets its own CPU pool (bcrypt, upload hashing); split the cores
+os.environ.setdefault("CPU_POOL_WORKERS", str(max(1, multiprocessing.cpu_count() // workers)))
+
+
+def when_ready(server):
+    # Everything imported by preload is long-lived; keep the GC from touching
+    # (and so un-sharing) those pages in the workers
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app.sharding import shard_router
+
+    # Never reuse connections the master may have opened before forking
+    for shard in shard_router.shards:
+        shard.engine.dispose(close=False)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Archive resolved reports now.
+
+Moves every report resolved more than --days ago (ARCHIVE_AFTER_DAYS by
+default) out of the hot tables in every shard, and prints how many rows
+the hot tables hold before and after. The API runs the same pass every
+ARCHIVE_INTERVAL_SECONDS; set that to 0 to schedule this script instead.
+
+    python scripts/archive_reports.py --days 90
+    python scripts/archive_reports.py --days 30 --dry-run
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import archive, models
+from app.sharding import shard_router
+
+HOT_TABLES = (models.Report, models.MediaFile, models.Activity)
+
+def hot_rows(db) -> str:
+    return ", ".join(f"{table.__tablename__}={db.query(table).count()}" for table in HOT_TABLES)
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old resolved reports into the archive")
+    parser.add_argument("--days", type=float, default=archive.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=archive.ARCHIVE_BATCH)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the reports that would move")
+    args = parser.parse_args()
+
+    cutoff = datetime.utcnow() - timedelta(days=args.days)
+    for shard in shard_router.shards:
+        with shard_router.session(shard) as db:
+            print(f"[{shard.name}] before: {hot_rows(db)}")
+            if args.dry_run:
+                due = (
+                    db.query(models.Report)
+                    .filter(models.Report.status == "resolved", models.Report.resolved_at < cutoff)
+                    .count()
+                )
+                print(f"[{shard.name}] {due} reports resolved before {cutoff:%Y-%m-%d} would be archived")
+                continue
+            start = time.perf_counter()
+            moved = archive.archive(db, days=args.days, batch_size=args.batch_size)
+            print(f"[{shard.name}] archived {moved} reports in {time.perf_counter() - start:.1f}s")
+            print(f"[{shard.name}] after: {hot_rows(db)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Query plan regression guard for the report and auth endpoints.
+
+Builds a database through the Alembic migrations, bulk-seeds it, then
+drives every endpoint in api/endpoints/reports.py and auth.py in-process
+while ``query_log.capture()`` records each statement they issue, with its
+route and timing. Every captured SELECT, UPDATE and DELETE is EXPLAINed
+with its own bound parameters. The check exits non-zero if any of them
+reads a table of at least --min-rows rows with a full sequential scan, or
+if its fastest run took longer than its time budget.
+
+Unlike check_query_plans.py, which explains the list queries as crud builds
+them, this sees exactly what the endpoints send: lookups, counts, event
+appends and the statements behind authentication.
+
+    python scripts/check_endpoint_queries.py                       # 100k reports, temporary SQLite DB
+    python scripts/check_endpoint_queries.py --reports 20000 --verbose
+    DATABASE_URL=postgresql://... python scripts/check_endpoint_queries.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+ADMIN_EMAIL = "plans-admin@civicsense.local"
+VOLUNTEER_EMAIL = "plans-volunteer@civicsense.local"
+PASSWORD = "plans-password"
+BBOX = "-74.05,40.70,-74.00,40.75"
+
+# Time budget per statement, by route; DEFAULT_BUDGET_MS covers the rest
+BUDGETS_MS = {
+    "POST /api/v1/auth/login": 50,
+    "GET /api/v1/reports/search": 100,
+}
+
+EXPLAINED = ("select", "update", "delete", "with")
+
+
+def drive_endpoints(client, report_ids: List[str], repeat: int) -> None:
+    """Call every report and auth endpoint ``repeat`` times; any server error aborts the check."""
+    def call(method, url, expected=(200,), **kwargs):
+        response = client.request(method, url, **kwargs)
+        if response.status_code not in expected:
+            raise SystemExit(f"{method} {url} returned {response.status_code}: {response.text[:200]}")
+        return response
+
+    def login(email):
+        token = call("POST", "/api/v1/auth/login", data={"username": email, "password": PASSWORD}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    admin, volunteer = login(ADMIN_EMAIL), login(VOLUNTEER_EMAIL)
+    targets = iter(report_ids)
+    for run in range(repeat):
+        call("POST", "/api/v1/auth/register",
+             json={"email": f"plans-{uuid.uuid4().hex[:12]}@civicsense.local", "name": "Plans", "password": PASSWORD, "role": "citizen"})
+        login(VOLUNTEER_EMAIL)
+        call("GET", "/api/v1/auth/me", headers=volunteer)
+        call("GET", "/api/v1/auth/users", headers=admin)
+
+        for params in ({}, {"status": "verified"}, {"status": "open"}, {"priority_min": 80},
+                       {"bbox": BBOX}, {"bbox": BBOX, "status": "verified"}, {"page": 20}):
+            call("GET", "/api/v1/reports/", params=params)
+        call("GET", "/api/v1/reports/search", params={"q": "pothole"})
+        call("GET", "/api/v1/reports/search", params={"q": "streetlight", "bbox": BBOX})
+        call("GET", "/api/v1/reports/nearby", params={"lat": 40.72, "lng": -74.02, "status": "open"})
+
+        created = call("POST", "/api/v1/reports/", headers=volunteer,
+                       data={"title": "Plan check pothole", "description": "Deep pothole", "lat": "40.72",
+                             "lng": "-74.02", "anonymous": "false"},
+                       files={"media": ("pothole.jpg", f"plans-{run}".encode(), "image/jpeg")}).json()["data"]["id"]
+        report_id = next(targets)
+        call("GET", f"/api/v1/reports/{report_id}")
+        call("POST", f"/api/v1/reports/{report_id}/message", expected=(200, 400))
+        call("POST", f"/api/v1/reports/{report_id}/claim", headers=volunteer)
+        call("POST", f"/api/v1/reports/{report_id}/resolve", headers=volunteer,
+             data={"resolution_notes": "Fixed during plan check"})
+        call("POST", f"/api/v1/reports/{report_id}/confirm", headers=volunteer)
+        call("GET", f"/api/v1/reports/{created}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the queries issued by the report and auth endpoints")
+    parser.add_argument("--reports", type=int, default=100_000, help="Reports to seed into an empty DB")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per endpoint; budgets apply to the fastest")
+    parser.add_argument("--budget-ms", type=float, default=25.0, help="DEFAULT_BUDGET_MS for routes not in BUDGETS_MS")
+    parser.add_argument("--min-rows", type=int, default=1000, help="Full scans of smaller tables are allowed")
+    parser.add_argument("--verbose", action="store_true", help="Print every statement and its plan")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="civicsense-plans-")
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'plans.db')}"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["AUTO_CREATE_SCHEMA"] = "false"
+    # Every request must reach the database for its statements to be timed
+    os.environ["LIST_CACHE_SIZE"] = "0"
+    # Uploads are written relative to the working directory
+    os.chdir(workdir)
+
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select, text
+    from app import events, models, query_log, query_plans, search
+    from app.database import SessionLocal, engine
+    from app.main import app
+    from scripts.seed_demo import ensure_user, seed_bulk_reports
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    command.upgrade(config, "head")
+
+    db = SessionLocal()
+    try:
+        if db.query(models.Report.id).first() is None:
+            seed_bulk_reports(db, args.reports)
+            search.rebuild(db)
+            events.baseline(db)
+        ensure_user(db, ADMIN_EMAIL, PASSWORD, "Plan Check Admin", role="admin")
+        ensure_user(db, VOLUNTEER_EMAIL, PASSWORD, "Plan Check Volunteer", role="volunteer")
+        # Planners only pick selective indexes with fresh statistics
+        db.execute(text("ANALYZE"))
+        db.commit()
+        report_ids = [
+            report_id for (report_id,) in db.query(models.Report.id)
+            .filter(models.Report.assigned_to_id.is_(None), models.UNRESOLVED_REPORTS)
+            .order_by(models.Report.id).limit(args.repeat)
+        ]
+    finally:
+        db.close()
+
+    with query_log.capture() as captured, TestClient(app) as client:
+        drive_endpoints(client, report_ids, args.repeat)
+
+    # Fastest run of each distinct statement per route, with the parameters it ran with
+    statements: Dict[Tuple[str, str], query_log.CapturedQuery] = {}
+    for query in captured:
+        # Scheduled jobs (index loads, cache warming, leases) are not the endpoints' statements
+        if query.route == "background" or query.executemany \
+                or not query.statement.lstrip().lower().startswith(EXPLAINED):
+            continue
+        key = (query.route, query.statement)
+        if key not in statements or query.seconds < statements[key].seconds:
+            statements[key] = query
+
+    failures = []
+    with engine.connect() as conn:
+        rows = {
+            table.name: conn.execute(select(func.count()).select_from(table)).scalar()
+            for table in models.Base.metadata.sorted_tables
+        }
+        large = [name for name, count in rows.items() if count >= args.min_rows]
+        for (route, statement), query in sorted(statements.items()):
+            plan = query_plans.explain(conn, statement, query.parameters)
+            scanned = query_plans.full_scans(plan, engine.dialect.name, tables=large)
+            elapsed_ms = query.seconds * 1000
+            budget_ms = BUDGETS_MS.get(route, args.budget_ms)
+            problems = [f"full scan of {', '.join(scanned)}"] if scanned else []
+            if elapsed_ms > budget_ms:
+                problems.append(f"{elapsed_ms:.1f} ms over its {budget_ms:.0f} ms budget")
+            if problems or args.verbose:
+                print(f"{route} ({elapsed_ms:.1f} ms): {query_log.compact_sql(statement, 300)}")
+                for line in plan:
+                    print(f"    {line}")
+            if problems:
+                failures.append(f"{route}: {'; '.join(problems)}")
+        conn.rollback()
+
+    routes = {route for route, _ in statements}
+    if failures:
+        print("\n".join(failures))
+        sys.exit(1)
+    print(f"All {len(statements)} statements from {len(routes)} routes use indexes and meet their budgets "
+          f"({engine.dialect.name}, {rows['reports']} reports)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the ML inference service with injectable latency and errors.
+
+Serves the same endpoints as ml/inference_server.py so the backend's ML
+client (pooling, hedging, circuit breaker, queued verification) can be
+exercised without the real models:
+
+    python scripts/ml_stub_server.py --port 8001 --delay-ms 50 --slow-rate 0.05 --error-rate 0.1
+    ML_SERVICE_URL=http://localhost:8001 uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+app = FastAPI(title="CivicSense ML stub")
+settings = {"delay_ms": 0.0, "slow_rate": 0.0, "slow_ms": 1000.0, "error_rate": 0.0}
+
+
+async def _simulate() -> None:
+    delay = settings["delay_ms"]
+    if random.random() < settings["slow_rate"]:
+        delay = settings["slow_ms"]
+    if delay:
+        await asyncio.sleep(delay / 1000)
+    if random.random() < settings["error_rate"]:
+        raise HTTPException(status_code=503, detail="Injected failure")
+
+
+@app.post("/internal/ml/image_infer")
+async def image_infer(image_url: str):
+    await _simulate()
+    return {"labels": [{"label": "flood", "confidence": 0.85}], "veracity_score": 0.85}
+
+
+@app.post("/internal/ml/image_infer_frame")
+async def image_infer_frame(width: int, height: int):
+    await _simulate()
+    return {"labels": [{"label": "flood", "confidence": 0.85}], "veracity_score": 0.85}
+
+
+@app.post("/internal/ml/text_infer")
+async def text_infer(text: str):
+    await _simulate()
+    return {"labels": [{"label": "pothole", "confidence": 0.72}], "veracity_score": 0.72}
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake ML service")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Latency added to every call")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of calls that take --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=1000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls that return 503")
+    args = parser.parse_args()
+    settings.update(delay_ms=args.delay_ms, slow_rate=args.slow_rate, slow_ms=args.slow_ms, error_rate=args.error_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Rebuild the dashboard statistics tables from scratch.
+
+The counters are normally maintained incrementally by the crud mutators;
+run this after a bulk import, a restore, or if they are ever suspected to
+have drifted from the reports table.
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import stats
+from app.sharding import shard_router
+
+def main():
+    # Counters are per shard, next to the reports they count
+    for shard in shard_router.shards:
+        with shard_router.session(shard) as db:
+            start = time.perf_counter()
+            seen = stats.rebuild(db)
+            print(f"[{shard.name}] Rebuilt stats from {seen} reports in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
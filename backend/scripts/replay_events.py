@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Rebuild report rows from the event stream (snapshots + remaining events).
+
+By default this only checks: every report is folded from its events and
+compared with its row in the reports table, and mismatches are listed.
+--write upserts the folded rows and then rebuilds the derived stats and
+search tables. --snapshot folds new events into snapshots first and
+--compact-days N then drops events older than N days that snapshots cover.
+
+    python scripts/replay_events.py
+    python scripts/replay_events.py --write
+    python scripts/replay_events.py --snapshot --compact-days 90
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import events, search, stats
+from app.sharding import shard_router
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the report event stream")
+    parser.add_argument("--write", action="store_true", help="Upsert the replayed rows into the reports table")
+    parser.add_argument("--no-check", action="store_true", help="Skip comparing replayed rows with the table")
+    parser.add_argument("--snapshot", action="store_true", help="Fold new events into snapshots first")
+    parser.add_argument("--compact-days", type=float, default=0, help="Then delete snapshotted events older than this")
+    parser.add_argument("--batch-size", type=int, default=events.EVENT_BATCH)
+    args = parser.parse_args()
+
+    for shard in shard_router.shards:
+        with shard_router.session(shard) as db:
+            if args.snapshot:
+                start = time.perf_counter()
+                folded = events.take_snapshots(db, batch_size=args.batch_size)
+                print(f"[{shard.name}] Snapshotted {folded} events in {time.perf_counter() - start:.1f}s")
+            if args.compact_days:
+                start = time.perf_counter()
+                deleted = events.compact(db, datetime.utcnow() - timedelta(days=args.compact_days), args.batch_size)
+                print(f"[{shard.name}] Compacted {deleted} events in {time.perf_counter() - start:.1f}s")
+
+            start = time.perf_counter()
+            result = events.replay(db, write=args.write, check=not args.no_check, batch_size=args.batch_size)
+            elapsed = time.perf_counter() - start
+            print(f"[{shard.name}] Replayed {result.events} events into {result.reports} reports in {elapsed:.1f}s "
+                  f"({result.events / max(elapsed, 1e-9):,.0f} events/s)")
+            if result.incomplete:
+                print(f"[{shard.name}] {result.incomplete} reports have no created event or snapshot")
+            if not args.no_check:
+                print(f"[{shard.name}] {result.mismatched} reports differ from their events"
+                      + (f", e.g. {', '.join(result.mismatched_ids[:5])}" if result.mismatched else ""))
+            if args.write:
+                # Counters and the search index are derived from the rows just written
+                stats.rebuild(db)
+                search.rebuild(db)
+                print(f"[{shard.name}] Wrote {result.written} reports and rebuilt stats and search")
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,44 @@
 """
 Demo data seeding script for CivicSense.
 Run this after starting the backend to populate the database with sample data.
+
+Pass --bulk N to insert N synthetic reports through bulk INSERTs instead,
+e.g. for benchmarking: python scripts/seed_demo.py --bulk 100000
 """
 
+import argparse
 import os
+import random
 import sys
+import uuid
+from datetime import datetime, timedelta
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
 from app.models import Base
-from app import crud, schemas
+from app import crud, events, models, schemas, search, stats
+from app.geo import POINT_PRECISION, geohash_encode, region_for
+
+# City centers (lat, lng) that bulk reports are scattered around
+BULK_CITIES = [
+    (40.7128, -74.0060),   # New York
+    (-1.9441, 30.0619),    # Kigali
+    (51.5074, -0.1278),    # London
+    (19.4326, -99.1332),   # Mexico City
+]
+BULK_TITLES = [
+    "Pothole", "Flooded street", "Broken street light", "Illegal dumping",
+    "Traffic signal malfunction", "Fallen tree", "Blocked drain", "Damaged sidewalk",
+]
+BULK_STATUSES = ["created", "verified", "verified", "verified", "in_progress", "resolved"]
 
 def seed_demo_data():
     """Seed the database with demo data."""
     # Create tables
     Base.metadata.create_all(bind=engine)
+    search.ensure_index(engine)
 
     db = SessionLocal()
     try:
@@ -107,5 +130,85 @@ def seed_demo_data():
     finally:
         db.close()
 
+def _bulk_report_row(rng: random.Random, now: datetime) -> dict:
+    """Build one synthetic report row for bulk insertion."""
+    city_lat, city_lng = rng.choice(BULK_CITIES)
+    lat = city_lat + rng.uniform(-0.15, 0.15)
+    lng = city_lng + rng.uniform(-0.15, 0.15)
+    status = rng.choice(BULK_STATUSES)
+    priority_score = rng.randint(0, 100)
+    created_at = now - timedelta(seconds=rng.randint(0, 180 * 24 * 3600))
+    title = rng.choice(BULK_TITLES)
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "title": title,
+        "description": f"{title} reported near {lat:.4f}, {lng:.4f}",
+        "lat": lat,
+        "lng": lng,
+        "accuracy_m": rng.uniform(3, 50),
+        "location_rounded_lat": round(lat, 4),
+        "location_rounded_lng": round(lng, 4),
+        "region": region_for(lat, lng),
+        "geohash": geohash_encode(round(lat, 4), round(lng, 4), POINT_PRECISION),
+        "status": status,
+        "priority_score": priority_score,
+        "priority_level": "high" if priority_score >= 70 else "medium" if priority_score >= 40 else "low",
+        "verification_score": round(rng.uniform(0.5, 1.0), 2),
+        "verification_labels": [title.lower()],
+        "is_duplicate": False,
+        "anonymous": True,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "resolved_at": created_at + timedelta(hours=rng.randint(1, 240)) if status == "resolved" else None,
+    }
+
+def seed_bulk_reports(db: Session, count: int, batch_size: int = 5000, seed: int = 42) -> int:
+    """
+    Insert ``count`` synthetic reports using batched executemany INSERTs.
+
+    The same ``seed`` always produces the same rows, so benchmark runs on
+    different commits see identical data.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    inserted = 0
+    while inserted < count:
+        rows = [_bulk_report_row(rng, now) for _ in range(min(batch_size, count - inserted))]
+        db.execute(insert(models.Report), rows)
+        db.commit()
+        inserted += len(rows)
+    return inserted
+
+def ensure_user(db: Session, email: str, password: str, name: str, role: str = "citizen") -> models.User:
+    """Return the user with ``email``, creating it if needed."""
+    user = crud.get_user_by_email(db, email)
+    if user:
+        return user
+    return crud.create_user(db, schemas.UserCreate(email=email, name=name, password=password, role=role))
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the CivicSense database")
+    parser.add_argument("--bulk", type=int, default=0, help="Insert N synthetic reports via bulk INSERTs")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk INSERT batch")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for bulk data")
+    args = parser.parse_args()
+
+    if not args.bulk:
+        seed_demo_data()
+        return
+
+    Base.metadata.create_all(bind=engine)
+    search.ensure_index(engine)
+    db = SessionLocal()
+    try:
+        inserted = seed_bulk_reports(db, args.bulk, batch_size=args.batch_size, seed=args.seed)
+        print(f"Inserted {inserted} bulk reports")
+        # Bulk INSERTs bypass the incremental stats, search and event maintenance in crud
+        stats.rebuild(db)
+        search.rebuild(db)
+        events.baseline(db)
+    finally:
+        db.close()
+
 if __name__ == "__main__":
-    seed_demo_data()
\ No newline at end of file
+    main()
\ No newline at end of file
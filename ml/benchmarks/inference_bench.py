@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Image inference throughput benchmark: NumPy vs ONNX Runtime fp32 vs int8.
+
+Builds a linear image classifier with fixed random weights, exports it to
+ONNX and quantizes it (see export_onnx.py), then measures images/sec and
+images/sec/core for preprocessing, inference and both together on a fixed
+image set. Without ``--images`` a deterministic set of synthetic JPEGs is
+generated in memory, so runs on different machines see the same inputs.
+
+    python benchmarks/inference_bench.py
+    python benchmarks/inference_bench.py --threads 2 --batch 32 --images ~/photos
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ML_DIR, "benchmarks", "results")
+BACKENDS = ("numpy", "onnx", "onnx-int8")
+
+if ML_DIR not in sys.path:
+    sys.path.insert(0, ML_DIR)
+
+
+def synthetic_images(count: int, width: int = 640, height: int = 480, seed: int = 42):
+    """Deterministic photo-like JPEGs: smooth colour gradients plus noise."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    images = []
+    for _ in range(count):
+        channels = []
+        for _ in range(3):
+            fx, fy, phase = rng.uniform(0.002, 0.02, 2).tolist() + [rng.uniform(0, 6.28)]
+            channels.append(127 + 100 * np.sin(xs * fx + ys * fy + phase))
+        pixels = np.stack(channels, axis=-1) + rng.normal(0, 12, (height, width, 3))
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+
+def load_images(directory: str):
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith((".jpg", ".jpeg", ".png", ".webp")))
+    images = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            images.append(f.read())
+    return images
+
+
+def build_model(model_dir: str, size: int, n_labels: int, seed: int = 7) -> str:
+    """Write a v1 image model (NumPy weights, fp32 ONNX, int8 ONNX) and return its path."""
+    import numpy as np
+    import export_onnx
+
+    path = os.path.join(model_dir, "image", "v1")
+    os.makedirs(path)
+    rng = np.random.default_rng(seed)
+    n_features = size * size * 3
+    np.save(os.path.join(path, "weights.npy"), rng.normal(0, 0.02, (n_features, n_labels)).astype(np.float32))
+    np.save(os.path.join(path, "bias.npy"), rng.normal(0, 0.1, n_labels).astype(np.float32))
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        json.dump({"labels": [f"label_{i}" for i in range(n_labels)], "input": "image", "image_size": size}, f)
+    export_onnx.convert(path)
+    return path
+
+
+def load_backend(backend: str, path: str):
+    import model_registry
+
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if backend == "numpy":
+        return model_registry.LinearModel("image", "v1", path, manifest)
+    return model_registry.OnnxModel("image", "v1", path, manifest, prefer_quantized=backend == "onnx-int8")
+
+
+def timed_rounds(fn, rounds: int) -> float:
+    """Best wall time over ``rounds`` runs (after one warmup run)."""
+    fn()
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def rates(images: int, seconds: float, cores: int) -> dict:
+    per_second = images / seconds
+    return {"images_per_s": round(per_second, 1), "images_per_s_per_core": round(per_second / cores, 1)}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ML_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image inference backends")
+    parser.add_argument("--images", help="Directory of images to use instead of the synthetic set")
+    parser.add_argument("--count", type=int, default=64, help="Synthetic images to generate")
+    parser.add_argument("--size", type=int, default=96, help="Model input side in pixels")
+    parser.add_argument("--labels", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=1, help="Inference threads (counted as cores)")
+    parser.add_argument("--preprocess-threads", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    # Thread settings are read at import time by NumPy's BLAS, ORT and preprocessing
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "ML_INTRA_OP_THREADS"):
+        os.environ[var] = str(args.threads)
+    os.environ["ML_PREPROCESS_THREADS"] = str(args.preprocess_threads)
+
+    import numpy as np
+    import preprocessing
+
+    images = load_images(args.images) if args.images else synthetic_images(args.count)
+    if not images:
+        parser.error(f"No images found in {args.images}")
+    print(f"{len(images)} images, input {args.size}x{args.size}, batch {args.batch}, {args.threads} inference thread(s)")
+
+    results = {"preprocess": {}, "inference": {}, "end_to_end": {}}
+    seconds = timed_rounds(lambda: [preprocessing.image_features(image, args.size) for image in images], args.rounds)
+    results["preprocess"]["sequential"] = rates(len(images), seconds, 1)
+    seconds = timed_rounds(lambda: preprocessing.image_batch_features(images, args.size), args.rounds)
+    results["preprocess"]["pooled"] = rates(len(images), seconds, args.preprocess_threads)
+    features = preprocessing.image_batch_features(images, args.size)
+
+    batches = [features[i:i + args.batch] for i in range(0, len(features), args.batch)]
+    top1 = {}
+    with tempfile.TemporaryDirectory() as model_dir:
+        path = build_model(model_dir, args.size, args.labels)
+        for backend in args.backends.split(","):
+            model = load_backend(backend, path)
+            seconds = timed_rounds(lambda: [model.predict_batch(batch) for batch in batches], args.rounds)
+            results["inference"][backend] = rates(len(images), seconds, args.threads)
+
+            def end_to_end():
+                for start in range(0, len(images), args.batch):
+                    chunk = [preprocessing.image_features(image, args.size) for image in images[start:start + args.batch]]
+                    model.predict_batch(np.stack(chunk))
+
+            seconds = timed_rounds(end_to_end, args.rounds)
+            results["end_to_end"][backend] = rates(len(images), seconds, args.threads)
+            top1[backend] = [predictions[0][0] for batch in batches for predictions in model.predict_batch(batch)]
+
+    reference = top1.get("numpy")
+    agreement = {
+        backend: round(sum(a == b for a, b in zip(labels, reference)) / len(reference), 4)
+        for backend, labels in top1.items() if reference and backend != "numpy"
+    }
+
+    print(f"\n{'stage':<12} {'variant':<12} {'img/s':>10} {'img/s/core':>12}")
+    for stage, variants in results.items():
+        for variant, row in variants.items():
+            print(f"{stage:<12} {variant:<12} {row['images_per_s']:>10} {row['images_per_s_per_core']:>12}")
+    if agreement:
+        print("\nTop-1 agreement with numpy: " + ", ".join(f"{b} {a:.1%}" for b, a in agreement.items()))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    output = os.path.join(args.output_dir, f"inference_{stamp}.json")
+    with open(output, "w") as f:
+        json.dump({
+            "benchmark": "inference",
+            "git_revision": git_revision(),
+            "timestamp": stamp,
+            "config": {k: v for k, v in vars(args).items() if k != "output_dir"} | {"image_count": len(images)},
+            "results": results,
+            "top1_agreement": agreement,
+        }, f, indent=2)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Convert a NumPy model version to ONNX and quantize it to int8.
+
+Writes ``model.onnx`` (MatMul + Add graph producing logits) next to the
+``weights.npy`` / ``bias.npy`` of a model version, then ``model.int8.onnx``
+with dynamically quantized weights, and switches the manifest to the onnx
+backend:
+
+    python export_onnx.py models/image/v2
+    python export_onnx.py models/image/v2 --no-quantize
+
+Building the graph and quantizing need the ``onnx`` package, which the
+server does not. Install it with ``pip install -r requirements-tools.txt``.
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+
+def export_linear(weights: np.ndarray, bias: np.ndarray, path: str) -> None:
+    """Write a logits = features @ weights + bias graph with a dynamic batch dimension."""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    n_features, n_labels = weights.shape
+    graph = helper.make_graph(
+        [
+            helper.make_node("MatMul", ["features", "weights"], ["scores"]),
+            helper.make_node("Add", ["scores", "bias"], ["logits"]),
+        ],
+        "linear_classifier",
+        [helper.make_tensor_value_info("features", TensorProto.FLOAT, ["batch", n_features])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", n_labels])],
+        initializer=[
+            numpy_helper.from_array(np.ascontiguousarray(weights, dtype=np.float32), "weights"),
+            numpy_helper.from_array(np.ascontiguousarray(bias, dtype=np.float32), "bias"),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+
+
+def quantize(source: str, target: str) -> None:
+    """Dynamic int8 quantization of the weights (activations are quantized per batch at run time)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+
+
+def convert(model_path: str, quantize_weights: bool = True) -> None:
+    weights = np.load(os.path.join(model_path, "weights.npy"))
+    bias_path = os.path.join(model_path, "bias.npy")
+    bias = np.load(bias_path) if os.path.exists(bias_path) else np.zeros(weights.shape[1], np.float32)
+
+    onnx_path = os.path.join(model_path, "model.onnx")
+    export_linear(weights, bias, onnx_path)
+    if quantize_weights:
+        quantize(onnx_path, os.path.join(model_path, "model.int8.onnx"))
+
+    manifest_path = os.path.join(model_path, "manifest.json")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest["backend"] = "onnx"
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a NumPy model version to (quantized) ONNX")
+    parser.add_argument("model_path", help="Model version directory, e.g. models/image/v2")
+    parser.add_argument("--no-quantize", action="store_true", help="Only write the fp32 model.onnx")
+    args = parser.parse_args()
+    convert(args.model_path, quantize_weights=not args.no_quantize)
+    print(f"Exported {args.model_path}")
+
+
+if __name__ == "__main__":
+    main()
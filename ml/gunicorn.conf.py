@@ -0,0 +1,31 @@
+"""
+Gunicorn settings for multi-worker ML nodes.
+
+The app is imported once in the master with models loaded and warmed
+(ML_LOAD_ON_IMPORT), then forked; workers share the model objects
+copy-on-write and the memory-mapped weight files through the page cache.
+"""
+
+import multiprocessing
+import os
+
+os.environ.setdefault("ML_LOAD_ON_IMPORT", "true")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8001')}"
+workers = int(os.getenv("ML_WORKERS", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+
+# Split the cores between workers so ONNX Runtime / BLAS threads don't oversubscribe
+threads_per_worker = str(max(1, multiprocessing.cpu_count() // workers))
+os.environ.setdefault("ML_INTRA_OP_THREADS", threads_per_worker)
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, threads_per_worker)
+
+
+def post_fork(server, worker):
+    import inference_server
+
+    inference_server.registry.after_fork()
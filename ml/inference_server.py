@@ -1,23 +1,176 @@
-from fastapi import FastAPI
+import asyncio
+import gc
+import hmac
+import logging
+import mmap
+import os
+from contextlib import asynccontextmanager
+from typing import List, Tuple
 
-app = FastAPI(title="CivicSense ML Service", version="0.1.0")
+import httpx
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 
-@app.post("/internal/ml/image_infer")
-def image_infer(image_url: str):
-    # Mock ML inference
+import preprocessing
+from model_registry import ML_MODEL_POLL_SECONDS, MODEL_NAMES, ModelRegistry
+from result_cache import ResultCache, bytes_digest, cache_key, text_digest
+
+# Load at import when the app is preloaded before forking workers (gunicorn.conf.py),
+# so model objects are shared copy-on-write; otherwise each worker loads in lifespan
+ML_LOAD_ON_IMPORT = os.getenv("ML_LOAD_ON_IMPORT", "false").lower() == "true"
+ML_PRELOAD_MODELS = os.getenv("ML_PRELOAD_MODELS", "true").lower() == "true"
+ML_FETCH_TIMEOUT = float(os.getenv("ML_FETCH_TIMEOUT", "5.0"))
+# Same-host backends may hand over decoded frames as files in this directory
+ML_SHARED_FRAME_DIR = os.getenv("ML_SHARED_FRAME_DIR")
+# Required as X-Internal-Token by the model activation route; unset disables the route
+ML_INTERNAL_TOKEN = os.getenv("ML_INTERNAL_TOKEN")
+
+logger = logging.getLogger(__name__)
+
+registry = ModelRegistry()
+result_cache = ResultCache()
+http_client: httpx.AsyncClient = None
+
+if ML_LOAD_ON_IMPORT:
+    registry.load_all()
+    # Keep the GC from touching (and un-sharing) the preloaded objects after fork
+    gc.freeze()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client
+    http_client = httpx.AsyncClient(timeout=ML_FETCH_TIMEOUT)
+    if ML_PRELOAD_MODELS and not registry.ready:
+        await run_in_threadpool(registry.load_all)
+    poller = asyncio.create_task(follow_active_versions()) if ML_MODEL_POLL_SECONDS > 0 else None
+    yield
+    if poller is not None:
+        poller.cancel()
+    await http_client.aclose()
+
+async def follow_active_versions():
+    """Swap to the versions activated through any worker of this node (see model_registry)."""
+    while True:
+        await asyncio.sleep(ML_MODEL_POLL_SECONDS)
+        try:
+            swapped = await run_in_threadpool(registry.sync)
+        except Exception:
+            logger.exception("Could not check the active model versions")
+            continue
+        for name in swapped:
+            logger.info("Switched to the node's active %s model", name)
+
+app = FastAPI(title="CivicSense ML Service", version="0.1.0", lifespan=lifespan)
+
+def format_result(predictions: List[Tuple[str, float]]) -> dict:
     return {
-        "labels": [{"label": "flood", "confidence": 0.85}],
-        "veracity_score": 0.85
+        "labels": [{"label": label, "confidence": round(confidence, 4)} for label, confidence in predictions],
+        "veracity_score": round(predictions[0][1], 4) if predictions else 0.0
     }
 
+@app.post("/internal/ml/image_infer")
+async def image_infer(image_url: str, sha256: str = None):
+    model = registry.get("image")
+    # Callers that know the upload's hash skip the fetch as well as inference on a hit
+    if sha256:
+        cached = result_cache.get(cache_key(model.name, model.version, sha256))
+        if cached is not None:
+            return cached
+
+    features = None
+    if model.input_kind == "image":
+        try:
+            response = await http_client.get(image_url)
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise HTTPException(status_code=422, detail=f"Could not fetch image: {exc.__class__.__name__}")
+        if not sha256:
+            sha256 = bytes_digest(response.content)
+            cached = result_cache.get(cache_key(model.name, model.version, sha256))
+            if cached is not None:
+                return cached
+        loop = asyncio.get_running_loop()
+        features = await loop.run_in_executor(
+            preprocessing.get_pool(), preprocessing.image_features, response.content, model.image_size
+        )
+
+    result = format_result(await run_in_threadpool(model.predict, features))
+    if sha256:
+        result_cache.set(cache_key(model.name, model.version, sha256), result)
+    return result
+
+def _shared_frame_features(frame_path: str, width: int, height: int, size: int):
+    path = os.path.realpath(frame_path)
+    if not ML_SHARED_FRAME_DIR or os.path.dirname(path) != os.path.realpath(ML_SHARED_FRAME_DIR):
+        raise HTTPException(status_code=400, detail="frame_path is outside the shared frame directory")
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pixels:
+            return preprocessing.frame_features(pixels, width, height, size)
+    except (OSError, ValueError):
+        raise HTTPException(status_code=422, detail="Unreadable shared frame")
+
+@app.post("/internal/ml/image_infer_frame")
+async def image_infer_frame(request: Request, width: int, height: int, sha256: str = None, frame_path: str = None):
+    """Classify an RGB frame decoded by the backend: raw bytes in the body, or a shared file."""
+    model = registry.get("image")
+    if sha256:
+        cached = result_cache.get(cache_key(model.name, model.version, sha256))
+        if cached is not None:
+            return cached
+
+    features = None
+    if model.input_kind == "image":
+        loop = asyncio.get_running_loop()
+        if frame_path:
+            features = await loop.run_in_executor(
+                preprocessing.get_pool(), _shared_frame_features, frame_path, width, height, model.image_size
+            )
+        else:
+            pixels = await request.body()
+            if len(pixels) != width * height * 3:
+                raise HTTPException(status_code=422, detail="Frame size does not match width x height x 3")
+            features = await loop.run_in_executor(
+                preprocessing.get_pool(), preprocessing.frame_features, pixels, width, height, model.image_size
+            )
+
+    result = format_result(await run_in_threadpool(model.predict, features))
+    if sha256:
+        result_cache.set(cache_key(model.name, model.version, sha256), result)
+    return result
+
 @app.post("/internal/ml/text_infer")
 def text_infer(text: str):
-    # Mock text classification
-    return {
-        "labels": [{"label": "pothole", "confidence": 0.72}],
-        "veracity_score": 0.72
-    }
+    model = registry.get("text")
+    key = cache_key(model.name, model.version, text_digest(text))
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+
+    features = preprocessing.text_features(text, model.n_features) if model.input_kind == "text" else None
+    result = format_result(model.predict(features))
+    result_cache.set(key, result)
+    return result
+
+@app.post("/internal/ml/models/{name}/activate")
+async def activate_model(name: str, version: str = None, x_internal_token: str = Header(None)):
+    """Load, warm and hot-swap a model version on every worker of the node, without dropping in-flight requests.
+
+    This worker swaps right away; the others within ML_MODEL_POLL_SECONDS.
+    """
+    if not ML_INTERNAL_TOKEN or not hmac.compare_digest((x_internal_token or "").encode(), ML_INTERNAL_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Model activation needs a valid X-Internal-Token")
+    if name not in MODEL_NAMES:
+        raise HTTPException(status_code=404, detail="Unknown model")
+    try:
+        model = await run_in_threadpool(registry.activate_node, name, version)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return {"name": name, "version": model.version, "load_seconds": round(model.load_seconds, 3)}
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    # Only report ready once every model has been loaded and warmed up
+    if not registry.ready:
+        return JSONResponse(status_code=503, content={"status": "warming", "models": registry.status()})
+    return {"status": "ok", "models": registry.status(), "cache": result_cache.stats()}
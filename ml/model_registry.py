@@ -0,0 +1,328 @@
+"""
+Model registry for the inference server.
+
+Models live under ``ML_MODEL_DIR/<name>/<version>/`` as a ``manifest.json``
+plus ``weights.npy`` / ``bias.npy``. Weights are opened with
+``np.load(mmap_mode="r")`` so every worker process on a node maps the same
+page-cache pages instead of holding a private copy; when the app is
+preloaded before forking (see gunicorn.conf.py) the loaded objects are
+shared copy-on-write as well.
+
+Two inference backends are supported, chosen per model from its manifest
+(``"backend": "numpy"`` or ``"onnx"``) or forced with ML_INFERENCE_BACKEND:
+the NumPy linear classifier above, and ONNX Runtime on the CPU provider,
+which prefers an int8-quantized ``model.int8.onnx`` when one is present.
+Thread counts are set per worker with ML_INTRA_OP_THREADS and
+ML_INTER_OP_THREADS.
+
+Each model is warmed up with a few dummy inferences before it is published.
+Publishing swaps a single dict entry, so requests already holding the old
+model finish on it while new requests get the new version.
+
+Activating a version through the API also writes it to
+``ML_MODEL_DIR/<name>/ACTIVE``. That file is the node's active version:
+every worker checks it every ML_MODEL_POLL_SECONDS (``sync``) and swaps to
+it, so one request reaches all of a node's workers. It takes precedence
+over ML_<NAME>_MODEL_VERSION, including after a restart.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ML_MODEL_DIR = os.getenv("ML_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+ML_WARMUP_RUNS = int(os.getenv("ML_WARMUP_RUNS", "3"))
+ML_INFERENCE_BACKEND = os.getenv("ML_INFERENCE_BACKEND", "auto")  # auto, numpy, onnx
+ML_PREFER_QUANTIZED = os.getenv("ML_PREFER_QUANTIZED", "true").lower() == "true"
+ML_INTRA_OP_THREADS = int(os.getenv("ML_INTRA_OP_THREADS", "1"))
+ML_INTER_OP_THREADS = int(os.getenv("ML_INTER_OP_THREADS", "1"))
+ML_MODEL_POLL_SECONDS = float(os.getenv("ML_MODEL_POLL_SECONDS", "5"))
+MODEL_NAMES = ("image", "text")
+
+# Outputs of the placeholder models used until trained weights are deployed
+MOCK_OUTPUTS = {
+    "image": [("flood", 0.85)],
+    "text": [("pothole", 0.72)],
+}
+
+
+class Model:
+    """Base class: ``predict`` maps a feature vector to (label, confidence) pairs."""
+
+    input_kind = "none"  # "text", "image" or "none" (no features needed)
+    n_features = 0
+    image_size = 0
+
+    def __init__(self, name: str, version: str):
+        self.name = name
+        self.version = version
+        self.warm = False
+        self.load_seconds = 0.0
+
+    def predict(self, features: Optional[np.ndarray]) -> List[Tuple[str, float]]:
+        raise NotImplementedError
+
+    def predict_batch(self, features: np.ndarray) -> List[List[Tuple[str, float]]]:
+        """Predict for a (batch, n_features) array; backends override this to vectorize."""
+        return [self.predict(row) for row in features]
+
+    def example_input(self) -> Optional[np.ndarray]:
+        return None
+
+    def after_fork(self) -> None:
+        """Re-create per-process resources (thread pools) that do not survive fork."""
+
+    def warmup(self, runs: int = ML_WARMUP_RUNS) -> None:
+        example = self.example_input()
+        for _ in range(runs):
+            self.predict(example)
+        self.warm = True
+
+
+class ConstantModel(Model):
+    """Placeholder returning fixed labels; used when no weights are deployed."""
+
+    def __init__(self, name: str):
+        super().__init__(name, "mock")
+        self.outputs = MOCK_OUTPUTS.get(name, [])
+
+    def predict(self, features):
+        return list(self.outputs)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=-1, keepdims=True)
+
+
+class _ManifestModel(Model):
+    """Shared manifest handling for models backed by files on disk."""
+
+    backend = ""
+
+    def __init__(self, name: str, version: str, path: str, manifest: Dict[str, Any]):
+        super().__init__(name, version)
+        self.path = path
+        self.labels: List[str] = manifest["labels"]
+        self.input_kind = manifest.get("input", name)
+        self.image_size = int(manifest.get("image_size", 0))
+        self.top_k = int(manifest.get("top_k", 3))
+
+    def _top_k(self, probs: np.ndarray) -> List[Tuple[str, float]]:
+        top = np.argsort(probs)[::-1][: self.top_k]
+        return [(self.labels[i], float(probs[i])) for i in top]
+
+    def predict(self, features):
+        return self.predict_batch(features[np.newaxis, :])[0]
+
+    def example_input(self):
+        return np.zeros(self.n_features, dtype=np.float32)
+
+
+class LinearModel(_ManifestModel):
+    """Softmax linear classifier over memory-mapped NumPy weights."""
+
+    backend = "numpy"
+
+    def __init__(self, name: str, version: str, path: str, manifest: Dict[str, Any]):
+        super().__init__(name, version, path, manifest)
+        # Read-only mmap: pages are shared by every process mapping the file
+        self.weights = np.load(os.path.join(path, "weights.npy"), mmap_mode="r")
+        bias_path = os.path.join(path, "bias.npy")
+        self.bias = np.load(bias_path, mmap_mode="r") if os.path.exists(bias_path) else np.zeros(len(self.labels), np.float32)
+        self.n_features = self.weights.shape[0]
+        if self.weights.shape[1] != len(self.labels):
+            raise ValueError(f"{name}/{version}: weights have {self.weights.shape[1]} outputs for {len(self.labels)} labels")
+
+    def predict_batch(self, features):
+        probs = _softmax(np.asarray(features, dtype=np.float32) @ self.weights + self.bias)
+        return [self._top_k(row) for row in probs]
+
+
+class OnnxModel(_ManifestModel):
+    """ONNX Runtime session on the CPU provider; uses the int8 model when available."""
+
+    backend = "onnx"
+
+    def __init__(self, name: str, version: str, path: str, manifest: Dict[str, Any], prefer_quantized: bool = ML_PREFER_QUANTIZED):
+        super().__init__(name, version, path, manifest)
+        self.model_file = os.path.join(path, "model.onnx")
+        quantized_file = os.path.join(path, "model.int8.onnx")
+        if prefer_quantized and os.path.exists(quantized_file):
+            self.model_file = quantized_file
+            self.version = f"{version}-int8"
+        self.outputs_probabilities = manifest.get("outputs", "logits") == "probabilities"
+        self._open_session()
+
+    def _open_session(self) -> None:
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = ML_INTRA_OP_THREADS
+        options.inter_op_num_threads = ML_INTER_OP_THREADS
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.model_file, sess_options=options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.n_features = int(model_input.shape[-1])
+
+    def after_fork(self):
+        # ORT's intra-op thread pool is not inherited by forked workers
+        if ML_INTRA_OP_THREADS > 1 or ML_INTER_OP_THREADS > 1:
+            self._open_session()
+            self.warmup()
+
+    def predict_batch(self, features):
+        (outputs,) = self.session.run(None, {self.input_name: np.asarray(features, dtype=np.float32)})
+        probs = outputs if self.outputs_probabilities else _softmax(outputs)
+        return [self._top_k(row) for row in probs]
+
+
+def load_model_files(name: str, version: str, path: str, backend: str = ML_INFERENCE_BACKEND) -> Model:
+    """Instantiate the model in ``path`` with the requested (or manifest) backend."""
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if backend == "auto":
+        backend = manifest.get("backend") or ("onnx" if os.path.exists(os.path.join(path, "model.onnx")) else "numpy")
+    if backend == "onnx":
+        return OnnxModel(name, version, path, manifest)
+    if backend == "numpy":
+        return LinearModel(name, version, path, manifest)
+    raise ValueError(f"Unknown inference backend {backend}")
+
+
+class ModelRegistry:
+    """Loads, warms and publishes model versions by name."""
+
+    def __init__(self, model_dir: str = ML_MODEL_DIR):
+        self.model_dir = model_dir
+        self._models: Dict[str, Model] = {}
+        self._versions: Dict[str, Optional[str]] = {}  # name -> version directory served (None for the mock)
+        self._failed: Dict[str, str] = {}  # name -> active version that would not load here
+        self._lock = threading.Lock()
+
+    def available_versions(self, name: str) -> List[str]:
+        path = os.path.join(self.model_dir, name)
+        if not os.path.isdir(path):
+            return []
+        return sorted(
+            entry for entry in os.listdir(path)
+            if os.path.isfile(os.path.join(path, entry, "manifest.json"))
+        )
+
+    def _active_path(self, name: str) -> str:
+        return os.path.join(self.model_dir, name, "ACTIVE")
+
+    def active_version(self, name: str) -> Optional[str]:
+        """The node's active version of ``name``, if one was activated."""
+        try:
+            with open(self._active_path(name)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def resolve_version(self, name: str, version: Optional[str] = None) -> Optional[str]:
+        """Explicit version, else the node's active one, else ML_<NAME>_MODEL_VERSION, else the highest on disk."""
+        version = version or self.active_version(name) or os.getenv(f"ML_{name.upper()}_MODEL_VERSION")
+        versions = self.available_versions(name)
+        if version:
+            if version not in versions:
+                raise FileNotFoundError(f"Model {name} version {version} not found in {self.model_dir}")
+            return version
+        return versions[-1] if versions else None
+
+    def load(self, name: str, version: Optional[str] = None) -> Model:
+        """Load and warm a model without publishing it."""
+        start = time.perf_counter()
+        version = self.resolve_version(name, version)
+        if version is None:
+            model: Model = ConstantModel(name)
+        else:
+            model = load_model_files(name, version, os.path.join(self.model_dir, name, version))
+        model.warmup()
+        model.load_seconds = time.perf_counter() - start
+        logger.info("Loaded model %s:%s in %.2fs", name, model.version, model.load_seconds)
+        return model
+
+    def activate(self, name: str, version: Optional[str] = None) -> Model:
+        """Load, warm, then atomically publish a model version in this process."""
+        version = self.resolve_version(name, version)
+        model = self.load(name, version)
+        with self._lock:
+            self._models[name] = model
+            self._versions[name] = version
+        return model
+
+    def activate_node(self, name: str, version: Optional[str] = None) -> Model:
+        """Activate a version here and make it the node's active version, which the other workers follow."""
+        version = self.resolve_version(name, version)
+        model = self.activate(name, version)
+        path = self._active_path(name)
+        if version is None:
+            # Nothing on disk: every worker serves the mock anyway
+            if os.path.exists(path):
+                os.remove(path)
+            return model
+        # Replaced atomically, so a worker never reads a partly written version
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, path)
+        return model
+
+    def sync(self) -> List[str]:
+        """Swap to the node's active versions where this process serves another; returns the names swapped."""
+        swapped = []
+        for name in list(self._models):
+            version = self.active_version(name)
+            if version is None or version in (self._versions.get(name), self._failed.get(name)):
+                continue
+            try:
+                self.activate(name, version)
+            except Exception:
+                # Keep serving the current version; retried once the active version changes
+                logger.exception("Could not activate model %s:%s", name, version)
+                self._failed[name] = version
+                continue
+            self._failed.pop(name, None)
+            swapped.append(name)
+        return swapped
+
+    def load_all(self) -> None:
+        for name in MODEL_NAMES:
+            self.activate(name)
+
+    def get(self, name: str) -> Model:
+        """The published model, loading it on first use."""
+        model = self._models.get(name)
+        if model is None:
+            model = self.activate(name)
+        return model
+
+    def after_fork(self) -> None:
+        for model in list(self._models.values()):
+            model.after_fork()
+
+    @property
+    def ready(self) -> bool:
+        return all(name in self._models and self._models[name].warm for name in MODEL_NAMES)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "version": model.version,
+                "backend": getattr(model, "backend", "mock"),
+                "warm": model.warm,
+                "load_seconds": round(model.load_seconds, 3),
+            }
+            for name, model in self._models.items()
+        }
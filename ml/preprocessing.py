@@ -0,0 +1,85 @@
+"""
+Input preprocessing for the inference models.
+
+Text is turned into a hashed bag-of-words vector; images are decoded,
+resized and normalized into a flat float32 vector. Image work runs on a
+dedicated thread pool (ML_PREPROCESS_THREADS) since Pillow releases the GIL
+while decoding and resampling; normalization is one vectorized NumPy pass
+over the whole batch.
+"""
+
+import io
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+import numpy as np
+
+ML_PREPROCESS_THREADS = int(os.getenv("ML_PREPROCESS_THREADS", str(min(4, os.cpu_count() or 1))))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PIXEL_SCALE = np.float32(1 / 127.5)
+
+_pool: ThreadPoolExecutor = None
+
+
+def get_pool() -> ThreadPoolExecutor:
+    """Thread pool for image decoding, created lazily so it is not inherited across fork."""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=ML_PREPROCESS_THREADS, thread_name_prefix="preprocess")
+    return _pool
+
+
+def text_features(text: str, n_features: int) -> np.ndarray:
+    """L2-normalized hashed bag-of-words (stable across processes, unlike hash())."""
+    vector = np.zeros(n_features, dtype=np.float32)
+    for token in _TOKEN.findall(text.lower()):
+        vector[zlib.crc32(token.encode()) % n_features] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def decode_image(image_bytes: bytes, size: int) -> np.ndarray:
+    """Decode to a ``size`` x ``size`` x 3 uint8 array."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # JPEG can decode straight at a reduced scale, skipping most of the IDCT work
+        image.draft("RGB", (size, size))
+        image = image.convert("RGB").resize((size, size), Image.BILINEAR)
+        return np.asarray(image, dtype=np.uint8)
+
+
+def normalize(pixels: np.ndarray) -> np.ndarray:
+    """Scale uint8 pixels (any leading batch shape) to float32 in [-1, 1], flattened per image."""
+    batch = pixels.reshape(pixels.shape[0], -1) if pixels.ndim == 4 else pixels.reshape(-1)
+    out = batch.astype(np.float32)
+    out *= _PIXEL_SCALE
+    out -= 1.0
+    return out
+
+
+def image_features(image_bytes: bytes, size: int) -> np.ndarray:
+    """Decode, resize to ``size`` x ``size`` RGB and scale pixels to [-1, 1]."""
+    return normalize(decode_image(image_bytes, size))
+
+
+def frame_features(pixels, width: int, height: int, size: int) -> np.ndarray:
+    """Features from an already decoded RGB frame (bytes, or an mmap of a shared file)."""
+    from PIL import Image
+
+    frame = np.frombuffer(pixels, dtype=np.uint8, count=width * height * 3).reshape(height, width, 3)
+    resized = Image.fromarray(frame).resize((size, size), Image.BILINEAR)
+    return normalize(np.asarray(resized, dtype=np.uint8))
+
+
+def image_batch_features(images: Sequence[bytes], size: int, parallel: bool = True) -> np.ndarray:
+    """Features for several images as one (batch, size * size * 3) array."""
+    if parallel and len(images) > 1:
+        frames = list(get_pool().map(decode_image, images, [size] * len(images)))
+    else:
+        frames = [decode_image(image, size) for image in images]
+    return normalize(np.stack(frames))
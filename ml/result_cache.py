@@ -0,0 +1,165 @@
+"""
+Inference result cache.
+
+Results are keyed by model name and version plus a content digest (the
+upload's SHA-256 for images, a digest of the normalized text for text), so
+re-uploaded media and repeated texts skip inference entirely and a model
+hot-swap naturally invalidates old entries. An in-memory LRU with TTL sits
+in front of an optional SQLite tier that survives restarts and is shared by
+all workers on the node. Each process opens its own connection to it on
+first use. With preloaded gunicorn workers the cache object is created in
+the master, and a SQLite connection must not be carried across fork.
+Every ML_CACHE_PURGE_EVERY writes, a worker
+deletes the SQLite tier's expired rows. It also deletes the oldest-written
+rows beyond ML_CACHE_SQLITE_MAX_ENTRIES, so the file stays bounded.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+ML_CACHE_MAX_ENTRIES = int(os.getenv("ML_CACHE_MAX_ENTRIES", "50000"))
+ML_CACHE_TTL_SECONDS = float(os.getenv("ML_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ML_CACHE_SQLITE_PATH = os.getenv("ML_CACHE_SQLITE_PATH")  # unset disables the persistent tier
+ML_CACHE_SQLITE_MAX_ENTRIES = int(os.getenv("ML_CACHE_SQLITE_MAX_ENTRIES", str(ML_CACHE_MAX_ENTRIES)))
+ML_CACHE_PURGE_EVERY = int(os.getenv("ML_CACHE_PURGE_EVERY", "1000"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def text_digest(text: str) -> str:
+    """Digest of the text after lower-casing and dropping punctuation and extra whitespace."""
+    normalized = " ".join(_TOKEN.findall(text.lower()))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def bytes_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(model_name: str, model_version: str, digest: str) -> str:
+    return f"{model_name}:{model_version}:{digest}"
+
+
+class ResultCache:
+    """LRU + TTL memory cache with an optional persistent SQLite tier."""
+
+    def __init__(
+        self,
+        max_entries: int = ML_CACHE_MAX_ENTRIES,
+        ttl: float = ML_CACHE_TTL_SECONDS,
+        sqlite_path: Optional[str] = ML_CACHE_SQLITE_PATH,
+        sqlite_max_entries: int = ML_CACHE_SQLITE_MAX_ENTRIES,
+        purge_every: int = ML_CACHE_PURGE_EVERY,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sqlite_max_entries = sqlite_max_entries
+        self.purge_every = purge_every
+        self._writes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sqlite_path = sqlite_path or None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None  # process that opened _db
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """This process's connection to the SQLite tier, opened on first use; call with the lock held."""
+        if self.sqlite_path is None:
+            return None
+        if self._db_pid != os.getpid():
+            db = sqlite3.connect(self.sqlite_path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS inference_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            # Expiry order is write order (a fixed TTL), which purging deletes by
+            db.execute("CREATE INDEX IF NOT EXISTS ix_inference_cache_expires_at ON inference_cache (expires_at)")
+            self._db, self._db_pid = db, os.getpid()
+            self._purge(time.time())
+        return self._db
+
+    def _remember(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            db = self._connection()
+            if db is not None:
+                row = db.execute(
+                    "SELECT value, expires_at FROM inference_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            db = self._connection()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO inference_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+            self._writes += 1
+            if self.purge_every and self._writes % self.purge_every == 0:
+                self._purge(time.time())
+
+    def _purge(self, now: float) -> int:
+        expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        db = self._connection()
+        if db is not None:
+            db.execute("DELETE FROM inference_cache WHERE expires_at <= ?", (now,))
+            (rows,) = db.execute("SELECT COUNT(*) FROM inference_cache").fetchone()
+            if rows > self.sqlite_max_entries:
+                db.execute(
+                    "DELETE FROM inference_cache WHERE key IN "
+                    "(SELECT key FROM inference_cache ORDER BY expires_at LIMIT ?)",
+                    (rows - self.sqlite_max_entries,),
+                )
+        return len(expired)
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers and cap the SQLite tier; returns how many memory entries went."""
+        with self._lock:
+            return self._purge(time.time())
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "persistent": self.sqlite_path is not None,
+        }